@@ -17,11 +17,12 @@ Redistribution and use in source and binary forms, with or without modification,
 THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
-from gmpy2 import get_context, mpfr
-get_context().precision = 113  # Set this BEFORE importing any Taylor Series stuff!
+from gmpy2 import get_context
+get_context().precision = 113  # Set this BEFORE importing any Taylor Series stuff! (default, see Backend.select)
 from json import loads
 from sys import stdin, stderr, argv
 from Symplectic import Symplectic
+from Backend import select
 
 
 class Analysis(object):
@@ -51,7 +52,7 @@ if __name__ == "__main__":
     #  ./Analysis.py <initial-conditions.json | ./plotXY.py 1 c d
     print("Simulator: {}".format(argv[0]), file=stderr)
     input_data = stdin.read()
-    ic = loads(input_data, parse_float=mpfr)['IC']
+    ic = loads(input_data, parse_float=select(loads(input_data)['IC'], 113))['IC']
     print(input_data, file=stderr)
     a = Analysis()
     a.solve(Symplectic(a, 1.0, ic['integrator'], ic['scheme']).method)
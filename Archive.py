@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from json import loads, dumps
+from lzma import compress as lzma_compress, decompress as lzma_decompress
+from struct import Struct
+from sys import stdin, stdout, stderr, argv
+from zlib import compress as zlib_compress, decompress as zlib_decompress
+from numpy import array, frombuffer, concatenate, recarray, rec, logical_and
+import Binary
+
+MAGIC = b'BHARC1\n'
+FOOTER = Struct('<Q')  # offset of the index
+CODECS = {'zlib': (lambda data: zlib_compress(data, 6), zlib_decompress),
+          'lzma': (lzma_compress, lzma_decompress)}
+
+
+class Writer(object):
+    """
+    Trajectory archive: a header, then chunks of rows stored column by column, each column compressed separately,
+    then an index giving every chunk's position and the range of the key (tau or mino) it covers
+    """
+    def __init__(self, f, fields, key='tau', codec='zlib', rows=4096):
+        if key not in fields:
+            raise Exception('>>> Key must be one of {}, was "{found}" <<<'.format(', '.join(fields), found=key))
+        if codec not in CODECS:
+            raise Exception('>>> Codec must be {}, was "{found}" <<<'.format(' or '.join(CODECS), found=codec))
+        self.f = f
+        self.fields = list(fields)
+        self.key = self.fields.index(key)
+        self.codec = codec
+        self.compress = CODECS[codec][0]
+        self.rows = rows
+        self.pending = []
+        self.index = []
+        self.position = 0
+        self.put(MAGIC + (dumps({'fields': self.fields, 'key': key, 'codec': codec, 'dtype': '<f8'}) + '\n').encode())
+
+    def put(self, data):
+        self.f.write(data)
+        self.position += len(data)
+
+    def write(self, values):
+        """
+        :param values: one row, in field order
+        """
+        self.pending.append(values)
+        if len(self.pending) == self.rows:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        columns = array(self.pending, dtype='<f8').T
+        key = columns[self.key]
+        entry = {'offset': self.position, 'rows': len(self.pending), 'min': float(key.min()), 'max': float(key.max()),
+                 'sizes': []}
+        for column in columns:
+            data = self.compress(column.tobytes())
+            entry['sizes'].append(len(data))
+            self.put(data)
+        self.index.append(entry)
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        offset = self.position
+        self.put(dumps(self.index).encode())
+        self.put(FOOTER.pack(offset))
+
+
+class Reader(object):
+    """
+    Random access to an archive by key range, decompressing only the chunks & columns asked for
+    """
+    def __init__(self, f):
+        self.f = f
+        if f.read(len(MAGIC)) != MAGIC:
+            raise Exception('>>> Not a trajectory archive <<<')
+        header = loads(f.readline())
+        self.fields, self.key, self.codec = header['fields'], header['key'], header['codec']
+        self.decompress = CODECS[self.codec][1]
+        f.seek(- FOOTER.size, 2)
+        end = f.tell()
+        offset, = FOOTER.unpack(f.read(FOOTER.size))
+        f.seek(offset)
+        self.index = loads(f.read(end - offset))
+
+    def chunks(self, start=None, end=None, fields=None):
+        """
+        :param start: lowest key value wanted, or None
+        :param end: highest key value wanted, or None
+        :param fields: names of the columns wanted (default all)
+        :return: a generator of NumPy record arrays, one per chunk overlapping the range, trimmed to it
+        """
+        fields = list(fields or self.fields)
+        for name in fields:
+            if name not in self.fields:
+                raise Exception('>>> Field must be one of {}, was "{found}" <<<'.format(', '.join(self.fields),
+                                                                                         found=name))
+        wanted = set(fields + [self.key])
+        for entry in self.index:
+            if (start is not None and entry['max'] < start) or (end is not None and entry['min'] > end):
+                continue
+            columns = {}
+            offset = entry['offset']
+            for name, size in zip(self.fields, entry['sizes']):
+                if name in wanted:
+                    self.f.seek(offset)
+                    columns[name] = frombuffer(self.decompress(self.f.read(size)), dtype='<f8')
+                offset += size
+            key = columns[self.key]
+            keep = logical_and(key >= (start if start is not None else key.min()),
+                               key <= (end if end is not None else key.max()))
+            yield rec.fromarrays([columns[name][keep] for name in fields], names=fields)
+
+    def read(self, start=None, end=None, fields=None):
+        """
+        :return: the whole selection as one NumPy record array
+        """
+        parts = list(self.chunks(start, end, fields))
+        return concatenate(parts).view(recarray) if parts else None
+
+    def points(self, start=None, end=None, fields=None):
+        """
+        :return: a generator of dictionaries, one per row, as Binary.points
+        """
+        for chunk in self.chunks(start, end, fields):
+            names = chunk.dtype.names
+            for row in chunk.tolist():
+                yield dict(zip(names, row))
+
+
+def records(stream):
+    """
+    Plot points from a trajectory archive (seekable, eg. a redirected file), binary records or JSON lines
+    :param stream: a byte stream, e.g. stdin.buffer
+    :return: a generator of (dictionary, line) pairs, as Binary.records, line is None unless the input is JSON lines
+    """
+    if hasattr(stream, 'peek'):
+        head = stream.peek(len(MAGIC))[:len(MAGIC)]
+    else:
+        start = stream.tell()
+        head = stream.read(len(MAGIC))
+        stream.seek(start)
+    if head == MAGIC:
+        return ((point, None) for point in Reader(stream).points())
+    return Binary.records(stream)
+
+
+def points(stream):
+    """
+    Plot points from a trajectory archive (seekable, eg. a redirected file), binary records or JSON lines
+    :param stream: a byte stream, e.g. stdin.buffer
+    :return: a generator of dictionaries
+    """
+    return (point for point, _ in records(stream))
+
+
+def line(point):
+    return '{' + ','.join('"{}":{:.9e}'.format(name, value) for name, value in point.items()) + '}'
+
+
+if __name__ == "__main__":
+    #  Example: ./Bh3d.py $ic | ./Archive.py write /tmp/run.arc tau  # JSON lines or binary output in
+    #  Example: ./Archive.py read /tmp/run.arc 5000 5100 tau v4e r | ./plotXY.py 1 tau r  # JSON lines out
+    #  Example: ./plotErrors.py $ic tau 1 </tmp/run.arc  # the plotters & finterp.py also read archives directly
+    #  Arguments: write <archive> [key (tau) [codec (zlib or lzma) [rows per chunk (4096)]]]
+    #             read <archive> [start end [field . . .]], use - for an open start or end
+    #             info <archive>
+    print("Archive: {}".format(argv[0]), file=stderr)
+    if len(argv) > 2 and argv[1] == 'write':
+        source = Binary.points(stdin.buffer)
+        first = next(source)
+        with open(argv[2], 'wb') as archive:
+            writer = Writer(archive, list(first), argv[3] if len(argv) > 3 else 'tau',
+                            argv[4] if len(argv) > 4 else 'zlib', int(argv[5]) if len(argv) > 5 else 4096)
+            writer.write(list(first.values()))
+            for p in source:
+                writer.write(list(p.values()))
+            writer.close()
+            print("{} chunks".format(len(writer.index)), file=stderr)
+    elif len(argv) > 2 and argv[1] == 'read':
+        with open(argv[2], 'rb') as archive:
+            bounds = [None if x == '-' else float(x) for x in argv[3:5]] + [None, None]
+            for p in Reader(archive).points(bounds[0], bounds[1], argv[5:] or None):
+                stdout.write(line(p) + '\n')
+    elif len(argv) == 3 and argv[1] == 'info':
+        with open(argv[2], 'rb') as archive:
+            reader = Reader(archive)
+            print(dumps({'fields': reader.fields, 'key': reader.key, 'codec': reader.codec,
+                         'chunks': len(reader.index), 'rows': sum(entry['rows'] for entry in reader.index),
+                         'min': min(entry['min'] for entry in reader.index),
+                         'max': max(entry['max'] for entry in reader.index)}))
+    else:
+        raise Exception('>>> Command must be write, read or info <<<')
+else:
+    print(__name__ + " module loaded", file=stderr)
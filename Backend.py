@@ -0,0 +1,103 @@
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+import math
+import gmpy2
+from sys import stderr
+from gmpy2 import get_context, mpfr
+import DoubleDouble
+
+
+# noinspection PyArgumentList
+def make_mpfr(x):
+    return mpfr(str(x)) if isinstance(x, float) else mpfr(x) if isinstance(x, (int, str)) else x
+
+
+class Backend(object):
+    def __init__(self, name, bits, make, sqrt, sin, cos, acos, log10):
+        self.name = name
+        self.bits = bits
+        self.make = make
+        self.sqrt = sqrt
+        self.sin = sin
+        self.cos = cos
+        self.acos = acos
+        self.log10 = log10
+
+
+BACKENDS = {
+    'mpfr': Backend('mpfr', None, make_mpfr, gmpy2.sqrt, gmpy2.sin, gmpy2.cos, gmpy2.acos, gmpy2.log10),
+    'float': Backend('float', 53, float, math.sqrt, math.sin, math.cos, math.acos, math.log10),
+    'dd': Backend('dd', 106, DoubleDouble.DoubleDouble.get, DoubleDouble.sqrt, DoubleDouble.sin, DoubleDouble.cos,
+                  DoubleDouble.acos, DoubleDouble.log10),
+}
+current = BACKENDS['mpfr']
+
+
+def select(ic, precision):
+    """
+    Choose the number type for coefficients and model state, like get_context() this is global
+    :param ic: the IC dictionary, optional "backend" (mpfr, float or dd) and "precision" (bits, mpfr only) are used
+    :param precision: default mpfr precision for the calling model
+    :return: a number constructor, suitable for the parse_float argument of json.loads
+    """
+    global current
+    name = ic.get('backend', 'mpfr')
+    if name not in BACKENDS:
+        raise Exception('>>> Backend must be {}, was "{found}" <<<'.format(' or '.join(BACKENDS), found=name))
+    current = BACKENDS[name]
+    bits = int(ic.get('precision', precision)) if current.bits is None else current.bits
+    get_context().precision = bits  # Dual is always mpfr, so keep it at least as precise as the model
+    print("Backend: {} ({} bits)".format(name, bits), file=stderr)
+    return current.make
+
+
+def require(names, what):
+    """
+    Fail early for models that cannot run on the selected backend, e.g. Dual numbers take mpfr or float values only
+    :param names: backends the caller supports
+    :param what: the caller, for the message
+    """
+    if current.name not in names:
+        raise Exception('>>> {} backend must be {}, was "{found}" <<<'.format(what, ' or '.join(names),
+                                                                              found=current.name))
+
+
+def number(x):
+    return current.make(x)
+
+
+def sqrt(x):
+    return current.sqrt(x)
+
+
+def sin(x):
+    return current.sin(x)
+
+
+def cos(x):
+    return current.cos(x)
+
+
+def acos(x):
+    return current.acos(x)
+
+
+def log10(x):
+    return current.log10(x)
+
+
+print(__name__ + " module loaded", file=stderr)
@@ -0,0 +1,150 @@
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from json import dumps
+from pickle import dump, load
+from queue import Queue, Empty, Full
+from sys import stderr
+from tempfile import TemporaryFile
+from threading import Thread, Lock
+
+POLICIES = ('block', 'drop', 'spill')
+
+
+class Background(object):
+    """
+    Plot output from a writer thread: write() only queues a snapshot of the values, so a slow consumer downstream
+    stalls the integrator only if the queue fills under the "block" policy.  "drop" discards the oldest queued record,
+    "spill" sends records to a temporary file, pickled at full precision, until there is room again, keeping them in
+    order.
+    """
+    def __init__(self, sink, size, policy='block', batch=256):
+        """
+        :param sink: formats & writes records, e.g. Binary.Writer or Binary.Lines, needs batch() & flush()
+        :param size: queue length, in records
+        :param policy: block, drop or spill, for a full queue
+        :param batch: most records formatted per write to the sink
+        """
+        if policy not in POLICIES:
+            raise Exception('>>> Overflow policy must be {}, was "{found}" <<<'.format(' or '.join(POLICIES),
+                                                                                        found=policy))
+        if size < 1 or batch < 1:
+            raise Exception('>>> Queue & batch sizes must be positive, were {} & {} <<<'.format(size, batch))
+        self.sink = sink
+        self.policy = policy
+        self.batch = batch
+        self.queue = Queue(size)
+        self.spill = TemporaryFile() if policy == 'spill' else None
+        self.lock = Lock()
+        self.read_at = 0
+        self.pending = 0  # spilled records not yet announced to the writer thread
+        self.counters = {'queued': 0, 'written': 0, 'dropped': 0, 'spilled': 0, 'peak': 0}
+        self.error = None
+        self.thread = Thread(target=self.drain, name='plot writer', daemon=True)
+        self.thread.start()
+
+    def write(self, *values):
+        self.counters['queued'] += 1
+        if self.pending:
+            self.to_disk(values)
+            return
+        try:
+            self.queue.put_nowait(values)
+        except Full:
+            if self.policy == 'block':
+                self.queue.put(values)
+            elif self.policy == 'drop':
+                self.replace(values)
+            else:
+                self.to_disk(values)
+        self.counters['peak'] = max(self.counters['peak'], self.queue.qsize())
+
+    def replace(self, values):
+        while True:
+            try:
+                self.queue.get_nowait()
+                self.counters['dropped'] += 1
+            except Empty:
+                pass
+            try:
+                self.queue.put_nowait(values)
+                return
+            except Full:
+                continue
+
+    def to_disk(self, values):
+        with self.lock:
+            self.spill.seek(0, 2)
+            dump(values, self.spill)
+        self.counters['spilled'] += 1
+        self.pending += 1
+        try:
+            self.queue.put_nowait(self.pending)  # records queued after this marker were written after the spill
+            self.pending = 0
+        except Full:
+            pass
+
+    def from_disk(self, count):
+        with self.lock:
+            self.spill.seek(self.read_at)
+            records = [load(self.spill) for _ in range(count)]
+            self.read_at = self.spill.tell()
+        return records
+
+    def drain(self):
+        finished = False
+        while not finished:
+            records = []
+            item = self.queue.get()
+            while True:
+                if item is None:
+                    finished = True
+                    break
+                if isinstance(item, int):
+                    records.extend(self.from_disk(item))
+                else:
+                    records.append(item)
+                if len(records) >= self.batch:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except Empty:
+                    break
+            if records and self.error is None:
+                try:
+                    self.sink.batch(records)
+                    self.sink.flush()
+                    self.counters['written'] += len(records)
+                except Exception as e:  # e.g. a broken pipe, keep draining so that write() never blocks for ever
+                    self.error = e
+
+    def close(self):
+        """
+        Write everything still queued or spilled, then report the counters to stderr as JSON
+        """
+        if self.pending:
+            self.queue.put(self.pending)
+            self.pending = 0
+        self.queue.put(None)
+        self.thread.join()
+        if self.spill:
+            self.spill.close()
+        print(dumps(self.counters, separators=(',', ':')), file=stderr)
+        if self.error is not None:
+            raise self.error
+
+
+print(__name__ + " module loaded", file=stderr)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, redirect_stdout
+from glob import glob
+from importlib import import_module
+from itertools import product
+from json import loads, dumps
+from os import cpu_count, makedirs, dup, dup2, close
+from os.path import basename, join
+from signal import signal, setitimer, SIGALRM, ITIMER_REAL
+from sys import stdin, stdout, stderr, argv
+from time import perf_counter
+from Backend import select
+
+SIMULATORS = {  # "Simulator" field: module providing simulate(ic) & its default mpfr precision
+    'Bh3d': ('Bh3d', 113),
+    'Newton': ('Newton', 113),
+    'Bh': ('Bh', 236),
+    'DoublePendulum': ('DoublePendulum', 236),
+}
+
+
+def documents(config):
+    """
+    Expand a batch configuration into IC documents
+    :param config: "ics" is a list of IC file names or globs, "grid" maps IC fields to lists of values, varied over
+    "base" (a file name or IC dictionary), "simulator" is used where a document has none, "set" overrides IC fields
+    :return: a list of (source, document) pairs
+    """
+    found = []
+    for pattern in config.get('ics', []):
+        for name in sorted(glob(pattern)):
+            found.append((basename(name), loads(open(name).read())))
+    if 'grid' in config:
+        base = config['base']
+        base = loads(open(base).read()) if isinstance(base, str) else base
+        keys = sorted(config['grid'])
+        for values in product(*(config['grid'][key] for key in keys)):
+            point = dict(zip(keys, values))
+            document = loads(dumps(base))
+            (document['IC'] if 'IC' in document else document).update(point)
+            found.append((','.join('{}={}'.format(key, value) for key, value in point.items()), document))
+    for i, (source, document) in enumerate(found):
+        if 'IC' not in document:  # bare IC dictionaries, as in ic/
+            found[i] = source, document = source, {'IC': document}
+        document.setdefault('Simulator', config.get('simulator'))
+        document['IC'].update(config.get('set', {}))
+        if document['Simulator'] not in SIMULATORS:
+            raise Exception('>>> Simulator for {} must be {}, was "{found}" <<<'.format(
+                source, ' or '.join(SIMULATORS), found=document['Simulator']))
+    return found
+
+
+@contextmanager
+def redirect_stderr(f):  # the models print to the stderr they imported, so redirect the file descriptor itself
+    stderr.flush()
+    saved = dup(2)
+    dup2(f.fileno(), 2)
+    try:
+        yield
+    finally:
+        stderr.flush()
+        dup2(saved, 2)
+        close(saved)
+
+
+def expired(signum, frame):
+    raise TimeoutError('>>> Run timed out <<<')
+
+
+def execute(run, source, document, directory, timeout, retries):
+    """
+    One run in a worker process, the plot goes to <run>.out & the logs to <run>.err; on a RuntimeError (no convergence)
+    the run is repeated with half the step, and twice the plot ratio so that the output times are unchanged
+    :return: a summary dictionary
+    """
+    module, precision = SIMULATORS[document['Simulator']]
+    simulate = import_module(module).simulate
+    plot, log = join(directory, run + '.out'), join(directory, run + '.err')
+    attempts = 0
+    start = perf_counter()
+    while True:
+        attempts += 1
+        with open(plot, 'w') as out, open(log, 'a' if attempts > 1 else 'w') as err:
+            with redirect_stdout(out), redirect_stderr(err):
+                signal(SIGALRM, expired)
+                setitimer(ITIMER_REAL, timeout)
+                try:
+                    text = dumps(document)
+                    simulate(loads(text, parse_float=select(document['IC'], precision))['IC'])
+                    status = 'ok'
+                except RuntimeError as e:
+                    status = 'failed: {}'.format(e)
+                except TimeoutError:
+                    status = 'timeout'
+                except Exception as e:
+                    status = 'error: {}'.format(e)
+                finally:
+                    setitimer(ITIMER_REAL, 0)
+        if not status.startswith('failed') or attempts > retries:
+            break
+        ic = document['IC']
+        ic['step'], ic['plotratio'] = ic['step'] / 2, ic['plotratio'] * 2
+    return {'run': run, 'source': source, 'simulator': document['Simulator'], 'status': status, 'attempts': attempts,
+            'step': document['IC']['step'], 'lines': sum(1 for _ in open(plot)),
+            'seconds': perf_counter() - start}
+
+
+def batch(config):
+    """
+    Run every IC in the configuration, in parallel, one process per core unless "workers" is given
+    :return: summaries in run order
+    """
+    directory = config.get('output', 'batch')
+    makedirs(directory, exist_ok=True)
+    jobs = documents(config)
+    width = len(str(len(jobs)))
+    timeout, retries = config.get('timeout', 3600), config.get('retries', 1)
+    summaries = []
+    with ProcessPoolExecutor(config.get('workers') or cpu_count()) as pool:
+        futures = [pool.submit(execute, 'run-{:0{}d}'.format(i, width), source, document, directory, timeout, retries)
+                   for i, (source, document) in enumerate(jobs)]
+        for future in as_completed(futures):
+            summary = future.result()
+            print('{run} {status}'.format(**summary), file=stderr)
+            summaries.append(summary)
+    summaries.sort(key=lambda s: s['run'])
+    with open(join(directory, 'summary.json'), 'w') as f:
+        for summary in summaries:
+            f.write(dumps(summary) + '\n')
+    return summaries
+
+
+class Tagged(object):
+    """
+    Text stream adding a run id to every line written, as a "run" field of JSON objects, otherwise as a first column
+    """
+    def __init__(self, out, run):
+        self.out = out
+        self.run = dumps(run)
+        self.pending = ''
+
+    def write(self, text):
+        *lines, self.pending = (self.pending + text).split('\n')
+        for line in lines:
+            if line.startswith('{'):
+                self.out.write('{"run":' + self.run + ('' if line.startswith('{}') else ',') + line[1:] + '\n')
+            else:
+                self.out.write(self.run + ' ' + line + '\n')
+        return len(text)
+
+    def flush(self):
+        self.out.flush()
+
+
+def stream(lines, simulator):
+    """
+    Warm process mode, IC documents one per line are dispatched on their "Simulator" field, in this process
+    :param lines: iterable of JSON IC documents, an optional top level "run" field is the run id, else the line number
+    :param simulator: for documents without a "Simulator" field
+    """
+    for n, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        start = perf_counter()
+        run, name = n, simulator  # until the document is known to be good
+        try:
+            document = loads(line)
+            run = document.get('run', n)
+            name = document.get('Simulator', simulator)
+            if name not in SIMULATORS:
+                raise Exception('>>> Simulator must be {}, was "{found}" <<<'.format(
+                    ' or '.join(SIMULATORS), found=name))
+            module, precision = SIMULATORS[name]
+            simulate = import_module(module).simulate
+            with redirect_stdout(Tagged(stdout, run)):
+                simulate(loads(line, parse_float=select(document['IC'], precision))['IC'])
+            status = 'ok'
+        except Exception as e:
+            status = 'error: {}'.format(e)
+        stdout.flush()
+        print(dumps({'run': run, 'simulator': name, 'status': status, 'seconds': perf_counter() - start}), file=stderr)
+
+
+def table(summaries):
+    """
+    :return: the summaries as a plain text table, one row per run
+    """
+    columns = ('run', 'simulator', 'status', 'attempts', 'step', 'lines', 'seconds', 'source')
+    rows = [columns] + [tuple('{:.3f}'.format(s[c]) if c == 'seconds' else str(s[c]) for c in columns)
+                        for s in summaries]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return '\n'.join('  '.join(cell.ljust(w) for cell, w in zip(row, widths)).rstrip() for row in rows)
+
+
+if __name__ == "__main__":
+    #  Example: echo '{"ics": ["ic/Light*"], "simulator": "Bh3d", "set": {"integrator": "b4", "scheme": "suzuki",
+    #           "cross": false, "end": 10.0}, "output": "/tmp/batch"}' | ./Batch.py
+    #  Example: echo '{"base": "initial-conditions.json", "grid": {"a": [0.0, 0.5, 1.0], "th0": [0.0, 30.0, 60.0]},
+    #           "timeout": 600, "retries": 2}' | ./Batch.py
+    #  Per-run plots & logs are written to "output" (default ./batch), with summary.json, the table goes to stdout
+    print("Batch: {}".format(argv[0]), file=stderr)
+    print(table(batch(loads(open(argv[1]).read() if len(argv) == 2 else stdin.read()))))
+else:
+    print(__name__ + " module loaded", file=stderr)
@@ -16,144 +16,202 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 
 from json import loads
 from sys import stdin, stderr, argv
-from gmpy2 import get_context, mpfr, sqrt, sin, cos, acos
+from gmpy2 import get_context
 get_context().precision = 236  # Set this BEFORE importing or defining any Taylor Series / Dual Number stuff!
+from Backend import select, require, number, acos, sin, cos
+from Symplectic import Symplectic
+from Implicit import Implicit
+from Tangent import Tangent
+from Instrument import Instrument
+from Binary import writer, close
+from Batch import stream
+from Reducers import reducers, report
+from Events import events
 from dual import Dual
 
 #  ./Bh.py <initial-conditions.json | ./filegraphics-pi.py initial-conditions.json &
 #  ./Bh.py <initial-conditions.json | ./plotErrors.py initial-conditions.json tau 1 &
 
-# noinspection PyArgumentList
-D05 = mpfr('0.5')
-
-# noinspection PyArgumentList
-def make_mpfr(x):
-    return mpfr(str(x)) if isinstance(x, float) else mpfr(x) if isinstance(x, (int, str)) else x
-
+D05 = 0.5  # exact in any backend
+TAO_INTEGRATORS = ('b2', 'b4', 'b6', 'b8', 'b10', 's5odr4', 's9odr6', 's15odr8', 's17odr8')  # compositions of b2
+FIELDS = ('tau', 'v4e', 'H', 'E', 'L', 'Q', 't', 'r', 'th', 'ph')  # plot values, in order
+REDUCE = {'v4e': 'error', 'r': 'range', 'E': 'drift', 'L': 'drift', 'Q': 'drift'}  # for "reduce": true
+EVENTS = (('periapsis', 'apoapsis'), ('th_min', 'th_max'), ('equator', 'equator'), ('horizon_exit', 'horizon_entry'))
 
 class Kerr(object):
+    __slots__ = ('rs', 'a', 'q', 'μ2', 'qt', 'qr', 'qθ', 'qφ', 'pt', 'pr', 'pθ', 'pφ', 'implicit', 'h0', 'ω',
+                 'xt', 'xr', 'xθ', 'xφ', 'yt', 'yr', 'yθ', 'yφ', 'writer', 'reducer', 'events',
+                 'trajectory', 'π_2')
+    EXACT_FLOWS = ('q',)  # updates Symplectic may merge, p_update mixes the extended phase space copies
 
-    def __init__(self, m, a, q, μ2, e, lz, cc, r0, θ0, ε):
+    def __init__(self, m, a, q, μ2, e, lz, cc, r0, θ0, ε, ω=None, stages=1):
+        require(('mpfr', 'float'), 'Kerr')  # Dual numbers throughout
         self.rs = 2 * m
         self.a = a
         self.q = q
         self.μ2 = μ2
-        self.qt = make_mpfr(0)
+        self.qt = number(0)
         self.qr = Dual.get(r0)
-        self.qθ = Dual.get((make_mpfr(90.0) - θ0) * acos(make_mpfr(-1)) / make_mpfr(180.0))
-        self.qφ = make_mpfr(0)
+        self.qθ = Dual.get((number(90.0) - θ0) * acos(number(-1)) / number(180.0))
+        self.qφ = number(0)
         self.pt = Dual.get(- e)
-        self.pr = Dual.get(make_mpfr(0))
+        self.pr = Dual.get(number(0))
         self.pθ = (cc - self.qθ.cos.sqr * (a**2 * (μ2 - e**2) + (lz / self.qθ.sin).sqr)).sqrt
         self.pφ = Dual.get(lz)
-        self.qr_prev = self.qr.val + 0.001
-        self.qθ_prev = self.qθ.val + 0.001
-        self.pr_prev = self.pr.val + 0.001
-        self.pθ_prev = self.pθ.val + 0.001
-        self.ε = ε
+        self.implicit = Implicit(self.hamiltonian, 4, stages, ε)
         self.h0 = self.h(self.qr, self.qθ, self.pt, self.pr, self.pθ, self.pφ).val
+        self.ω = ω  # extended phase space copies, for the explicit (Tao) integrator
+        self.xt, self.xr, self.xθ, self.xφ = self.qt, Dual.get(self.qr.val), Dual.get(self.qθ.val), self.qφ
+        self.yt, self.yr, self.yθ, self.yφ = (Dual.get(p.val) for p in (self.pt, self.pr, self.pθ, self.pφ))
+        self.writer = None  # JSON lines, unless a binary Writer is set
+        self.reducer = None  # or Reducers, fed every step
+        self.events = None  # or Events, checked every step
+        self.π_2 = acos(number(0))
+        self.trajectory = True
 
     def h(self, qr, qθ, pt, pr, pθ, pφ):  # MTW p.900 equation 33.35
         Δ = qr.sqr - self.rs * qr + self.a**2 + self.q
         return D05 * (- ((qr.sqr + self.a**2) * pt + self.a * pφ).sqr / Δ + Δ * pr.sqr + pθ.sqr
                       + ((pφ + self.a * qθ.sin.sqr * pt) / qθ.sin).sqr) / (qr.sqr + self.a**2 * qθ.cos.sqr)
 
-    def qt_update(self, δτ):
-        return self.qt + D05 * δτ * self.h(self.qr, self.qθ, self.pt.var, self.pr, self.pθ, self.pφ).der
-
-    def qr_implicit(self, δτ, r):
-        return self.qr.val - r + D05 * δτ * self.h(Dual.get(r), self.qθ, self.pt, self.pr.var, self.pθ, self.pφ).der
-
-    def qθ_implicit(self, δτ, θ):
-        return self.qθ.val - θ + D05 * δτ * self.h(self.qr, Dual.get(θ), self.pt, self.pr, self.pθ.var, self.pφ).der
-
-    def qφ_update(self, δτ):
-        return self.qφ + D05 * δτ * self.h(self.qr, self.qθ, self.pt, self.pr, self.pθ, self.pφ.var).der
-
-    def q_update_1(self, δτ):
-        qr = secant(self.qr_implicit, self.qr.val, self.qr_prev, δτ, self.ε)
-        qθ = secant(self.qθ_implicit, self.qθ.val, self.qθ_prev, δτ, self.ε)
-        self.qr_prev = self.qr.val
-        self.qθ_prev = self.qθ.val
-        self.qr = Dual.get(qr)
-        self.qθ = Dual.get(qθ)
-        self.qt = self.qt_update(δτ)
-        self.qφ = self.qφ_update(δτ)
-
-    def q_update_2(self, δτ):
-        qr = self.qr.val + D05 * δτ * self.h(self.qr, self.qθ, self.pt, self.pr.var, self.pθ, self.pφ).der
-        qθ = self.qθ.val + D05 * δτ * self.h(self.qr, self.qθ, self.pt, self.pr, self.pθ.var, self.pφ).der
-        self.qr = Dual.get(qr)
-        self.qθ = Dual.get(qθ)
-        self.qt = self.qt_update(δτ)
-        self.qφ = self.qφ_update(δτ)
-
-    def pr_implicit(self, δτ, pr):
-        qr = self.qr.var
-        return self.pr.val - pr - D05 * δτ * (self.h(qr, self.qθ, self.pt, self.pr, self.pθ, self.pφ).der
-                                            + self.h(qr, self.qθ, self.pt, Dual.get(pr), self.pθ, self.pφ).der)
-
-    def pθ_implicit(self, δτ, pθ):
-        qθ = self.qθ.var
-        return self.pθ.val - pθ - D05 * δτ * (self.h(self.qr, qθ, self.pt, self.pr, self.pθ, self.pφ).der
-                                            + self.h(self.qr, qθ, self.pt, self.pr, Dual.get(pθ), self.pφ).der)
-
-    def p_update(self, δτ):
-        pr = secant(self.pr_implicit, self.pr.val, self.pr_prev, δτ, self.ε)
-        pθ = secant(self.pθ_implicit, self.pθ.val, self.pθ_prev, δτ, self.ε)
-        self.pr_prev = self.pr.val
-        self.pθ_prev = self.pθ.val
-        self.pr = Dual.get(pr)
-        self.pθ = Dual.get(pθ)
-
-    def stormer_verlet(self, δτ):
-        self.q_update_1(δτ)
-        self.p_update(δτ)
-        self.q_update_2(δτ)
-
-    def solve(self, δτ, start, end, tr):
-        τ = make_mpfr(0.0)
+    def hamiltonian(self, q, p):  # for the implicit engine
+        return self.h(q[1], q[2], p[0], p[1], p[2], p[3])
+
+    def gauss_legendre(self, δτ):
+        y = self.implicit.step([self.qt, self.qr.val, self.qθ.val, self.qφ,
+                                self.pt.val, self.pr.val, self.pθ.val, self.pφ.val], δτ)
+        self.qt, self.qφ = y[0], y[3]
+        self.qr.val, self.qθ.val, self.pt.val, self.pr.val, self.pθ.val, self.pφ.val = y[1:3] + y[4:]
+
+    def gradient(self, qr, qθ, pt, pr, pθ, pφ):  # all six partials in one pass
+        return self.h(*Tangent.variables([qr.val, qθ.val, pt.val, pr.val, pθ.val, pφ.val])).grad
+
+    def q_update(self, δτ):  # Tao's H(q, y) flow, exact as q & y are constant
+        h_qr, h_qθ, h_pt, h_pr, h_pθ, h_pφ = self.gradient(self.qr, self.qθ, self.yt, self.yr, self.yθ, self.yφ)
+        self.pr.val -= δτ * h_qr
+        self.pθ.val -= δτ * h_qθ
+        self.xt += δτ * h_pt
+        self.xr.val += δτ * h_pr
+        self.xθ.val += δτ * h_pθ
+        self.xφ += δτ * h_pφ
+
+    def x_update(self, δτ):  # Tao's H(x, p) flow, exact as x & p are constant
+        h_qr, h_qθ, h_pt, h_pr, h_pθ, h_pφ = self.gradient(self.xr, self.xθ, self.pt, self.pr, self.pθ, self.pφ)
+        self.yr.val -= δτ * h_qr
+        self.yθ.val -= δτ * h_qθ
+        self.qt += δτ * h_pt
+        self.qr.val += δτ * h_pr
+        self.qθ.val += δτ * h_pθ
+        self.qφ += δτ * h_pφ
+
+    def mix(self, δτ):  # exact flow of ω/2 (|q - x|^2 + |p - y|^2), binding the two copies together
+        c, s = cos(2 * self.ω * δτ), sin(2 * self.ω * δτ)
+
+        def rotate(q, p, x, y):
+            sum_q, sum_p, dif_q, dif_p = q + x, p + y, q - x, p - y
+            dif_q, dif_p = c * dif_q + s * dif_p, c * dif_p - s * dif_q
+            return D05 * (sum_q + dif_q), D05 * (sum_p + dif_p), D05 * (sum_q - dif_q), D05 * (sum_p - dif_p)
+
+        self.qt, pt, self.xt, yt = rotate(self.qt, self.pt.val, self.xt, self.yt.val)
+        qr, pr, xr, yr = rotate(self.qr.val, self.pr.val, self.xr.val, self.yr.val)
+        qθ, pθ, xθ, yθ = rotate(self.qθ.val, self.pθ.val, self.xθ.val, self.yθ.val)
+        self.qφ, pφ, self.xφ, yφ = rotate(self.qφ, self.pφ.val, self.xφ, self.yφ.val)
+        self.qr.val, self.qθ.val, self.xr.val, self.xθ.val = qr, qθ, xr, xθ
+        self.pt.val, self.pr.val, self.pθ.val, self.pφ.val = pt, pr, pθ, pφ
+        self.yt.val, self.yr.val, self.yθ.val, self.yφ.val = yt, yr, yθ, yφ
+
+    def p_update(self, δτ):  # symmetric, so Symplectic's compositions of b2 give Tao's ABCBA and its higher orders
+        self.x_update(D05 * δτ)
+        self.mix(δτ)
+        self.x_update(D05 * δτ)
+
+    def solve(self, method, δτ, start, end, tr):
+        τ = number(0.0)
         i = 0
         while τ < end:
-            if τ >= start and i % tr == 0:
-                self.plot(τ)
-            self.stormer_verlet(δτ)
+            if τ >= start:
+                if self.trajectory and i % tr == 0:
+                    self.plot(τ)
+                if self.reducer:
+                    self.reduce(τ)
+                if self.events:
+                    self.detect(τ)
+            method()
             i += 1
             τ = δτ * i
-        self.plot(τ)
+        if self.trajectory:
+            self.plot(τ)
+        if self.reducer:
+            self.reduce(τ)
+        if self.events:
+            self.detect(τ)
+
+    def values(self, τ):
+        h = self.h(self.qr, self.qθ, self.pt, self.pr, self.pθ, self.pφ).val
+        q = (self.pθ.sqr + self.qθ.cos.sqr * (self.a**2 * (self.μ2 - self.pt.sqr) + (self.pφ / self.qθ.sin).sqr)).val
+        return τ, h - self.h0, h, - self.pt.val, self.pφ.val, q, self.qt, self.qr.val, self.qθ.val, self.qφ
+
+    def reduce(self, τ):
+        self.reducer.update(self.values(τ))
+
+    def detect(self, τ):  # turning points of r & θ, equator & horizon crossings
+        h_qr, h_qθ, h_pt, h_pr, h_pθ, h_pφ = self.gradient(self.qr, self.qθ, self.pt, self.pr, self.pθ, self.pφ)
+        r = self.qr.val
+        self.events.update(self.values(τ), (1, None, None, None, None, None, h_pt, h_pr, h_pθ, h_pφ),
+                           (self.pr.val, self.pθ.val, self.qθ.val - self.π_2, r**2 - self.rs * r + self.a**2 + self.q),
+                           (- h_qr, - h_qθ, h_pθ, (2 * r - self.rs) * h_pr))
 
     def plot(self, τ):
-        h = self.h(self.qr, self.qθ, self.pt, self.pr, self.pθ, self.pφ).val
-        print(f'{{"tau":{τ:.9e},"v4e":{h - self.h0:.9e},"H":{h:.9e},"E":{- self.pt.val:.9e},"L":{self.pφ.val:.9e},'
-              f'"Q":{(self.pθ.sqr + self.qθ.cos.sqr * (self.a**2 * (self.μ2 - self.pt.sqr) + (self.pφ / self.qθ.sin).sqr)).val:.9e},'
-              f'"t":{self.qt:.9e},"r":{self.qr.val:.9e},"th":{self.qθ.val:.9e},"ph":{self.qφ:.9e}}}')
-
-
-def secant(f, a, b, h, ε, limit=101):
-    f_a = f(h, a)
-    f_b = f(h, b)
-    count = δx = c = f_c = 1
-    while abs(f_c) > ε or abs(δx) > ε:
-        if count == limit:
-            raise RuntimeError("{}\n Giving up after {} iterations, value {}, previous {}".format(f, count - 1, a, b))
-        c = (b * f_a - a * f_b) / (f_a - f_b)
-        f_c = f(h, c)
-        b = a
-        f_b = f_a
-        a = c
-        f_a = f_c
-        δx = b - a
-        count += 1
-    return c
+        τ, v4e, h, e, lz, q, t, r, θ, φ = self.values(τ)
+        if self.writer:
+            self.writer.write(τ, v4e, h, e, lz, q, t, r, θ, φ)
+        else:
+            print(f'{{"tau":{τ:.9e},"v4e":{v4e:.9e},"H":{h:.9e},"E":{e:.9e},"L":{lz:.9e},'
+                  f'"Q":{q:.9e},"t":{t:.9e},"r":{r:.9e},"th":{θ:.9e},"ph":{φ:.9e}}}')
+
+
+def simulate(ic):
+    """
+    One run, plotting to stdout
+    :param ic: the "IC" dictionary, its numbers parsed by the selected backend
+    """
+    step = ic['step']
+    monitor = Instrument(ic)
+    bh = monitor.attach(Kerr(ic['M'], ic['a'], ic['q'], ic['mu'], ic['E'], ic['L'], ic['Q'], ic['r0'], ic['th0'],
+                             ic['tol'], ic.get('omega'), ic.get('stages', 1)))
+    bh.trajectory = ic.get('trajectory', True)
+    bh.writer = writer(ic, FIELDS) if bh.trajectory else None
+    bh.reducer = reducers(ic, FIELDS, REDUCE)
+    bh.events = events(ic, FIELDS, EVENTS)
+    if 'integrator' in ic:
+        if ic['integrator'] not in TAO_INTEGRATORS:
+            raise Exception('>>> Extended phase space integrator must be {}, was "{found}" <<<'.format(
+                ', '.join(TAO_INTEGRATORS), found=ic['integrator']))
+        if not ic.get('omega', 0) > 0:
+            raise Exception('>>> Extended phase space integrator needs a positive binding "omega", was {} <<<'.format(
+                ic.get('omega')))
+        integrator = monitor.attach(Symplectic(bh, step, ic['integrator'], ic.get('scheme', 'yoshida')), ('step',))
+        bh.solve(integrator.method, step, ic['start'], ic['end'], ic['plotratio'])
+    else:
+        monitor.attach(bh.implicit, ('step', 'field', 'jacobian'), histogram='iterations')
+        bh.solve(lambda: bh.gauss_legendre(step), step, ic['start'], ic['end'], ic['plotratio'])
+        print(bh.implicit.summary(), file=stderr)
+    close(bh.writer)
+    report(bh.reducer, bh.trajectory)
+    monitor.report()
+
 
 if __name__ == "__main__":
     #  Example: ./Bh.py initial-conditions.json  | ./filegraphics-pi.py initial-conditions.json
+    #  With "integrator" (and "scheme") set, the explicit extended phase space method is used, binding "omega" needed
+    #  Otherwise Gauss-Legendre collocation, "stages" 1 (implicit midpoint, default), 2 or 3, solved to "tol"
     print("Simulator: {}".format(argv[0]), file=stderr)
-    input_data = open(argv[1]).read() if len(argv) == 2 else stdin.read()
-    ic = loads(input_data, parse_float=mpfr)['IC']
-    print(input_data, file=stderr)
-    step = ic['step']
-    bh = Kerr(ic['M'], ic['a'], ic['q'], ic['mu'], ic['E'], ic['L'], ic['Q'], ic['r0'], ic['th0'], ic['tol'])
-    bh.solve(step, ic['start'], ic['end'], ic['plotratio'])
+    if argv[1:] == ['--jsonl']:  # warm process, IC documents one per line, output lines tagged by run
+        stream(stdin, 'Bh')
+    else:
+        input_data = open(argv[1]).read() if len(argv) == 2 else stdin.read()
+        ic = loads(input_data, parse_float=select(loads(input_data)['IC'], 236))['IC']
+        print(input_data, file=stderr)
+        simulate(ic)
 else:
     print(__name__ + " module loaded", file=stderr)
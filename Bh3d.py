@@ -16,14 +16,35 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 
 from json import loads
 from sys import stdin, stderr, argv
-from gmpy2 import get_context, mpfr, acos, sqrt
-get_context().precision = 113  # Set this BEFORE importing any Taylor Series stuff!
-from Symplectic import Symplectic, D1, D2, D0
-from dual import Dual, make_mpfr
+from gmpy2 import get_context
+get_context().precision = 113  # Set this BEFORE importing any Taylor Series stuff! (default, see Backend.select)
+from Symplectic import Symplectic
+from Backend import select, require, number, acos, sqrt, sin, cos
+from Instrument import Instrument
+from Binary import writer, close
+from Batch import stream
+from Reducers import reducers, report
+from Events import events
+from dual import Dual
+
+
+GRADIENTS = ('dual', 'analytic')
+FIELDS = ('mino', 'tau', 'v4e', 'ER', 'ETh', 't', 'r', 'th', 'ph')  # plot values, in order
+REDUCE = {'v4e': 'error', 'ER': 'error', 'ETh': 'error', 'r': 'range'}  # for "reduce": true
+EVENTS = (('periapsis', 'apoapsis'), ('th_min', 'th_max'), ('equator', 'equator'), ('horizon_exit', 'horizon_entry'))
 
 
 class BhSymp(object):
-    def __init__(self, a, μ2, e, lz, cc, r0, θ0, xh):
+    __slots__ = ('refresh', 'writer', 'reducer', 'events', 'trajectory', 'a', 'μ2', 'E', 'L', 'a2', 'a2μ2', 'aE', 'aL', 'K',
+                 't', 'r', 'θ', 'φ', 'cross', 'π_2', 'ur', 'uθ', 'ra2', 'Δ', 'R', 'dR', 'sin2θ', 'Θ', 'dΘ', 'Σ', 'ut', 'uφ')  # state, then refreshed intermediates
+    EXACT_FLOWS = ('p',)  # updates Symplectic may merge, t & φ drift with the velocities of the last refresh
+
+    def __init__(self, a, μ2, e, lz, cc, r0, θ0, xh, gradient='dual'):
+        if gradient not in GRADIENTS:
+            raise Exception('>>> Gradient must be {}, was "{found}" <<<'.format(' or '.join(GRADIENTS), found=gradient))
+        if gradient == 'dual':
+            require(('mpfr', 'float'), 'Dual gradient')  # use "gradient": "analytic" for dd
+        self.refresh = self.refresh_analytic if gradient == 'analytic' else self.refresh_dual
         self.a = a
         self.μ2 = μ2
         self.E = e
@@ -33,71 +54,147 @@ class BhSymp(object):
         self.aE = a * e
         self.aL = a * lz
         self.K = cc + (lz - self.aE)**2
-        self.t = make_mpfr(0)
-        self.r = Dual.get(r0, variable=True)
-        self.θ = Dual.get((make_mpfr(90) - θ0) * acos(make_mpfr(-1)) / make_mpfr(180), variable=True)
-        self.φ = make_mpfr(0)
+        self.t = number(0)
+        self.r = number(r0)
+        self.θ = (number(90) - θ0) * acos(number(-1)) / number(180)
+        self.φ = number(0)
         self.cross = xh
+        self.writer = None  # JSON lines, unless a binary Writer is set
+        self.reducer = None  # or Reducers, fed every step
+        self.events = None  # or Events, checked every step
+        self.trajectory = True
+        self.π_2 = acos(number(0))
         self.refresh()
-        self.ur = - sqrt(self.R.val if self.R.val >= D0 else - self.R.val)
-        self.uθ = - sqrt(self.Θ.val if self.Θ.val >= D0 else - self.Θ.val)
+        self.ur = - sqrt(self.R if self.R >= 0 else - self.R)
+        self.uθ = - sqrt(self.Θ if self.Θ >= 0 else - self.Θ)
+
+    def refresh_dual(self):  # R'(r) & Θ'(θ) from Dual numbers
+        r = Dual.get(self.r, variable=True)
+        r2 = r.sqr
+        ra2 = r2 + self.a2
+        P = ra2 * self.E - self.aL
+        Δ = ra2 - 2 * r
+        R = P.sqr - Δ * (self.μ2 * r2 + self.K)
+        sin2θ = Dual.get(self.θ, variable=True).sin.sqr
+        cos2θ = 1 - sin2θ
+        T = self.aE * sin2θ - self.L
+        Θ = self.K - self.a2μ2 * cos2θ - T.sqr / sin2θ
+        self.ra2, self.Δ, self.R, self.dR = ra2.val, Δ.val, R.val, R.der
+        self.sin2θ, self.Θ, self.dΘ = sin2θ.val, Θ.val, Θ.der
+        P_Δ = P.val / self.Δ
+        self.Σ = r2.val + self.a2 * cos2θ.val
+        self.ut = P_Δ * self.ra2 - T.val * self.a
+        self.uφ = P_Δ * self.a - T.val / self.sin2θ
 
-    def refresh(self):
-        r2 = self.r.sqr
+    def refresh_analytic(self):  # closed-form R'(r) & Θ'(θ) on plain numbers, as in KdS.f90 (any backend)
+        r2 = self.r * self.r
         self.ra2 = r2 + self.a2
         P = self.ra2 * self.E - self.aL
-        self.Δ = self.ra2 - D2 * self.r
-        self.R = P.sqr - self.Δ * (self.μ2 * r2 + self.K)
-        self.sin2θ = self.θ.sin.sqr
-        cos2θ = D1 - self.sin2θ
+        self.Δ = self.ra2 - 2 * self.r
+        μ2r2K = self.μ2 * r2 + self.K
+        self.R = P * P - self.Δ * μ2r2K
+        self.dR = 4 * self.r * self.E * P - 2 * (self.r - 1) * μ2r2K - 2 * self.μ2 * self.r * self.Δ
+        sinθ, cosθ = sin(self.θ), cos(self.θ)
+        self.sin2θ = sinθ * sinθ
+        cos2θ = 1 - self.sin2θ
         T = self.aE * self.sin2θ - self.L
-        self.Θ = self.K - self.a2μ2 * cos2θ - T.sqr / self.sin2θ
-        P_Δ = P.val / self.Δ.val
-        self.Σ = r2.val + self.a2 * cos2θ.val
-        self.ut = P_Δ * self.ra2.val - T.val * self.a
-        self.uφ = P_Δ * self.a - T.val / self.sin2θ.val
+        T_sin2θ = T / self.sin2θ
+        self.Θ = self.K - self.a2μ2 * cos2θ - T * T_sin2θ
+        self.dΘ = 2 * sinθ * cosθ * (self.a2μ2 - 2 * self.aE * T_sin2θ + T_sin2θ * T_sin2θ)
+        P_Δ = P / self.Δ
+        self.Σ = r2 + self.a2 * cos2θ
+        self.ut = P_Δ * self.ra2 - T * self.a
+        self.uφ = P_Δ * self.a - T_sin2θ
 
     def p4_error(self, ut, ur, uθ, uφ):
-        return (self.μ2 + self.sin2θ.val / self.Σ * (self.a * ut - self.ra2.val * uφ)**2 + self.Σ / self.Δ.val * ur**2
-                + self.Σ * uθ**2 - self.Δ.val / self.Σ * (ut - self.a * self.sin2θ.val * uφ)**2)
+        return (self.μ2 + self.sin2θ / self.Σ * (self.a * ut - self.ra2 * uφ)**2 + self.Σ / self.Δ * ur**2
+                + self.Σ * uθ**2 - self.Δ / self.Σ * (ut - self.a * self.sin2θ * uφ)**2)
 
     def q_update(self, c):
         self.t += c * self.ut
-        self.r.val += c * self.ur
-        self.θ.val += c * self.uθ
+        self.r += c * self.ur
+        self.θ += c * self.uθ
         self.φ += c * self.uφ
         self.refresh()
 
     def p_update(self, d):
-        self.ur += 0.5 * d * self.R.der
-        self.uθ += 0.5 * d * self.Θ.der
+        self.ur += 0.5 * d * self.dR
+        self.uθ += 0.5 * d * self.dΘ
 
-    def solve(self, method, h, start, end, tr):
+    def solve(self, integrator, h, start, end, tr):
         mino = τ = 0.0
         i = 0
-        while (τ < end) and (self.cross or self.Δ.val > D0):
-            if τ >= start and i % tr == 0:
-                self.plot(mino, τ, self.ut / self.Σ, self.ur / self.Σ, self.uθ / self.Σ, self.uφ / self.Σ)
-            method()
+        while (τ < end) and (self.cross or self.Δ > 0):
+            if τ >= start:
+                if self.trajectory and i % tr == 0:
+                    integrator.observe(self.plot, mino, τ)
+                if self.reducer:
+                    integrator.observe(self.reduce, mino, τ)
+                if self.events:
+                    integrator.observe(self.detect, mino, τ)
+            integrator.step()
             i += 1
             mino = h * i
             τ += h * self.Σ
-        self.plot(mino, τ, self.ut / self.Σ, self.ur / self.Σ, self.uθ / self.Σ, self.uφ / self.Σ)
-
-    def plot(self, mino, τ, ut, ur, uθ, uφ):
-        print(f'{{"mino":{mino:.9e},"tau":{τ:.9e},"v4e":{self.p4_error(ut, ur, uθ, uφ):.9e},'
-              f'"ER":{ur**2 - self.R.val / self.Σ**2:.9e},"ETh":{uθ**2 - self.Θ.val / self.Σ**2:.9e},'
-              f'"t":{self.t:.9e},"r":{self.r.val:.9e},"th":{self.θ.val:.9e},"ph":{self.φ:.9e}}}')
+        if self.trajectory:
+            integrator.observe(self.plot, mino, τ)
+        if self.reducer:
+            integrator.observe(self.reduce, mino, τ)
+        if self.events:
+            integrator.observe(self.detect, mino, τ)
+
+    def values(self, mino, τ):
+        ut, ur, uθ, uφ = self.ut / self.Σ, self.ur / self.Σ, self.uθ / self.Σ, self.uφ / self.Σ
+        return (mino, τ, self.p4_error(ut, ur, uθ, uφ), ur**2 - self.R / self.Σ**2, uθ**2 - self.Θ / self.Σ**2,
+                self.t, self.r, self.θ, self.φ)
+
+    def reduce(self, mino, τ):
+        self.reducer.update(self.values(mino, τ))
+
+    def detect(self, mino, τ):  # turning points of r & θ, equator & horizon crossings, rates by Mino time
+        self.events.update(self.values(mino, τ), (1, self.Σ, None, None, None, self.ut, self.ur, self.uθ, self.uφ),
+                           (self.ur, self.uθ, self.θ - self.π_2, self.Δ),
+                           (0.5 * self.dR, 0.5 * self.dΘ, self.uθ, 2 * (self.r - 1) * self.ur))
+
+    def plot(self, mino, τ):
+        mino, τ, v4e, er, eθ, t, r, θ, φ = self.values(mino, τ)
+        if self.writer:
+            self.writer.write(mino, τ, v4e, er, eθ, t, r, θ, φ)
+        else:
+            print(f'{{"mino":{mino:.9e},"tau":{τ:.9e},"v4e":{v4e:.9e},"ER":{er:.9e},"ETh":{eθ:.9e},'
+                  f'"t":{t:.9e},"r":{r:.9e},"th":{θ:.9e},"ph":{φ:.9e}}}')
+
+
+def simulate(ic):
+    """
+    One run, plotting to stdout
+    :param ic: the "IC" dictionary, its numbers parsed by the selected backend
+    """
+    monitor = Instrument(ic)
+    bh = monitor.attach(BhSymp(ic['a'], ic['mu'], ic['E'], ic['L'], ic['Q'], ic['r0'], ic['th0'], ic['cross'],
+                               ic.get('gradient', 'dual')))
+    bh.trajectory = ic.get('trajectory', True)
+    bh.writer = writer(ic, FIELDS) if bh.trajectory else None
+    bh.reducer = reducers(ic, FIELDS, REDUCE)
+    bh.events = events(ic, FIELDS, EVENTS)
+    step = ic['step']
+    integrator = monitor.attach(Symplectic(bh, step, ic['integrator'], ic['scheme']), ('step', 'observe'))
+    bh.solve(integrator, step, ic['start'], ic['end'], ic['plotratio'])
+    close(bh.writer)
+    report(bh.reducer, bh.trajectory)
+    monitor.report()
 
 
 if __name__ == "__main__":
     #  Example: ./Bh3d.py initial-conditions.json  | ./filegraphics-pi.py initial-conditions.json
+    #  "gradient" may be dual (default) or analytic, for closed-form potential derivatives on plain numbers
     print("Simulator: {}".format(argv[0]), file=stderr)
-    input_data = open(argv[1]).read() if len(argv) == 2 else stdin.read()
-    ic = loads(input_data, parse_float=mpfr)['IC']
-    print(input_data, file=stderr)
-    bh = BhSymp(ic['a'], ic['mu'], ic['E'], ic['L'], ic['Q'], ic['r0'], ic['th0'], ic['cross'])
-    step = ic['step']
-    bh.solve(Symplectic(bh, step, ic['integrator'], ic['scheme']).method, step, ic['start'], ic['end'], ic['plotratio'])
+    if argv[1:] == ['--jsonl']:  # warm process, IC documents one per line, output lines tagged by run
+        stream(stdin, 'Bh3d')
+    else:
+        input_data = open(argv[1]).read() if len(argv) == 2 else stdin.read()
+        ic = loads(input_data, parse_float=select(loads(input_data)['IC'], 113))['IC']
+        print(input_data, file=stderr)
+        simulate(ic)
 else:
     print(__name__ + " module loaded", file=stderr)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+from json import loads
+from sys import stdin, stderr, argv
+from numpy import array, zeros, ones, sqrt, sin, cos, where, errstate, logical_and, logical_or, flatnonzero
+from Symplectic import Symplectic
+from DoubleDouble import DoubleDouble, choose, sqrt as dd_sqrt, sin_cos as dd_sin_cos
+from Instrument import Instrument
+import Backend
+
+VECTORS = {  # array constructor & element-wise functions for each supported backend
+    'float': (lambda values: array(values, dtype=float), sqrt, lambda x: (sin(x), cos(x)), where),
+    'dd': (DoubleDouble.array, dd_sqrt, dd_sin_cos, choose),
+}
+
+
+class BhEnsemble(object):
+    EXACT_FLOWS = ('p',)  # updates Symplectic may merge, t & φ drift with the velocities of the last refresh
+
+    def __init__(self, a, μ2, e, lz, cc, r0, θ0, xh):  # e, lz, cc, r0 & θ0 are per-particle sequences
+        if Backend.current.name not in VECTORS:
+            raise Exception('>>> Ensemble backend must be {}, was "{found}" <<<'.format(
+                ' or '.join(VECTORS), found=Backend.current.name))
+        self.array, self.sqrt, self.sin_cos, self.where = VECTORS[Backend.current.name]
+        self.make = Backend.number
+        self.a = self.make(a)
+        self.μ2 = self.make(μ2)
+        self.E = self.array(e)
+        self.L = self.array(lz)
+        self.a2 = self.a**2
+        self.a2μ2 = self.a2 * self.μ2
+        self.aE = self.a * self.E
+        self.aL = self.a * self.L
+        self.K = self.array(cc) + (self.L - self.aE)**2
+        self.n = len(e)
+        self.t = self.array([0] * self.n)
+        self.r = self.array(r0)
+        self.θ = (90 - self.array(θ0)) * Backend.acos(self.make(-1)) / 180
+        self.φ = self.array([0] * self.n)
+        self.cross = xh
+        self.active = ones(self.n, dtype=bool)
+        self.refresh()
+        self.ur = - self.sqrt(abs(self.R))
+        self.uθ = - self.sqrt(abs(self.Θ))
+
+    def refresh(self):  # closed-form R'(r) & Θ'(θ) replace the Dual numbers used in BhSymp
+        with errstate(divide='ignore', invalid='ignore'):
+            r2 = self.r * self.r
+            self.ra2 = r2 + self.a2
+            P = self.ra2 * self.E - self.aL
+            self.Δ = self.ra2 - 2 * self.r
+            μ2r2K = self.μ2 * r2 + self.K
+            self.R = P * P - self.Δ * μ2r2K
+            self.dR = 4 * self.r * self.E * P - 2 * (self.r - 1) * μ2r2K - 2 * self.μ2 * self.r * self.Δ
+            sinθ, cosθ = self.sin_cos(self.θ)
+            self.sin2θ = sinθ * sinθ
+            cos2θ = 1 - self.sin2θ
+            T = self.aE * self.sin2θ - self.L
+            T_sin2θ = T / self.sin2θ
+            self.Θ = self.K - self.a2μ2 * cos2θ - T * T_sin2θ
+            self.dΘ = 2 * sinθ * cosθ * (self.a2μ2 - 2 * self.aE * T_sin2θ + T_sin2θ * T_sin2θ)
+            P_Δ = P / self.Δ
+            self.Σ = r2 + self.a2 * cos2θ
+            self.ut = P_Δ * self.ra2 - T * self.a
+            self.uφ = P_Δ * self.a - T_sin2θ
+
+    def p4_error(self, ut, ur, uθ, uφ):
+        return (self.μ2 + self.sin2θ / self.Σ * (self.a * ut - self.ra2 * uφ)**2 + self.Σ / self.Δ * ur**2
+                + self.Σ * uθ**2 - self.Δ / self.Σ * (ut - self.a * self.sin2θ * uφ)**2)
+
+    def q_update(self, c):  # particles that have stopped are masked out, their state is left untouched
+        c = self.make(c)
+        self.t = self.where(self.active, self.t + c * self.ut, self.t)
+        self.r = self.where(self.active, self.r + c * self.ur, self.r)
+        self.θ = self.where(self.active, self.θ + c * self.uθ, self.θ)
+        self.φ = self.where(self.active, self.φ + c * self.uφ, self.φ)
+        self.refresh()
+
+    def p_update(self, d):
+        d = 0.5 * self.make(d)
+        self.ur = self.where(self.active, self.ur + d * self.dR, self.ur)
+        self.uθ = self.where(self.active, self.uθ + d * self.dΘ, self.uθ)
+
+    def running(self, τ):
+        return logical_and(τ < self.end, logical_or(self.cross, self.Δ > 0.0))
+
+    def solve(self, integrator, h, start, end, tr):
+        self.end = end
+        mino = zeros(self.n)
+        τ = self.array([0] * self.n)
+        i = 0
+        self.active = self.running(τ)
+        self.output(integrator, flatnonzero(~self.active), mino, τ)
+        while self.active.any():
+            if i % tr == 0:
+                self.output(integrator, flatnonzero(logical_and(self.active, τ >= start)), mino, τ)
+            integrator.step()
+            i += 1
+            mino = where(self.active, mino + float(h), mino)
+            τ = self.where(self.active, τ + h * self.Σ, τ)
+            running = self.running(τ)
+            self.output(integrator, flatnonzero(logical_and(self.active, ~running)), mino, τ)  # final point
+            self.active = logical_and(self.active, running)
+
+    def output(self, integrator, particles, mino, τ):  # observe() may apply a corrector, only worth it with points due
+        if particles.size:
+            integrator.observe(self.plot, particles, mino, τ)
+
+    def plot(self, particles, mino, τ):
+        with errstate(divide='ignore', invalid='ignore'):
+            ut, ur, uθ, uφ = self.ut / self.Σ, self.ur / self.Σ, self.uθ / self.Σ, self.uφ / self.Σ
+            v4e = self.p4_error(ut, ur, uθ, uφ)
+            er = ur**2 - self.R / self.Σ**2
+            eθ = uθ**2 - self.Θ / self.Σ**2
+        for p in particles:
+            print(f'{{"n":{p:d},"mino":{mino[p]:.9e},"tau":{τ[p]:.9e},"v4e":{v4e[p]:.9e},'
+                  f'"ER":{er[p]:.9e},"ETh":{eθ[p]:.9e},'
+                  f'"t":{self.t[p]:.9e},"r":{self.r[p]:.9e},"th":{self.θ[p]:.9e},"ph":{self.φ[p]:.9e}}}')
+
+
+if __name__ == "__main__":
+    #  Example: ./Bh3dEnsemble.py initial-conditions.ensemble.json >/tmp/data
+    #  IC is as for Bh3d.py, but E, L, Q, r0 & th0 are given per particle in a "particles" list
+    #  and "backend" may be float (default) or dd for double-double, NumPy array pairs
+    print("Simulator: {}".format(argv[0]), file=stderr)
+    input_data = open(argv[1]).read() if len(argv) == 2 else stdin.read()
+    backend = loads(input_data)['IC'].get('backend', 'float')  # float or dd (double-double)
+    ic = loads(input_data, parse_float=Backend.select({'backend': backend}, 53))['IC']
+    particles = ic['particles']
+    print("{} particles".format(len(particles)), file=stderr)
+    monitor = Instrument(ic)
+    bh = monitor.attach(BhEnsemble(ic['a'], ic['mu'], [p['E'] for p in particles], [p['L'] for p in particles],
+                                   [p['Q'] for p in particles], [p['r0'] for p in particles],
+                                   [p['th0'] for p in particles], ic['cross']))
+    step = ic['step']
+    integrator = monitor.attach(Symplectic(bh, step, ic['integrator'], ic['scheme']), ('step', 'observe'))
+    bh.solve(integrator, step, ic['start'], ic['end'], ic['plotratio'])
+    monitor.report()
+else:
+    print(__name__ + " module loaded", file=stderr)
@@ -0,0 +1,147 @@
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from json import loads, dumps
+from struct import Struct
+from sys import stderr
+import sys
+from numpy import dtype, frombuffer, recarray, rec
+from Background import Background
+
+FORMATS = ('json', 'binary')
+
+
+class Writer(object):
+    """
+    Binary plot output: one JSON header line giving the field names & dtype, then fixed size little-endian float64
+    records, one per plot, written to the byte stream under stdout
+    """
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self.record = Struct('<{}d'.format(len(self.fields)))
+        self.out = getattr(sys.stdout, 'buffer', None)
+        if self.out is None:
+            raise Exception('>>> Binary output needs a byte stream, use the default JSON output here <<<')
+        sys.stdout.flush()
+        self.out.write((dumps({'fields': self.fields, 'dtype': '<f8'}) + '\n').encode())
+
+    def write(self, *values):
+        self.out.write(self.record.pack(*(float(value) for value in values)))
+
+    def batch(self, records):
+        self.out.write(b''.join(self.record.pack(*(float(value) for value in values)) for values in records))
+
+    def flush(self):
+        self.out.flush()
+
+
+class Lines(object):
+    """
+    JSON lines output for the background writer, the values formatted as the models print them
+    """
+    def __init__(self, fields, template=None):
+        self.fields = tuple(fields)
+        self.out = sys.stdout
+        self.template = template or '{{' + ','.join('"' + name + '":{:.9e}' for name in self.fields) + '}}\n'
+
+    def batch(self, records):
+        self.out.write(''.join(self.template.format(*values) for values in records))
+
+    def flush(self):
+        self.out.flush()
+
+
+def writer(ic, fields, template=None):
+    """
+    :param ic: the IC dictionary, "output" may be json (default) or binary, with "queue" set to a number of records
+               output is formatted & written by a Background thread, "overflow" block (default), drop or spill
+    :param fields: names of the values the model plots
+    :param template: format of a queued JSON line, if the model does not print the default layout of fields
+    :return: a Writer for binary output, or None for JSON lines, either wrapped in a Background writer if queued
+    """
+    output = ic.get('output', 'json')
+    if output not in FORMATS:
+        raise Exception('>>> Output must be {}, was "{found}" <<<'.format(' or '.join(FORMATS), found=output))
+    if ic.get('queue'):
+        return Background(Writer(fields) if output == 'binary' else Lines(fields, template), int(ic['queue']),
+                          ic.get('overflow', 'block'), int(ic.get('batch', 256)))
+    return Writer(fields) if output == 'binary' else None
+
+
+def close(out):
+    """
+    Finish the output of a run, waiting for a Background writer to empty its queue
+    :param out: as returned by writer()
+    """
+    if isinstance(out, Background):
+        out.close()
+    elif out:
+        out.flush()
+
+
+def is_header(document):
+    return set(document) == {'fields', 'dtype'}
+
+
+def records(stream):
+    """
+    Plot points one at a time, from either output format, with the text of each JSON line
+    :param stream: a byte stream, e.g. stdin.buffer
+    :return: a generator of (dictionary, line) pairs, line is None for binary records
+    """
+    line = stream.readline()
+    if not line:
+        return
+    first = loads(line)
+    if is_header(first):
+        fields = first['fields']
+        record = Struct('<{}d'.format(len(fields)))
+        data = stream.read(record.size)
+        while len(data) == record.size:
+            yield dict(zip(fields, record.unpack(data))), None
+            data = stream.read(record.size)
+    else:
+        yield first, line
+        for line in stream:
+            yield loads(line), line
+
+
+def points(stream):
+    """
+    Plot points one at a time, from either output format
+    :param stream: a byte stream, e.g. stdin.buffer
+    :return: a generator of dictionaries
+    """
+    return (point for point, _ in records(stream))
+
+
+def read(stream):
+    """
+    A whole trajectory, from either output format
+    :param stream: a byte stream, e.g. stdin.buffer
+    :return: a NumPy record array, one record per plot point, fields as named in the output
+    """
+    line = stream.readline()
+    first = loads(line) if line else {}
+    if is_header(first):
+        layout = dtype([(name, first['dtype']) for name in first['fields']])
+        data = stream.read()
+        return frombuffer(data[:len(data) - len(data) % layout.itemsize], dtype=layout).view(recarray)
+    rows = [first] + [loads(line) for line in stream] if first else []
+    return rec.fromrecords([tuple(row.values()) for row in rows], names=list(rows[0])) if rows else None
+
+
+print(__name__ + " module loaded", file=stderr)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from asyncio import start_server, run, Condition, sleep, IncompleteReadError
+from collections import deque
+from hashlib import sha256
+from json import loads, dumps
+from os import makedirs
+from os.path import join
+from socket import create_connection
+from sys import stdin, stderr, argv
+from tempfile import TemporaryDirectory
+from threading import Thread, Event, Lock
+from time import monotonic
+from Batch import documents, execute, table
+
+MISSED = 3  # heartbeats a running worker may miss before its job is requeued
+DISPATCHES = 5  # default number of times a job is handed out before it is marked failed
+
+
+def ic_hash(document):
+    """
+    :return: the identity of a run, identical IC documents (whatever their key order) are run only once
+    """
+    canonical = dumps({'Simulator': document['Simulator'], 'IC': document['IC']}, sort_keys=True)
+    return sha256(canonical.encode()).hexdigest()
+
+
+class Coordinator(object):
+    """
+    Hands out the IC documents of a batch configuration (see Batch.py) to workers connecting over TCP, and collects
+    their summaries & trajectories; jobs of workers that disconnect or stop sending heartbeats go back on the queue,
+    until they have been dispatched "dispatches" times
+    """
+    def __init__(self, config):
+        self.directory = config.get('output', 'batch')
+        self.timeout, self.retries = config.get('timeout', 3600), config.get('retries', 1)
+        self.heartbeat = config.get('heartbeat', 10.0)
+        self.limit = config.get('dispatches', DISPATCHES)
+        self.jobs, self.sources = {}, {}
+        self.duplicates = 0
+        for source, document in documents(config):
+            key = ic_hash(document)
+            if key in self.jobs:
+                self.duplicates += 1
+            else:
+                self.jobs[key] = document
+            self.sources.setdefault(key, []).append(source)
+        self.pending = deque(self.jobs)
+        self.running = {}  # key: (worker, deadline)
+        self.dispatches = dict.fromkeys(self.jobs, 0)
+        self.results = {}
+        self.changed = None
+        self.port = None
+
+    def requeue(self, key, why):
+        del self.running[key]
+        if self.dispatches[key] < self.limit:
+            self.pending.appendleft(key)
+            print(dumps({'requeued': key, 'why': why}), file=stderr)
+            return
+        document = self.jobs[key]
+        self.results[key] = {'run': 'ic-' + key[:12], 'source': ' + '.join(self.sources[key]),
+                             'simulator': document['Simulator'],
+                             'status': 'failed: {} after {} dispatches'.format(why, self.dispatches[key]),
+                             'attempts': 0, 'step': document['IC'].get('step'), 'lines': 0, 'seconds': 0.0,
+                             'worker': None, 'dispatches': self.dispatches[key]}
+        print('{run} {status}'.format(**self.results[key]), file=stderr)
+
+    async def next_job(self):
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.pending or len(self.results) == len(self.jobs))
+            return self.pending.popleft() if self.pending else None
+
+    async def handle(self, reader, writer):
+        worker = '{}:{}'.format(*writer.get_extra_info('peername')[:2])
+        mine = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = loads(line)
+                kind = message['type']
+                if kind == 'ready':
+                    key = await self.next_job()
+                    if key is None:
+                        writer.write((dumps({'type': 'done'}) + '\n').encode())
+                        await writer.drain()
+                        break
+                    self.running[key] = worker, monotonic() + MISSED * self.heartbeat
+                    self.dispatches[key] += 1
+                    mine.add(key)
+                    writer.write((dumps({'type': 'job', 'id': key, 'source': ' + '.join(self.sources[key]),
+                                         'document': self.jobs[key], 'heartbeat': self.heartbeat,
+                                         'timeout': self.timeout, 'retries': self.retries}) + '\n').encode())
+                    await writer.drain()
+                elif kind == 'heartbeat':
+                    if message['id'] in self.running and self.running[message['id']][0] == worker:
+                        self.running[message['id']] = worker, monotonic() + MISSED * self.heartbeat
+                elif kind == 'result':
+                    key = message['id']
+                    data = await reader.readexactly(message['size'])
+                    mine.discard(key)
+                    if key in self.results:
+                        continue  # requeued meanwhile, & already finished elsewhere
+                    self.running.pop(key, None)
+                    if key in self.pending:
+                        self.pending.remove(key)
+                    with open(join(self.directory, message['summary']['run'] + '.out'), 'wb') as f:
+                        f.write(data)
+                    self.results[key] = dict(message['summary'], worker=worker, dispatches=self.dispatches[key])
+                    print('{run} {status} {worker}'.format(**self.results[key]), file=stderr)
+                    async with self.changed:
+                        self.changed.notify_all()
+        except (ConnectionError, IncompleteReadError):
+            pass
+        finally:
+            for key in mine:
+                if key in self.running and self.running[key][0] == worker:
+                    self.requeue(key, 'worker {} disconnected'.format(worker))
+            async with self.changed:
+                self.changed.notify_all()
+            writer.close()
+
+    async def reap(self):  # requeue jobs whose worker has gone silent
+        while len(self.results) < len(self.jobs):
+            await sleep(self.heartbeat / 2)
+            now = monotonic()
+            for key, (worker, deadline) in list(self.running.items()):
+                if now > deadline:
+                    self.requeue(key, 'no heartbeat from {}'.format(worker))
+            async with self.changed:
+                self.changed.notify_all()
+
+    async def serve(self, host, port, started=None):
+        """
+        :param started: optional callable, called once listening (self.port is then the actual port)
+        :return: summaries in IC order, once every job has a result
+        """
+        makedirs(self.directory, exist_ok=True)
+        self.changed = Condition()
+        server = await start_server(self.handle, host, port)
+        self.port = server.sockets[0].getsockname()[1]
+        print("Coordinating {} jobs ({} duplicates) on port {}".format(len(self.jobs), self.duplicates, self.port),
+              file=stderr)
+        if started:
+            started()
+        async with server:
+            await self.reap()
+            await sleep(self.heartbeat / 2)  # let idle workers collect their "done"
+        summaries = [self.results[key] for key in self.jobs]
+        with open(join(self.directory, 'summary.json'), 'w') as f:
+            for summary in summaries:
+                f.write(dumps(summary) + '\n')
+        return summaries
+
+
+def work(host, port):
+    """
+    Worker loop: pull jobs, run each as Batch.execute does, push the summary & trajectory; heartbeats are sent from
+    a thread while a job runs
+    :return: number of jobs completed
+    """
+    with create_connection((host, port)) as connection, TemporaryDirectory() as directory:
+        stream = connection.makefile('rwb')
+        lock = Lock()
+
+        def send(message, payload=b''):
+            with lock:
+                stream.write((dumps(message) + '\n').encode() + payload)
+                stream.flush()
+
+        def beat(key, interval, stop):
+            while not stop.wait(interval):
+                send({'type': 'heartbeat', 'id': key})
+
+        completed = 0
+        while True:
+            send({'type': 'ready'})
+            line = stream.readline()
+            if not line:
+                break
+            job = loads(line)
+            if job['type'] == 'done':
+                break
+            run_id = 'ic-' + job['id'][:12]
+            stop = Event()
+            heartbeat = Thread(target=beat, args=(job['id'], job['heartbeat'], stop), daemon=True)
+            heartbeat.start()
+            try:
+                summary = execute(run_id, job['source'], job['document'], directory, job['timeout'], job['retries'])
+            finally:
+                stop.set()
+                heartbeat.join()
+            data = open(join(directory, run_id + '.out'), 'rb').read()
+            send({'type': 'result', 'id': job['id'], 'summary': summary, 'size': len(data)}, data)
+            completed += 1
+        return completed
+
+
+if __name__ == "__main__":
+    #  Example: ./Distributed.py coordinator sweep.json 4321 >/tmp/table  # Batch.py config, + "heartbeat", "dispatches"
+    #  Example: ./Distributed.py worker coordinator-host 4321  # on every idle box, as many as it has cores
+    print("Distributed: {}".format(argv[0]), file=stderr)
+    if len(argv) > 2 and argv[1] == 'coordinator':
+        coordinator = Coordinator(loads(open(argv[2]).read() if argv[2] != '-' else stdin.read()))
+        print(table(run(coordinator.serve(None, int(argv[3]) if len(argv) > 3 else 4321))))
+    elif len(argv) == 4 and argv[1] == 'worker':
+        print("{} jobs".format(work(argv[2], int(argv[3]))), file=stderr)
+    else:
+        raise Exception('>>> Usage: coordinator <config> [port] or worker <host> <port> <<<')
+else:
+    print(__name__ + " module loaded", file=stderr)
@@ -0,0 +1,324 @@
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from decimal import Decimal, localcontext
+from fractions import Fraction
+from math import sqrt as fsqrt, acos as facos, asin as fasin, log as flog, log10 as flog10
+from sys import stderr
+try:
+    from numpy import ndarray, where, rint, asarray, zeros_like, ldexp, sqrt as nsqrt, log as nlog
+except ImportError:
+    ndarray = None
+
+SPLITTER = 134217729.0  # 2^27 + 1
+
+
+def two_sum(a, b):
+    s = a + b
+    bb = s - a
+    return s, (a - (s - bb)) + (b - bb)
+
+
+def quick_two_sum(a, b):  # |a| >= |b|
+    s = a + b
+    return s, b - (s - a)
+
+
+def split(a):
+    t = SPLITTER * a
+    hi = t - (t - a)
+    return hi, a - hi
+
+
+def two_prod(a, b):
+    p = a * b
+    a_hi, a_lo = split(a)
+    b_hi, b_lo = split(b)
+    return p, ((a_hi * b_hi - p) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo
+
+
+def choose(condition, a, b):  # works for scalars and for NumPy arrays of flags
+    if ndarray is not None and isinstance(condition, ndarray):
+        return DoubleDouble(where(condition, a.hi, b.hi), where(condition, a.lo, b.lo))
+    return a if condition else b
+
+
+class DoubleDouble(object):
+    """
+    Unevaluated sum of two doubles, roughly 106 bits of significand and the exponent range of a double.
+    Components may be floats, or NumPy arrays of the same shape for whole ensembles.
+    """
+    __slots__ = ('hi', 'lo')
+
+    def __init__(self, hi, lo=0.0):
+        self.hi = hi
+        self.lo = lo
+
+    @classmethod
+    def get(cls, x):
+        if isinstance(x, DoubleDouble):
+            return x
+        if isinstance(x, float):
+            return cls(x)
+        if isinstance(x, (str, Fraction)):
+            x = Fraction(x)
+            hi = float(x)
+            return cls(hi, float(x - Fraction(hi)))
+        if isinstance(x, int):
+            hi = float(x)
+            return cls(hi, float(x - int(hi)))
+        elif ndarray is not None and isinstance(x, ndarray):
+            return cls(asarray(x, dtype=float), zeros_like(x, dtype=float))
+        hi = float(x)
+        return cls(hi, float(x - hi))  # mpfr
+
+    @classmethod
+    def array(cls, values):
+        values = [cls.get(x) for x in values]
+        return cls(asarray([x.hi for x in values], dtype=float), asarray([x.lo for x in values], dtype=float))
+
+    def __getitem__(self, i):
+        return DoubleDouble(self.hi[i], self.lo[i])
+
+    def __float__(self):
+        return float(self.hi + self.lo)
+
+    def __str__(self):
+        return str(self.decimal)
+
+    def __repr__(self):
+        return 'DoubleDouble({!r}, {!r})'.format(self.hi, self.lo)
+
+    def __format__(self, spec):  # exponents padded to two digits, as for float
+        if self.hi == 0.0:  # Decimal keeps the exponent of a zero sum, and drops the sign of -0.0
+            return format(self.hi, spec)
+        text = format(self.decimal, spec)
+        mantissa, e, exponent = text.rpartition('e')
+        return '{}e{}{:0>2}'.format(mantissa, exponent[0], exponent[1:]) if e and exponent[0] in '+-' else text
+
+    @property
+    def decimal(self):
+        with localcontext() as context:
+            context.prec = 34
+            return Decimal(self.hi) + Decimal(self.lo)
+
+    def __neg__(self):
+        return DoubleDouble(- self.hi, - self.lo)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return choose(self.hi < 0.0, - self, self)
+
+    def __add__(self, other):
+        other = DoubleDouble.get(other)
+        s1, s2 = two_sum(self.hi, other.hi)
+        t1, t2 = two_sum(self.lo, other.lo)
+        s1, s2 = quick_two_sum(s1, s2 + t1)
+        return DoubleDouble(*quick_two_sum(s1, s2 + t2))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self + (- DoubleDouble.get(other))
+
+    def __rsub__(self, other):
+        return DoubleDouble.get(other) + (- self)
+
+    def __mul__(self, other):
+        other = DoubleDouble.get(other)
+        p1, p2 = two_prod(self.hi, other.hi)
+        return DoubleDouble(*quick_two_sum(p1, p2 + (self.hi * other.lo + self.lo * other.hi)))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        other = DoubleDouble.get(other)
+        q1 = self.hi / other.hi
+        r = self - other * q1
+        q2 = r.hi / other.hi
+        r = r - other * q2
+        q3 = r.hi / other.hi
+        return DoubleDouble(*quick_two_sum(q1, q2)) + q3
+
+    def __rtruediv__(self, other):
+        return DoubleDouble.get(other) / self
+
+    def __pow__(self, n):
+        if not isinstance(n, int):
+            return exp(log(self) * n)  # real powers, e.g. the roots in the Yoshida & Suzuki compositions
+        result = DoubleDouble(1.0)
+        x = self if n >= 0 else 1 / self
+        n = abs(n)
+        while n:
+            if n & 1:
+                result = result * x
+            x = x * x
+            n >>= 1
+        return result
+
+    def __lt__(self, other):
+        other = DoubleDouble.get(other)
+        return (self.hi < other.hi) | ((self.hi == other.hi) & (self.lo < other.lo))
+
+    def __le__(self, other):
+        other = DoubleDouble.get(other)
+        return (self.hi < other.hi) | ((self.hi == other.hi) & (self.lo <= other.lo))
+
+    def __gt__(self, other):
+        return DoubleDouble.get(other) < self
+
+    def __ge__(self, other):
+        return DoubleDouble.get(other) <= self
+
+    def __eq__(self, other):
+        other = DoubleDouble.get(other)
+        return (self.hi == other.hi) & (self.lo == other.lo)
+
+    def __ne__(self, other):
+        other = DoubleDouble.get(other)
+        return (self.hi != other.hi) | (self.lo != other.lo)
+
+    @property
+    def sqr(self):
+        return self * self
+
+
+def factorial_reciprocals(n):
+    f = DoubleDouble(1.0)
+    reciprocals = [f]
+    for i in range(1, n + 1):
+        f = f * i  # exact, up to 27! < 2^106
+        reciprocals.append(1 / f)
+    return reciprocals
+
+
+def pieces(x, n, bits=30):  # x as a sum of n doubles of at most bits significant bits, so k * piece is exact
+    result = []
+    for _ in range(n):
+        scale = Fraction(2)**(bits - 1 - (x.numerator.bit_length() - x.denominator.bit_length()))
+        piece = Fraction(round(x * scale)) / scale
+        result.append(float(piece))
+        x -= piece
+    return result
+
+
+PI_FRACTION = Fraction('3.141592653589793238462643383279502884197169399375105820974944592307816406286')
+PI = DoubleDouble.get(PI_FRACTION)
+PI_2 = PI * 0.5
+PI_2_PIECES = pieces(PI_FRACTION / 2, 6)  # Cody & Waite, 180 bits of π/2 for the argument reduction
+LN2 = DoubleDouble.get(Fraction('0.693147180559945309417232121458176568075500134360255254120680009493393621969'))
+INVERSE_FACTORIALS = factorial_reciprocals(27)
+
+
+def sqrt(a):
+    a = DoubleDouble.get(a)
+    if ndarray is not None and isinstance(a.hi, ndarray):
+        positive = a.hi > 0.0
+        x = where(positive, 1.0 / nsqrt(where(positive, a.hi, 1.0)), 0.0)
+    else:
+        if a.hi == 0.0:
+            return DoubleDouble(0.0)
+        x = 1.0 / fsqrt(a.hi)
+    ax = a.hi * x
+    return DoubleDouble(*two_sum(ax, (a - DoubleDouble(*two_prod(ax, ax))).hi * (x * 0.5)))
+
+
+def reduce(a):  # a = r + k.π/2 with |r| <= π/4, r accurate relative to itself near the zeros for |k| < 2^23
+    a = DoubleDouble.get(a)
+    k = a.hi / PI_2.hi
+    k = rint(k) if ndarray is not None and isinstance(k, ndarray) else float(round(k))
+    r = a
+    for piece in PI_2_PIECES:
+        r = r - k * piece
+    return r, k % 4
+
+
+def sin_cos_taylor(r):
+    r2 = r * r
+    term = r
+    s = r
+    c = DoubleDouble(1.0)
+    power = r2
+    for i in range(2, 28, 2):  # even powers for cosine, odd for sine
+        sign = -1.0 if i % 4 == 2 else 1.0
+        c = c + power * INVERSE_FACTORIALS[i] * sign
+        term = power * r
+        s = s + term * INVERSE_FACTORIALS[i + 1] * sign
+        power = power * r2
+    return s, c
+
+
+def sin_cos(a):  # both for the price of one reduction & series, relative error < 1e-31 (see TestDoubleDouble)
+    r, quadrant = reduce(a)
+    s, c = sin_cos_taylor(r)
+    return (choose(quadrant == 0.0, s, choose(quadrant == 1.0, c, choose(quadrant == 2.0, - s, - c))),
+            choose(quadrant == 0.0, c, choose(quadrant == 1.0, - s, choose(quadrant == 2.0, - c, s))))
+
+
+def sin(a):
+    return sin_cos(a)[0]
+
+
+def cos(a):
+    return sin_cos(a)[1]
+
+
+def acos(a):  # one Newton step from the double precision value, exact at the end points, relative error < 2e-31
+    a = DoubleDouble.get(a)
+    if a.hi == -1.0 and a.lo == 0.0:
+        return PI
+    if a.hi == 1.0 and a.lo == 0.0:
+        return DoubleDouble(0.0)
+    if a.hi < -0.5:
+        return PI - acos(- a)
+    if a.hi > 0.5:  # near 0, solve sin(x) = sqrt(1 - a^2) instead, as cos is flat there
+        s = sqrt((1.0 - a) * (1.0 + a))
+        x = DoubleDouble(fasin(s.hi))
+        sin_x, cos_x = sin_cos(x)
+        return x + (s - sin_x) / cos_x
+    x = DoubleDouble(facos(a.hi))
+    sin_x, cos_x = sin_cos(x)
+    return x + (cos_x - a) / sin_x
+
+
+def exp(a):  # a = k.ln2 + r, then exp(r) by Taylor series, no squarings to magnify its rounding errors, < 1e-31
+    a = DoubleDouble.get(a)
+    k = a.hi / LN2.hi
+    k = rint(k) if ndarray is not None and isinstance(k, ndarray) else float(round(k))
+    r = a - LN2 * k
+    x = DoubleDouble(1.0)
+    term = DoubleDouble(1.0)
+    for i in range(1, 27):
+        term = term * r
+        x = x + term * INVERSE_FACTORIALS[i]
+    if ndarray is not None and isinstance(k, ndarray):
+        return DoubleDouble(ldexp(x.hi, k.astype(int)), ldexp(x.lo, k.astype(int)))
+    return DoubleDouble(x.hi * 2.0**k, x.lo * 2.0**k)
+
+
+def log(a):  # one Newton step on exp(x) - a = 0 from the double precision value, absolute error ~1e-32
+    a = DoubleDouble.get(a)
+    x = DoubleDouble(nlog(a.hi) if ndarray is not None and isinstance(a.hi, ndarray) else flog(a.hi))
+    return x + (a * exp(- x) - 1.0)
+
+
+def log10(a):
+    return flog10(float(a))
+
+
+print(__name__ + " module loaded", file=stderr)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from json import loads
+from sys import stdin, stderr, argv
+from time import time
+from gmpy2 import get_context
+get_context().precision = 113  # Set this BEFORE importing any Taylor Series stuff! (default, see Backend.select)
+from Symplectic import Symplectic
+from Backend import select
+from Bh3d import BhSymp, FIELDS
+
+INTEGRATORS = ['b4', 's4', 's5odr4', 'bm4', 'p4', 'b6', 's6', 's9odr6', 'bm6', 'b8', 's15odr8', 's17odr8']
+
+
+class Counter(object):  # stands in for the model, counting the updates the integrator makes
+    def __init__(self, model):
+        self.model = model
+        self.EXACT_FLOWS = getattr(model, 'EXACT_FLOWS', ())  # so stages merge exactly as for the bare model
+        self.q = 0
+        self.p = 0
+
+    def q_update(self, c):
+        self.q += 1
+        self.model.q_update(c)
+
+    def p_update(self, d):
+        self.p += 1
+        self.model.p_update(d)
+
+
+class Sampler(object):  # stands in for the model's Writer, keeping the error of every plotted point
+    def __init__(self, fields, error='v4e'):
+        self.index = fields.index(error)
+        self.initial = None
+        self.errors = []
+        self.last = 0.0
+
+    def write(self, *values):
+        if self.initial is None:
+            self.initial = values[self.index]
+        self.errors.append(abs(float(values[self.index] - self.initial)))
+        self.last = values[0]
+
+
+def sweep(model, fields, integrator, scheme, step, end, tr, update, method=False):
+    """
+    Run a model through its own solve(), so that stepping, fusion & observation are exactly as in the simulator
+    :param model: any model with q_update, p_update, solve & a writer slot
+    :param fields: the model's plot fields, the first is its step variable & "v4e" its error
+    :param end: as for the simulator, in the model's own time
+    :param update: evaluations for a number of drifts & kicks, for the model in question
+    :param method: solve() takes the step method rather than the integrator (Kerr)
+    :return: stages, steps, evaluations, kicks, seconds & the error samples (initial error subtracted)
+    """
+    counter = Counter(model)
+    symplectic = Symplectic(counter, step, integrator, scheme)
+    model.trajectory = True
+    model.writer = Sampler(fields)
+    start = time()
+    model.solve(symplectic.method if method else symplectic, step, 0.0, end, tr)
+    seconds = time() - start
+    return {'stages': len(symplectic.stages), 'steps': int(round(float(model.writer.last / step))),
+            'evaluations': update(counter.q, counter.p), 'kicks': counter.p, 'seconds': seconds,
+            'errors': model.writer.errors}
+
+
+def benchmark(ic, integrator, step, gradient='dual'):
+    """
+    Integrate one Kerr geodesic to proper time "end", sampling the 4-velocity norm error every "plotratio" steps
+    :param ic: Bh3d.py initial conditions
+    :param integrator: any Symplectic integrator name
+    :param step: Mino time step
+    :param gradient: dual or analytic potential derivatives
+    :return: a JSON line, "evaluations" counts q updates (the R & Theta refreshes that dominate the cost)
+    """
+    bh = BhSymp(ic['a'], ic['mu'], ic['E'], ic['L'], ic['Q'], ic['r0'], ic['th0'], True, gradient)
+    run = sweep(bh, FIELDS, integrator, ic['scheme'], step, ic['end'], ic['plotratio'], lambda q, p: q)
+    return (f'{{"integrator":"{integrator}","gradient":"{gradient}","step":{step:.9e},'
+            f'"stages":{run["stages"]:d},"steps":{run["steps"]:d},"evaluations":{run["evaluations"]:d},'
+            f'"kicks":{run["kicks"]:d},"error":{max(run["errors"]):.9e},"seconds":{run["seconds"]:.3f}}}')
+
+
+if __name__ == "__main__":
+    #  Example: ./Efficiency.py <initial-conditions.json | jq -c 'select(.integrator == "s9odr6")'
+    #  IC is as for Bh3d.py, with optional "integrators", "steps" and "gradients" (dual, analytic) lists to compare
+    #  Same error for fewer evaluations is better, e.g. s9odr6 against b6, or s15odr8 & s17odr8 against b8
+    print("Simulator: {}".format(argv[0]), file=stderr)
+    input_data = open(argv[1]).read() if len(argv) == 2 else stdin.read()
+    ic = loads(input_data, parse_float=select(loads(input_data)['IC'], 113))['IC']
+    print(input_data, file=stderr)
+    for name in ic.get('integrators', INTEGRATORS):
+        for h in ic.get('steps', [ic['step'], ic['step'] / 2, ic['step'] / 4]):
+            for gradient in ic.get('gradients', [ic.get('gradient', 'dual')]):
+                print(benchmark(ic, name, h, gradient))
+else:
+    print(__name__ + " module loaded", file=stderr)
@@ -0,0 +1,109 @@
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from sys import stderr
+
+
+def hermite(s, h, y0, m0, y1, m1):
+    """
+    Cubic Hermite interpolant over one step
+    :param s: fraction of the step, 0 to 1
+    :param h: step in the independent variable
+    :param y0: value at the start
+    :param m0: rate at the start
+    :param y1: value at the end
+    :param m1: rate at the end
+    """
+    s2 = s * s
+    s3 = s2 * s
+    return ((2 * s3 - 3 * s2 + 1) * y0 + (s3 - 2 * s2 + s) * h * m0 + (3 * s2 - 2 * s3) * y1 + (s3 - s2) * h * m1)
+
+
+class Events(object):
+    """
+    Event detection between steps: a sign change of any of the model's event functions is located on the cubic
+    Hermite interpolant of that function over the step, and the plot values interpolated there are printed as one
+    JSON line with an "event" name & a "direction", +1 rising or -1 falling
+    """
+    def __init__(self, fields, names):
+        """
+        :param fields: names of the values the model plots, the first is the independent variable
+        :param names: for each event function, the event names for its (rising, falling) zero crossings
+        """
+        self.fields = tuple(fields)
+        self.names = tuple(names)
+        self.previous = None
+        self.count = 0
+
+    def update(self, values, rates, g, dg):
+        """
+        :param values: the plot values, in field order
+        :param rates: their derivatives by the independent variable, None for those interpolated linearly
+        :param g: the event functions
+        :param dg: their derivatives by the independent variable
+        """
+        current = ([float(v) for v in values], [None if m is None else float(m) for m in rates],
+                   [float(x) for x in g], [float(x) for x in dg])
+        if self.previous:
+            found = []
+            (y0, m0, g0, dg0), (y1, m1, g1, dg1) = self.previous, current
+            h = y1[0] - y0[0]
+            for k, names in enumerate(self.names):
+                if g0[k] * g1[k] < 0.0 or (g1[k] == 0.0 and g0[k] != 0.0):  # a start exactly on zero was the last
+                    rising = g0[k] < 0.0
+                    found.append((self.root(h, g0[k], dg0[k], g1[k], dg1[k]), names[0 if rising else 1],
+                                  1 if rising else -1))
+            for s, name, direction in sorted(found):
+                self.emit(name, direction, [y0[i] + s * (y1[i] - y0[i]) if m0[i] is None or m1[i] is None
+                                            else hermite(s, h, y0[i], m0[i], y1[i], m1[i])
+                                            for i in range(len(self.fields))])
+        self.previous = current
+
+    @staticmethod
+    def root(h, g0, dg0, g1, dg1):
+        """
+        :return: fraction of the step where the interpolated event function changes sign, by bisection
+        """
+        lo, hi = 0.0, 1.0
+        for _ in range(60):
+            mid = 0.5 * (lo + hi)
+            if (hermite(mid, h, g0, dg0, g1, dg1) < 0.0) == (g0 < 0.0):
+                lo = mid
+            else:
+                hi = mid
+        return 0.5 * (lo + hi)
+
+    def emit(self, name, direction, values):
+        self.count += 1
+        print(f'{{"event":"{name}","direction":{direction:d},'
+              + ','.join(f'"{field}":{value:.9e}' for field, value in zip(self.fields, values)) + '}')
+
+
+def events(ic, fields, names):
+    """
+    :param ic: the IC dictionary, "events": true turns detection on
+    :param fields: names of the values the model plots
+    :param names: the model's event names, see Events
+    :return: Events, or None if not asked for
+    """
+    if not ic.get('events'):
+        return None
+    if ic.get('trajectory', True) and ic.get('output', 'json') == 'binary':
+        raise Exception('>>> Event records are JSON lines, use "trajectory": false with binary output <<<')
+    return Events(fields, names)
+
+
+print(__name__ + " module loaded", file=stderr)
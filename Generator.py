@@ -4,10 +4,12 @@ from json import loads
 from sys import argv, stderr, stdin
 from gmpy2 import mpfr, get_context, sin, acos, cos
 get_context().precision = 113  # Set this BEFORE importing any mathematical stuff!
-from Symplectic import D1, D2
 from NelderMead import nelder_mead
 from dual import Dual, make_mpfr
 
+D1 = make_mpfr(1)
+D2 = make_mpfr(2)
+
 
 class Potentials(object):
     def __init__(self, a, r_min, r_max, elevation):
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from asyncio import start_server, run, gather, Semaphore, get_running_loop, IncompleteReadError
+from codecs import getincrementaldecoder
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import redirect_stdout
+from importlib import import_module
+from json import loads, dumps, JSONDecoder
+from multiprocessing import Manager
+from os import cpu_count
+from sys import stderr, argv
+from time import perf_counter
+from Backend import select
+from Batch import SIMULATORS
+
+CHUNK = 64  # lines per message from a worker
+BUFFER = 16  # chunks held per run before the worker blocks, so a slow client slows only its own integration
+
+
+class Chunked(object):
+    """
+    Text stream passing complete lines to a queue, a chunk at a time
+    """
+    def __init__(self, queue):
+        self.queue = queue
+        self.lines = []
+        self.pending = ''
+
+    def write(self, text):
+        *lines, self.pending = (self.pending + text).split('\n')
+        self.lines.extend(lines)
+        if len(self.lines) >= CHUNK:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.lines:
+            self.queue.put(self.lines)
+            self.lines = []
+
+
+def warm():  # pool initializer, pays the import cost before any client connects
+    for module, _ in SIMULATORS.values():
+        import_module(module)
+
+
+def integrate(text, simulator, queue):
+    """
+    One run in a pool process, output lines go to the queue, then None
+    :return: status
+    """
+    try:
+        document = loads(text)
+        name = document.get('Simulator', simulator)
+        if name not in SIMULATORS:
+            raise Exception('>>> Simulator must be {}, was "{found}" <<<'.format(' or '.join(SIMULATORS), found=name))
+        module, precision = SIMULATORS[name]
+        out = Chunked(queue)
+        with redirect_stdout(out):
+            import_module(module).simulate(loads(text, parse_float=select(document['IC'], precision))['IC'])
+        out.flush()
+        return 'ok'
+    except Exception as e:
+        return 'error: {}'.format(e)
+    finally:
+        queue.put(None)
+
+
+class GeodesicServer(object):
+    """
+    Accepts an IC document per connection and streams the trajectory back, integrations run in a bounded pool
+    of pre-warmed processes; a connection sending "stats" (or an HTTP GET) gets the server statistics instead
+    """
+    def __init__(self, workers, simulator):
+        self.workers = workers
+        self.simulator = simulator
+        self.pool = ProcessPoolExecutor(workers, initializer=warm)
+        self.readers = ThreadPoolExecutor(workers)  # blocking queue reads, one per running integration
+        self.manager = Manager()
+        self.slots = None
+        self.started = perf_counter()
+        self.clients = self.waiting = self.running = self.completed = self.failed = self.lines = 0
+
+    def stats(self):
+        elapsed = perf_counter() - self.started
+        return {'workers': self.workers, 'clients': self.clients, 'queue': self.waiting, 'running': self.running,
+                'completed': self.completed, 'failed': self.failed, 'lines': self.lines, 'uptime': elapsed,
+                'runs_per_second': self.completed / elapsed, 'lines_per_second': self.lines / elapsed}
+
+    @staticmethod
+    async def request(reader):
+        """
+        :return: the request text, complete at EOF, or as soon as it holds a whole JSON document (no half-close needed)
+        """
+        text = ''
+        decoder = getincrementaldecoder('utf-8')()  # a character may be split across reads
+        while True:
+            data = await reader.read(65536)
+            text += decoder.decode(data, final=not data)
+            if not data or text.lstrip().lower().startswith(('stats', 'get ')):
+                return text
+            try:
+                JSONDecoder().raw_decode(text.lstrip())
+                return text
+            except ValueError:
+                pass
+
+    async def handle(self, reader, writer):
+        self.clients += 1
+        try:
+            text = await self.request(reader)
+            if text.lstrip().lower().startswith('get '):
+                body = dumps(self.stats()) + '\n'
+                writer.write('HTTP/1.0 200 OK\r\nContent-Type: application/json\r\nContent-Length: {}\r\n\r\n{}'.format(
+                    len(body), body).encode())
+            elif text.lstrip().lower().startswith('stats'):
+                writer.write((dumps(self.stats()) + '\n').encode())
+            elif text.strip():
+                await self.serve(text, writer)
+            await writer.drain()
+        except (ConnectionError, IncompleteReadError):
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def serve(self, text, writer):
+        loop = get_running_loop()
+        start = perf_counter()
+        self.waiting += 1
+        async with self.slots:
+            self.waiting -= 1
+            self.running += 1
+            queue = self.manager.Queue(BUFFER)
+            try:
+                result = loop.run_in_executor(self.pool, integrate, text, self.simulator, queue)
+                while True:
+                    lines = await loop.run_in_executor(self.readers, queue.get)
+                    if lines is None:
+                        break
+                    writer.write(('\n'.join(lines) + '\n').encode())
+                    self.lines += len(lines)
+                    await writer.drain()  # backpressure: the queue fills, then the worker waits
+                status = await result
+            except ConnectionError:  # client gone, let the integration finish into the queue
+                status = 'disconnected'
+                while await loop.run_in_executor(self.readers, queue.get) is not None:
+                    pass
+                await result
+            finally:
+                self.running -= 1
+        if status == 'ok':
+            self.completed += 1
+        else:
+            self.failed += 1
+        print(dumps({'status': status, 'seconds': perf_counter() - start}), file=stderr)
+
+    async def prepare(self):
+        """
+        Start every pool process now, submitting all the warm-ups at once so that none finds an idle process to reuse
+        :return: the warm-up results
+        """
+        self.slots = Semaphore(self.workers)
+        loop = get_running_loop()
+        return await gather(*(loop.run_in_executor(self.pool, warm) for _ in range(self.workers)))
+
+    async def listen(self, host, port):
+        await self.prepare()
+        server = await start_server(self.handle, host, port)
+        print("Listening on {} with {} workers".format(port, self.workers), file=stderr)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    #  Example: ./GeodesicServer.py 1234 &  # replaces geodesic-server, clients are unchanged:
+    #           export exe='nc.openbsd pi 1234'; $exe <$ic | ./plotBH.py $ic
+    #  Example: echo stats | nc.openbsd -N pi 1234; curl http://pi:1234/stats
+    #  Arguments: port (default 1234), pool size (default the core count), simulator for ICs without a "Simulator"
+    print("Server: {}".format(argv[0]), file=stderr)
+    run(GeodesicServer(int(argv[2]) if len(argv) > 2 else cpu_count(), argv[3] if len(argv) > 3 else 'Bh3d').listen(
+        None, int(argv[1]) if len(argv) > 1 else 1234))
+else:
+    print(__name__ + " module loaded", file=stderr)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from glob import glob
+from json import loads, dumps
+from os.path import basename, dirname, join
+from sys import stderr, argv
+from gmpy2 import get_context
+get_context().precision = 236  # Set this BEFORE importing any Taylor Series stuff! (default, see Backend.select)
+from Symplectic import Symplectic
+from Backend import select, number
+from Bh3d import BhSymp
+from Bh3dEnsemble import BhEnsemble
+from DoublePendulum import DoublePendulum
+from Newton import Newton
+
+HERE = dirname(__file__) or '.'
+CORPUS = join(HERE, 'golden')
+PRECISION = 236
+DIGITS = 40  # significant digits of the "digits" samples, for checks beyond float accuracy
+CAPTURES = ('LightCapture', 'ParticleCapture')  # the trajectory ends at the horizon
+REFERENCE = {  # model: integrator, scheme, steps per sample, sample interval & count, in the model's own time
+    'bh3d': ('b8', 'yoshida', 400, '0.025', 20),
+    'newton': ('b8', 'yoshida', 800, '10', 20),
+    'doublependulum': ('gl6', '-', 20, '0.1', 20),
+}
+INTERVALS = {  # cases needing a shorter sample interval than their model's
+    'NearPhotonSphereRetrograde': '0.0005',  # E ~ 22, so Mino time runs several hundred times faster
+}
+
+
+def text(name):
+    with open(name) as f:
+        return f.read()
+
+
+def cases():
+    """
+    The shipped initial conditions, floats kept as strings so that any backend can read them exactly
+    :return: (model, case, IC) tuples
+    """
+    found = [('bh3d', basename(name), loads(text(name), parse_float=str))
+             for name in sorted(glob(join(HERE, 'ic', '*'))) if basename(name) not in CAPTURES]
+    found = [case for case in found if 'Q' in case[2]]  # not the N-body cases
+    for model, name in (('newton', 'initial-conditions.newton.example'),
+                        ('doublependulum', 'initial-conditions.double-pendulum.example')):
+        found.append((model, name, loads(text(join(HERE, name)), parse_float=str)['IC']))
+    return found
+
+
+def sample(n, count, advance, state):
+    """
+    :param n: steps between samples
+    :param count: number of samples after the initial one
+    :param advance: callable performing n steps, then calling its argument with the model in true coordinates
+    :param state: callable returning the sampled quantities as a dictionary
+    :return: a list of count + 1 dictionaries
+    """
+    samples = [state()]
+    for _ in range(count):
+        advance(n, lambda: samples.append(state()))
+    return samples
+
+
+def symplectic(model, integrator, scheme, step):
+    s = Symplectic(model, step, integrator, scheme)
+
+    def advance(n, observe):
+        s.run(n)
+        s.observe(observe)
+    return advance
+
+
+def bh3d(ic, integrator, scheme, steps, interval, count, gradient='analytic'):
+    bh = BhSymp(number(ic['a']), number(ic['mu']), number(ic['E']), number(ic['L']), number(ic['Q']),
+                number(ic['r0']), number(ic['th0']), True, gradient)
+    return sample(steps, count, symplectic(bh, integrator, scheme, number(interval) / steps),
+                  lambda: {'t': bh.t, 'r': bh.r, 'th': bh.θ, 'ph': bh.φ})
+
+
+def ensemble(ics, integrator, scheme, steps, interval, count):
+    """
+    All cases sharing a and mu in one vectorized run
+    :return: a list of samples for each IC
+    """
+    a, mu = ics[0]['a'], ics[0]['mu']
+    bh = BhEnsemble(a, mu, *([number(ic[key]) for ic in ics] for key in ('E', 'L', 'Q', 'r0', 'th0')), True)
+    samples = sample(steps, count, symplectic(bh, integrator, scheme, number(interval) / steps),
+                     lambda: [{'t': float(bh.t[p]), 'r': float(bh.r[p]), 'th': float(bh.θ[p]), 'ph': float(bh.φ[p])}
+                              for p in range(len(ics))])
+    return [[s[p] for s in samples] for p in range(len(ics))]
+
+
+def newton(ic, integrator, scheme, steps, interval, count):
+    bh = Newton(number(ic['g']), number(ic['m']), number(ic['Lfac']), number(ic['r0']))
+    return sample(steps, count, symplectic(bh, integrator, scheme, number(interval) / steps),
+                  lambda: {'r': bh.qr.val, 'ph': bh.qφ, 'pr': bh.pr.val})
+
+
+def double_pendulum(ic, integrator, scheme, steps, interval, count):
+    dp = DoublePendulum(*(number(ic[key]) for key in ('g', 'l1', 'm1', 'l2', 'm2', 'th1', 'pth1', 'th2', 'pth2', 'tol')),
+                        int(integrator[2:]) // 2)
+    h = number(interval) / steps
+
+    def advance(n, observe):
+        for _ in range(n):
+            dp.gauss_legendre(h)
+        observe()
+    return sample(steps, count, advance,
+                  lambda: {'th1': dp.th1.val, 'pth1': dp.pth1.val, 'th2': dp.th2.val, 'pth2': dp.pth2.val})
+
+
+MODELS = {'bh3d': bh3d, 'newton': newton, 'doublependulum': double_pendulum}
+
+
+def path(model, case):
+    return join(CORPUS, '{}.{}.json'.format(model, case))
+
+
+def load(model, case):
+    """
+    :return: the golden record, its IC floats are held as strings, exactly as written in the source file
+    """
+    return loads(text(path(model, case)))
+
+
+def generate(model, case, ic):
+    integrator, scheme, steps, interval, count = REFERENCE[model]
+    interval = INTERVALS.get(case, interval)
+    coarse = MODELS[model](ic, integrator, scheme, steps, interval, count)
+    fine = MODELS[model](ic, integrator, scheme, 2 * steps, interval, count)
+    samples = [{k: 2 * f[k] - c[k] for k in f} for f, c in zip(fine, coarse)]  # t & φ quadratures are first order
+    record = {'model': model, 'case': case, 'ic': ic,
+              'reference': {'integrator': integrator, 'scheme': scheme, 'steps': [steps, 2 * steps],
+                            'precision': PRECISION, 'extrapolation': 'richardson'},
+              'interval': interval, 'count': count,
+              'samples': [{k: float(v) for k, v in s.items()} for s in samples],
+              'digits': [{k: format(v, '.{}e'.format(DIGITS - 1)) for k, v in s.items()} for s in samples]}
+    with open(path(model, case), 'w') as f:
+        f.write(dumps(record, indent=1) + '\n')
+    print("{} {}: {} samples".format(model, case, len(samples)), file=stderr)
+
+
+if __name__ == "__main__":
+    #  Example: ./Golden.py  # regenerate every reference trajectory in golden/ (slow, high precision & order)
+    #  Example: ./Golden.py bh3d Light1  # just one
+    print("Simulator: {}".format(argv[0]), file=stderr)
+    select({'precision': PRECISION}, PRECISION)
+    for m, c, i in cases():
+        if len(argv) < 2 or (m == argv[1] and (len(argv) < 3 or c == argv[2])):
+            generate(m, c, i)
+else:
+    print(__name__ + " module loaded", file=stderr)
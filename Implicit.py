@@ -0,0 +1,210 @@
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from sys import stderr
+from Backend import number, sqrt
+from Tangent import Tangent
+
+
+def lu(m):
+    """
+    LU decomposition in place, with partial pivoting
+    :param m: square matrix as a list of rows
+    :return: the decomposed matrix and the row permutation
+    """
+    n = len(m)
+    permutation = list(range(n))
+    for k in range(n):
+        pivot = max(range(k, n), key=lambda i: abs(m[i][k]))
+        if m[pivot][k] == 0:
+            raise ArithmeticError(">>> Singular Newton matrix <<<")
+        m[k], m[pivot] = m[pivot], m[k]
+        permutation[k], permutation[pivot] = permutation[pivot], permutation[k]
+        for i in range(k + 1, n):
+            m[i][k] /= m[k][k]
+            for j in range(k + 1, n):
+                m[i][j] -= m[i][k] * m[k][j]
+    return m, permutation
+
+
+def lu_solve(decomposition, b):
+    m, permutation = decomposition
+    n = len(m)
+    x = [b[i] for i in permutation]
+    for i in range(n):
+        for j in range(i):
+            x[i] -= m[i][j] * x[j]
+    for i in reversed(range(n)):
+        for j in range(i + 1, n):
+            x[i] -= m[i][j] * x[j]
+        x[i] /= m[i][i]
+    return x
+
+
+def gauss_legendre(stages):
+    """
+    Butcher tableau of the s stage Gauss-Legendre method (order 2s, symplectic & symmetric)
+    :param stages: 1 (implicit midpoint), 2 or 3
+    :return: a, b, c in the backend type
+    """
+    if stages == 1:
+        return [[number('0.5')]], [number(1)], [number('0.5')]
+    if stages == 2:
+        r3 = sqrt(number(3)) / 6
+        q = number('0.25')
+        return [[q, q - r3], [q + r3, q]], [number('0.5'), number('0.5')], [number('0.5') - r3, number('0.5') + r3]
+    if stages == 3:
+        r15 = sqrt(number(15))
+        a, b, c = number(5) / 36, number(2) / 9, number(5) / 18
+        return ([[a, b - r15 / 15, a - r15 / 30], [a + r15 / 24, b, a - r15 / 24], [a + r15 / 30, b + r15 / 15, a]],
+                [c, number(4) / 9, c], [number('0.5') - r15 / 10, number('0.5'), number('0.5') + r15 / 10])
+    raise Exception('>>> Gauss-Legendre stages must be 1, 2 or 3, was "{found}" <<<'.format(found=stages))
+
+
+class Implicit(object):
+    """
+    Gauss-Legendre collocation for a Hamiltonian H(q, p), the coupled stage equations solved by simplified Newton.
+    Gradients come from Tangent (vector mode dual) numbers, the Newton matrix from nested Tangents (exact second
+    derivatives); there is one per step size, only rebuilt when convergence slows.  Each step is warm started by
+    extrapolating the previous collocation polynomial, rescaled when the step size changes (compositions).
+    """
+
+    def __init__(self, hamiltonian, dimension, stages, tol, slow=6, limit=50):
+        """
+        :param hamiltonian: callable h(q, p) taking two lists of Tangent numbers, returning a Tangent
+        :param dimension: number of degrees of freedom, n
+        :param stages: Gauss-Legendre stages, the order is twice this
+        :param tol: convergence threshold on the Newton corrections
+        :param slow: rebuild the Newton matrix after a step needing more than this many iterations
+        :param limit: give up after this many iterations in one step
+        """
+        self.hamiltonian = hamiltonian
+        self.n = dimension
+        self.s = stages
+        self.tol = tol
+        self.slow = slow
+        self.limit = limit
+        self.a, self.b, self.c = gauss_legendre(stages)
+        a_t = lu([[self.a[j][i] for j in range(self.s)] for i in range(self.s)])
+        self.d = lu_solve(a_t, self.b)  # y1 = y0 + sum d_i Z_i, no extra evaluations at the end of a step
+        self.a_inverse = [lu_solve(lu([row[:] for row in self.a]), [number(int(i == j)) for i in range(self.s)])
+                          for j in range(self.s)]  # columns
+        self.extrapolation = {}  # weights by ratio of step sizes
+        self.newton = {}  # decomposed matrices by step size
+        self.k = None
+        self.h = None  # of the previous step
+        self.steps = 0
+        self.iterations = 0
+        self.evaluations = 0
+        self.jacobians = 0
+
+    def extrapolation_weights(self, ratio):  # integrals of the Lagrange basis on the nodes, from 1 to 1 + ratio c_i
+        weights = []
+        for c_i in self.c:
+            row = []
+            for j in range(self.s):
+                coefficients = [number(1)]  # polynomial l_j(θ), lowest power first
+                for m in range(self.s):
+                    if m != j:
+                        scale = 1 / (self.c[j] - self.c[m])
+                        shifted = [number(0)] + coefficients
+                        for k in range(len(coefficients)):
+                            shifted[k] -= self.c[m] * coefficients[k]
+                        coefficients = [x * scale for x in shifted]
+                row.append(sum(x * ((1 + ratio * c_i)**(k + 1) - 1) / (k + 1) for k, x in enumerate(coefficients)))
+            weights.append(row)
+        return weights
+
+    def field(self, y):
+        """
+        Hamilton's equations, from a single evaluation of H
+        :param y: coordinates followed by momenta
+        :return: dq/dt = dH/dp followed by dp/dt = - dH/dq
+        """
+        self.evaluations += 1
+        variables = Tangent.variables(y)
+        gradient = self.hamiltonian(variables[:self.n], variables[self.n:]).grad
+        return list(gradient[self.n:]) + [- x for x in gradient[:self.n]]
+
+    def jacobian(self, y):
+        """
+        Exact derivatives of Hamilton's equations, from a single evaluation of H in nested Tangents
+        :param y: coordinates followed by momenta
+        :return: the matrix of partials of the field with respect to y, as a list of rows
+        """
+        self.jacobians += 1
+        variables = Tangent.hessian_variables(y)
+        hessian = [x.grad for x in self.hamiltonian(variables[:self.n], variables[self.n:]).grad]
+        return hessian[self.n:] + [[- x for x in row] for row in hessian[:self.n]]
+
+    def build(self, y, h):  # I - h A x J
+        jacobian = self.jacobian(y)
+        size = 2 * self.n
+        matrix = [[number(0)] * (self.s * size) for _ in range(self.s * size)]
+        for i in range(self.s):
+            for j in range(self.s):
+                for r in range(size):
+                    for c in range(size):
+                        matrix[i * size + r][j * size + c] = (1 if i == j and r == c else 0) - h * self.a[i][j] * jacobian[r][c]
+        self.newton[h] = lu(matrix)
+
+    def step(self, y, h):
+        """
+        One Gauss-Legendre step
+        :param y: coordinates followed by momenta, as a list
+        :param h: time step
+        :return: the new list
+        """
+        size = 2 * self.n
+        if self.k is None:
+            f = self.field(y)
+            self.k = [f] * self.s
+            self.h = h
+        if h not in self.newton:
+            self.build(y, h)
+        ratio = h / self.h
+        if ratio not in self.extrapolation:
+            self.extrapolation[ratio] = self.extrapolation_weights(ratio)
+        weights = self.extrapolation[ratio]
+        z = [[self.h * sum(weights[i][j] * self.k[j][r] for j in range(self.s)) for r in range(size)]
+             for i in range(self.s)]
+        count = 0
+        while True:
+            count += 1
+            if count > self.limit:
+                raise RuntimeError(">>> No convergence after {} iterations <<<".format(self.limit))
+            k = [self.field([y[r] + z[i][r] for r in range(size)]) for i in range(self.s)]
+            residual = [- z[i][r] + h * sum(self.a[i][j] * k[j][r] for j in range(self.s))
+                        for i in range(self.s) for r in range(size)]
+            δz = lu_solve(self.newton[h], residual)
+            z = [[z[i][r] + δz[i * size + r] for r in range(size)] for i in range(self.s)]
+            if max(abs(x) for x in δz) <= self.tol:
+                break
+        self.steps += 1
+        self.iterations += count
+        if count > self.slow:
+            self.newton = {}  # all out of date
+        self.h = h
+        self.k = [[sum(self.a_inverse[j][i] * z[j][r] for j in range(self.s)) / h for r in range(size)]
+                  for i in range(self.s)]
+        return [y[r] + sum(self.d[i] * z[i][r] for i in range(self.s)) for r in range(size)]
+
+    def summary(self):
+        return '{{"steps":{:d},"iterations":{:d},"evaluations":{:d},"jacobians":{:d}}}'.format(
+            self.steps, self.iterations, self.evaluations, self.jacobians)
+
+
+print(__name__ + " module loaded", file=stderr)
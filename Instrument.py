@@ -0,0 +1,100 @@
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from inspect import getattr_static, isfunction
+from json import dumps
+from os import environ
+from sys import stderr
+from time import perf_counter
+
+
+class Instrument(object):
+    """
+    Opt-in call counts & timers, enabled by "instrument": true in the IC or by setting INSTRUMENT=1 in the environment.
+    Methods are wrapped by switching each object to a generated subclass, so when disabled nothing is wrapped and the
+    hot path is untouched.  Attach models BEFORE building their Symplectic, as it captures the update methods.
+    """
+
+    def __init__(self, ic):
+        self.enabled = bool(ic.get('instrument', False)) or environ.get('INSTRUMENT', '0') not in ('', '0')
+        self.calls = {}
+        self.seconds = {}
+        self.iterations = {}
+        self.steps = 0
+        self.start = perf_counter()
+
+    def attach(self, target, names=None, histogram=None):
+        """
+        Count & time calls to methods of target, in place
+        :param target: any object, slotted or not
+        :param names: methods to wrap, default all public methods except solve (times are inclusive of nested calls)
+        :param histogram: optional attribute counting solver iterations, binned per call of step()
+        :return: target
+        """
+        if not self.enabled:
+            return target
+        cls = target.__class__
+        if names is None:
+            names = [name for name in dir(cls)
+                     if not name.startswith('_') and name != 'solve' and isfunction(getattr_static(cls, name))]
+        namespace = {'__slots__': ()}
+        for name in names:
+            namespace[name] = self.wrap(cls.__name__ + '.' + name, getattr(cls, name), name, histogram)
+        target.__class__ = type(cls.__name__, (cls,), namespace)
+        for slot in list(getattr(target, '__dict__', ())) + list(getattr(cls, '__slots__', ())):
+            bound = getattr(target, slot, None)  # methods already bound to attributes, e.g. Symplectic.method
+            if getattr(bound, '__self__', None) is target and bound.__func__.__name__ in names:
+                setattr(target, slot, getattr(target, bound.__func__.__name__))
+        self.start = perf_counter()
+        return target
+
+    def wrap(self, label, function, name, histogram):
+        self.calls[label] = 0
+        self.seconds[label] = 0.0
+
+        def wrapper(obj, *args):
+            before = getattr(obj, histogram) if histogram and name == 'step' else None
+            start = perf_counter()
+            result = function(obj, *args)
+            self.seconds[label] += perf_counter() - start
+            self.calls[label] += 1
+            if name == 'step':
+                self.steps += 1
+                if before is not None:
+                    count = getattr(obj, histogram) - before
+                    self.iterations[count] = self.iterations.get(count, 0) + 1
+            elif name == 'run':
+                self.steps += args[0]
+            return result
+        return wrapper
+
+    def report(self):
+        """
+        JSON summary to stderr, steps are those of Symplectic.step, Symplectic.run or Implicit.step, whichever is used
+        """
+        if not self.enabled:
+            return
+        seconds = perf_counter() - self.start
+        print(dumps({'seconds': round(seconds, 6), 'steps': self.steps,
+                     'steps_per_second': round(self.steps / seconds, 3) if seconds > 0 else None,
+                     'calls': {label: count for label, count in self.calls.items() if count},
+                     'seconds_by_method': {label: round(self.seconds[label], 6)
+                                           for label, count in self.calls.items() if count},
+                     'iterations': {str(k): self.iterations[k] for k in sorted(self.iterations)}},
+                    separators=(',', ':')), file=stderr)
+
+
+print(__name__ + " module loaded", file=stderr)
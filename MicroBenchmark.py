@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from json import loads, dumps
+from os import environ, devnull
+from os.path import dirname, join
+from platform import python_version
+from statistics import median
+from subprocess import run, DEVNULL
+from sys import stderr, argv, exit
+from time import perf_counter
+from gmpy2 import get_context
+get_context().precision = 113  # Set this BEFORE importing any Taylor Series stuff! (default, see Backend.select)
+from Symplectic import Symplectic
+from Backend import select, number
+from Bh import Kerr
+from Bh3d import BhSymp
+from DoublePendulum import DoublePendulum
+from Newton import Newton
+from Rosenbrock import himmelblau
+from Tangent import Tangent
+import NelderMead
+
+HERE = dirname(__file__) or '.'
+HISTORY = join(HERE, 'benchmark-history.json')
+PRECISION = 113
+NOISE = 3.0  # regression if slower by more than this many (scaled, combined) MADs . . .
+FLOOR = 0.05  # . . . and by more than this fraction of the base median
+
+
+def commit():
+    """
+    :return: the current git commit, suffixed -dirty if tracked files have been changed
+    """
+    head = run(['git', 'rev-parse', 'HEAD'], cwd=HERE, capture_output=True, text=True).stdout.strip() or 'unknown'
+    dirty = run(['git', 'diff', '--quiet', 'HEAD'], cwd=HERE, stdout=DEVNULL, stderr=DEVNULL).returncode != 0
+    return head + ('-dirty' if dirty else '')
+
+
+def kerr():
+    return Kerr(number(1), number('0.8'), number(0), number(1), number('0.96'), number(3), number(4), number(12),
+                number(0), number('1e-30'), number(1))
+
+
+def bh3d(gradient='dual'):
+    return BhSymp(number('0.8'), number(1), number('0.96'), number(3), number(4), number(12), number(0), True, gradient)
+
+
+def newton():
+    return Newton(number(1), number(1), number('0.6'), number(12))
+
+
+def double_pendulum():
+    return DoublePendulum(number(1), number(1), number(1), number(1), number(1), number(1), number(0), number('0.5'),
+                          number(0), number('1e-30'))
+
+
+def nelder_mead():
+    quiet, NelderMead.stderr = NelderMead.stderr, open('/dev/null', 'w')  # it reports every iteration
+    try:
+        NelderMead.nelder_mead(himmelblau, [3.0, 3.0], [0.1, 0.1], 1.0e-9)
+    finally:
+        NelderMead.stderr.close()
+        NelderMead.stderr = quiet
+
+
+class Solve(object):
+    """
+    A model's own solve() from its initial conditions, the model & integrator are built by setup(), outside the timed
+    region, & the plot ratio leaves just the first & last points (to a null device)
+    """
+
+    def __init__(self, model, step, end, integrator=None, method=False):
+        self.model = model
+        self.step = step
+        self.end = end
+        self.integrator = integrator
+        self.method = method
+        self.args = None
+
+    def setup(self):
+        model = self.model()
+        step = number(self.step)
+        if self.integrator is None:  # implicit
+            self.args = model, (step, 0.0, self.end, 10**9)
+        else:
+            symplectic = Symplectic(model, step, self.integrator, 'suzuki')
+            self.args = model, (symplectic.method if self.method else symplectic, step, 0.0, self.end, 10**9)
+
+    def __call__(self):
+        model, args = self.args
+        with open(devnull, 'w') as sink, redirect_stdout(sink):
+            model.solve(*args)
+
+
+def benchmarks():
+    """
+    The hot paths, each a callable and the number of calls per timed sample
+    """
+    dual, analytic, k, n, dp = bh3d('dual'), bh3d('analytic'), kerr(), newton(), double_pendulum()
+    kerr_state = (k.qr, k.qθ, k.pt, k.pr, k.pθ, k.pφ)
+    kerr_values = [x.val for x in kerr_state]
+    half = number('0.005')
+    return {
+        'bh3d.refresh_dual': (dual.refresh_dual, 1000),
+        'bh3d.refresh_analytic': (analytic.refresh_analytic, 1000),
+        'bh3d.p_update': (lambda: dual.p_update(half), 1000),
+        'kerr.h': (lambda: k.h(*kerr_state), 1000),
+        'kerr.h_tangent': (lambda: k.h(*Tangent.variables(kerr_values)), 200),
+        'newton.h': (lambda: n.h(n.qr, n.pr, n.pφ), 1000),
+        'doublependulum.h': (lambda: dp.h(dp.th1, dp.pth1, dp.th2, dp.pth2), 1000),
+        'secant': (lambda: NelderMead.secant(lambda x: x * (x - 1) * (x - 2) * (x - 3), 0.5, 1.5, 1.0e-12), 1000),
+        'nelder_mead': (nelder_mead, 10),
+        'bh3d.solve': (Solve(bh3d, '0.01', 1000, 'b4'), 1),
+        'bh3d.solve_analytic': (Solve(lambda: bh3d('analytic'), '0.01', 1000, 'b4'), 1),
+        'newton.solve': (Solve(newton, 1, 1000, 'b4'), 1),
+        'kerr.solve': (Solve(kerr, '0.01', 10, 'b2', method=True), 1),
+        'doublependulum.solve': (Solve(double_pendulum, '0.01', 10), 1),
+    }
+
+
+def measure(function, number_, repeats):
+    """
+    :return: median & median absolute deviation of the seconds per call, and the samples
+    """
+    setup = getattr(function, 'setup', lambda: None)  # untimed, before each sample
+    setup()
+    function()  # warm up
+    samples = []
+    for _ in range(repeats):
+        setup()
+        start = perf_counter()
+        for _ in range(number_):
+            function()
+        samples.append((perf_counter() - start) / number_)
+    centre = median(samples)
+    return {'median': centre, 'mad': median(abs(s - centre) for s in samples), 'samples': samples}
+
+
+def record(history_file, repeats, names=None):
+    try:
+        history = loads(open(history_file).read())
+    except FileNotFoundError:
+        history = {}
+    results = {}
+    for name, (function, number_) in benchmarks().items():
+        if names and name not in names:
+            continue
+        results[name] = measure(function, number_, repeats)
+        print(f'{{"benchmark":"{name}","median":{results[name]["median"]:.6e},"mad":{results[name]["mad"]:.6e}}}',
+              flush=True)
+    key = commit()
+    history[key] = {'date': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'python': python_version(),
+                    'precision': PRECISION, 'repeats': repeats, 'results': results}
+    open(history_file, 'w').write(dumps(history, indent=1))
+    print("Recorded {} benchmarks for {}".format(len(results), key), file=stderr)
+
+
+def classify(base, head):
+    """
+    Robust comparison of two timings, the MADs scaled to standard deviations for normally distributed noise
+    :return: regression, improvement or same
+    """
+    spread = 1.4826 * (base['mad']**2 + head['mad']**2)**0.5
+    change = head['median'] - base['median']
+    if abs(change) > NOISE * spread and abs(change) > FLOOR * base['median']:
+        return 'regression' if change > 0 else 'improvement'
+    return 'same'
+
+
+def compare(history_file, base=None, head=None):
+    """
+    :return: the number of regressions of head relative to base, both default to the two latest entries
+    """
+    history = loads(open(history_file).read())
+    latest = sorted(history, key=lambda key: history[key]['date'])
+
+    def find(prefix, default):
+        if prefix is None:
+            return default
+        matches = [key for key in history if key.startswith(prefix)]
+        if len(matches) != 1:
+            raise Exception('>>> Commit "{}" matches {} history entries <<<'.format(prefix, len(matches)))
+        return matches[0]
+    if len(latest) < 2 and (base is None or head is None):
+        raise Exception('>>> Need two history entries to compare, found {} <<<'.format(len(latest)))
+    base, head = find(base, latest[-2] if len(latest) > 1 else None), find(head, latest[-1])
+    print("Comparing {} (head) against {} (base)".format(head, base), file=stderr)
+    regressions = 0
+    for name, timing in history[head]['results'].items():
+        if name not in history[base]['results']:
+            continue
+        previous = history[base]['results'][name]
+        status = classify(previous, timing)
+        regressions += status == 'regression'
+        print(f'{{"benchmark":"{name}","base":{previous["median"]:.6e},"head":{timing["median"]:.6e},'
+              f'"change":{timing["median"] / previous["median"] - 1:+.3f},"status":"{status}"}}')
+    return regressions
+
+
+if __name__ == "__main__":
+    #  Example: ./MicroBenchmark.py run  # time the hot paths at this commit, appending to benchmark-history.json
+    #  Example: ./MicroBenchmark.py compare [base [head]]  # exit status 1 on any regression
+    #  Options: run [repeats [name ...]], HISTORY environment variable for another history file
+    print("Simulator: {}".format(argv[0]), file=stderr)
+    history_path = environ.get('HISTORY', HISTORY)
+    select({'precision': PRECISION}, PRECISION)
+    if len(argv) > 1 and argv[1] == 'run':
+        record(history_path, int(argv[2]) if len(argv) > 2 else 7, argv[3:])
+    elif len(argv) > 1 and argv[1] == 'compare':
+        exit(1 if compare(history_path, *argv[2:4]) else 0)
+    else:
+        raise Exception('>>> Command must be run or compare <<<')
+else:
+    print(__name__ + " module loaded", file=stderr)
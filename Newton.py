@@ -16,61 +16,130 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 
 from json import loads
 from sys import stdin, stderr, argv
-from gmpy2 import get_context, mpfr, sqrt, acos
-get_context().precision = 113  # Set this BEFORE importing any Taylor Series stuff!
+from gmpy2 import get_context
+get_context().precision = 113  # Set this BEFORE importing any Taylor Series stuff! (default, see Backend.select)
 from Symplectic import Symplectic
-from dual import Dual, make_mpfr
+from Backend import select, number, sqrt, acos
+from Instrument import Instrument
+from Binary import writer, close
+from Batch import stream
+from Reducers import reducers, report
+from Events import events
+from dual import Dual
+from Tangent import Tangent
+
+FIELDS = ('tau', 'v4e', 't', 'r', 'th', 'ph')  # plot values, in order
+LINE = '{{"tau":{:.9e},"v4e":{:.9e}, "t":{:.9e},"r":{:.9e},"th":{:.9e},"ph":{:.9e}}}\n'  # as plot() prints
+REDUCE = {'v4e': 'error', 'r': 'range'}  # for "reduce": true
+EVENTS = (('periapsis', 'apoapsis'),)
 
 
 class Newton(object):
+    __slots__ = ('π_2', 'm', 'gm', 'qφ', 'pφ', 'qr', 'pr', 'h0', 'writer', 'reducer', 'events', 'trajectory')
+    EXACT_FLOWS = ('p',)  # updates Symplectic may merge, φ drifts with the radius before the update
+
     def __init__(self, g, m, l_fac, r0):
-        self.π_2 = acos(make_mpfr(0))
+        self.π_2 = acos(number(0))
         self.m = m
         self.gm = g * m
-        self.qφ = make_mpfr(0)
+        self.qφ = number(0)
         self.pφ = Dual.get(l_fac * m * sqrt(r0))
         self.qr = Dual.get(r0)
-        self.pr = Dual.get(make_mpfr(0))
+        self.pr = Dual.get(number(0))
         self.h0 = self.h(self.qr, self.pr, self.pφ).val
+        self.writer = None  # JSON lines, unless a binary Writer is set
+        self.reducer = None  # or Reducers, fed every step
+        self.events = None  # or Events, checked every step
+        self.trajectory = True
 
     def h(self, qr, pr, pφ):  # NOTE: qφ absent from Hamiltonian
         return (pr**2 + pφ**2 / qr**2) / (2 * self.m) - self.gm / qr
 
+    def gradient(self):  # all partials in one pass
+        return self.h(*Tangent.variables([self.qr.val, self.pr.val, self.pφ.val])).grad
+
     def q_update(self, c):
-        qr = c * self.h(self.qr, self.pr.var, self.pφ).der
-        qφ = c * self.h(self.qr, self.pr, self.pφ.var).der
-        self.qr = Dual.get(self.qr.val + qr)  # only update after all coordinates done!
-        self.qφ = self.qφ + qφ
+        _, h_pr, h_pφ = self.gradient()
+        self.qr.val += c * h_pr  # only update after all coordinates done!
+        self.qφ = self.qφ + c * h_pφ
 
     def p_update(self, d):  # no pφ update because qφ absent from Hamiltonian
-        self.pr = Dual.get(self.pr.val - d * self.h(self.qr.var, self.pr, self.pφ).der)
+        self.pr.val -= d * self.gradient()[0]
 
-    def solve(self, method, h, start, end, tr):
-        t = make_mpfr(0)
+    def solve(self, integrator, h, start, end, tr):
+        last = int(end / h)  # first step index with h * i >= end, exactly as the loop condition would see it
+        while h * last < end:
+            last += 1
+        while last > 0 and h * (last - 1) >= end:
+            last -= 1
         i = 0
-        while t < end:
-            if t >= start and i % tr == 0:
-                self.plot(t)
-            method()
-            i += 1
+        while i < last:
             t = h * i
-        self.plot(t)
+            if t >= start:
+                if self.trajectory and i % tr == 0:
+                    integrator.observe(self.plot, t)
+                if self.reducer:
+                    integrator.observe(self.reduce, t)
+                if self.events:
+                    integrator.observe(self.detect, t)
+            n = 1 if self.reducer or self.events else min(tr - i % tr, last - i)  # no output is due before then, so fuse the steps
+            integrator.run(n)
+            i += n
+        if self.trajectory:
+            integrator.observe(self.plot, h * i)
+        if self.reducer:
+            integrator.observe(self.reduce, h * i)
+        if self.events:
+            integrator.observe(self.detect, h * i)
+
+    def values(self, t):
+        return t, self.h(self.qr, self.pr, self.pφ).val - self.h0, t, self.qr.val, self.π_2, self.qφ
+
+    def reduce(self, t):
+        self.reducer.update(self.values(t))
+
+    def detect(self, t):  # turning points of r
+        h_qr, h_pr, h_pφ = self.gradient()
+        self.events.update(self.values(t), (1, None, 1, h_pr, 0, h_pφ), (self.pr.val,), (- h_qr,))
 
     def plot(self, t):
-        print(f'{{"tau":{t:.9e},"v4e":{self.h(self.qr, self.pr, self.pφ).val - self.h0:.9e},',
-              f'"t":{t:.9e},"r":{self.qr.val:.9e},"th":{self.π_2:.9e},"ph":{self.qφ:.9e}}}')
+        v4e = self.h(self.qr, self.pr, self.pφ).val - self.h0
+        if self.writer:
+            self.writer.write(t, v4e, t, self.qr.val, self.π_2, self.qφ)
+        else:
+            print(f'{{"tau":{t:.9e},"v4e":{v4e:.9e},',
+                  f'"t":{t:.9e},"r":{self.qr.val:.9e},"th":{self.π_2:.9e},"ph":{self.qφ:.9e}}}')
+
+
+def simulate(ic):
+    """
+    One run, plotting to stdout
+    :param ic: the "IC" dictionary, its numbers parsed by the selected backend
+    """
+    monitor = Instrument(ic)
+    bh = monitor.attach(Newton(ic['g'], ic['m'], ic['Lfac'], ic['r0']))
+    bh.trajectory = ic.get('trajectory', True)
+    bh.writer = writer(ic, FIELDS, LINE) if bh.trajectory else None
+    bh.reducer = reducers(ic, FIELDS, REDUCE)
+    bh.events = events(ic, FIELDS, EVENTS)
+    step = ic['step']
+    integrator = monitor.attach(Symplectic(bh, step, ic['integrator'], ic['scheme']), ('run', 'observe'))
+    bh.solve(integrator, step, ic['start'], ic['end'], ic['plotratio'])
+    close(bh.writer)
+    report(bh.reducer, bh.trajectory)
+    monitor.report()
 
 
 if __name__ == "__main__":
     # ./Newton.py <initial-conditions.newton.json | ./filegraphics-pi.py initial-conditions.newton.json
     # ./Newton.py <initial-conditions.newton.json | ./plotErrors.py initial-conditions.newton.json t 1
     print("Simulator: {}".format(argv[0]), file=stderr)
-    input_data = open(argv[1]).read() if len(argv) == 2 else stdin.read()
-    ic = loads(input_data, parse_float=mpfr)['IC']
-    print(input_data, file=stderr)
-    bh = Newton(ic['g'], ic['m'], ic['Lfac'], ic['r0'])
-    step = ic['step']
-    integrator = Symplectic(bh, step, ic['integrator'], ic['scheme'])
-    bh.solve(integrator.method, step, ic['start'], ic['end'], ic['plotratio'])
+    if argv[1:] == ['--jsonl']:  # warm process, IC documents one per line, output lines tagged by run
+        stream(stdin, 'Newton')
+    else:
+        input_data = open(argv[1]).read() if len(argv) == 2 else stdin.read()
+        ic = loads(input_data, parse_float=select(loads(input_data)['IC'], 113))['IC']
+        print(input_data, file=stderr)
+        simulate(ic)
 else:
     print(__name__ + " module loaded", file=stderr)
@@ -0,0 +1,149 @@
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from json import dumps
+from math import log10, sqrt
+from sys import stderr
+
+
+def decibels(e):
+    """
+    Error as the pseudo dB value plotErrors.py shows
+    """
+    return 10.0 * log10(e) if e > 1.0e-36 else -360.0
+
+
+class Error(object):
+    """
+    Peak, mean & RMS of the magnitude of an error quantity, e.g. v4e, ER or ETh
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = self.squares = self.peak = 0.0
+
+    def update(self, x):
+        e = abs(float(x))
+        self.count += 1
+        self.total += e
+        self.squares += e * e
+        self.peak = e if e > self.peak else self.peak
+
+    def summary(self):
+        mean = self.total / self.count if self.count else 0.0
+        return {'peak': self.peak, 'mean': mean, 'rms': sqrt(self.squares / self.count) if self.count else 0.0,
+                'peak_db': decibels(self.peak), 'mean_db': decibels(mean)}
+
+
+class Range(object):
+    """
+    Least & greatest values, e.g. of r
+    """
+    def __init__(self):
+        self.least = self.greatest = None
+
+    def update(self, x):
+        x = float(x)
+        if self.least is None or x < self.least:
+            self.least = x
+        if self.greatest is None or x > self.greatest:
+            self.greatest = x
+
+    def summary(self):
+        return {'min': self.least, 'max': self.greatest}
+
+
+class Drift(object):
+    """
+    Departure of a conserved quantity from its first value, e.g. E, L or Q
+    """
+    def __init__(self):
+        self.initial = self.final = None
+        self.peak = 0.0
+
+    def update(self, x):
+        if self.initial is None:
+            self.initial = x
+        self.final = x
+        d = abs(float(x - self.initial))
+        self.peak = d if d > self.peak else self.peak
+
+    def summary(self):
+        return {'initial': float(self.initial) if self.initial is not None else None,
+                'final': float(self.final) if self.final is not None else None,
+                'drift': float(self.final - self.initial) if self.initial is not None else None, 'peak': self.peak}
+
+
+KINDS = {'error': Error, 'range': Range, 'drift': Drift}
+
+
+class Reducers(object):
+    """
+    Streaming statistics over every step of a run, fed the values the model plots, without any output until summary()
+    """
+    def __init__(self, fields, spec):
+        """
+        :param fields: names of the values the model plots, in order
+        :param spec: dictionary of field name to a kind of reducer in KINDS, or to a class with update() & summary()
+        """
+        self.reducers = []
+        for name, kind in spec.items():
+            if name not in fields:
+                raise Exception('>>> Reduced field must be one of {}, was "{found}" <<<'.format(', '.join(fields),
+                                                                                              found=name))
+            if not isinstance(kind, type) and kind not in KINDS:
+                raise Exception('>>> Reducer must be {}, was "{found}" <<<'.format(' or '.join(KINDS), found=kind))
+            self.reducers.append((name, fields.index(name), KINDS[kind]() if kind in KINDS else kind()))
+        self.count = 0
+
+    def update(self, values):
+        self.count += 1
+        for _, i, reducer in self.reducers:
+            reducer.update(values[i])
+
+    def summary(self):
+        summary = {'points': self.count}
+        summary.update({name: reducer.summary() for name, _, reducer in self.reducers})
+        return summary
+
+
+def reducers(ic, fields, defaults):
+    """
+    :param ic: the IC dictionary, "reduce" may be true for the model's defaults, or a dictionary of field to kind
+    :param fields: names of the values the model plots
+    :param defaults: the model's reducers, for "reduce": true
+    :return: Reducers, or None if not asked for
+    """
+    spec = ic.get('reduce')
+    if not spec:
+        return None
+    return Reducers(list(fields), defaults if spec is True else spec)
+
+
+def report(reducer, trajectory):
+    """
+    The summary as one JSON line, to stdout when it is the only output of the run, otherwise to stderr
+    :param reducer: as returned by reducers()
+    :param trajectory: whether the run also plotted
+    """
+    if reducer:
+        summary = dumps(reducer.summary(), separators=(',', ':'))
+        if trajectory:
+            print(summary, file=stderr)
+        else:
+            print(summary)
+
+
+print(__name__ + " module loaded", file=stderr)
@@ -14,24 +14,37 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 """
 
 from sys import stderr
-from gmpy2 import mpfr
-
-D0 = mpfr("0.0")
-D05 = mpfr("0.5")
-D1 = mpfr("1.0")
-D2 = mpfr("2.0")
-D3 = mpfr("3.0")
-D4 = mpfr("4.0")
-D5 = mpfr("5.0")
-D7 = mpfr("7.0")
-D9 = mpfr("9.0")
+from Backend import number
+
+#  Optimized compositions of Stormer-Verlet, first half of each palindrome (the centre weight is computed from the rest)
+MCLACHLAN_S5ODR4 = ('0.28', '0.625466428467670045012338905492649012918215831142346336278001171135782995582')
+KAHAN_LI_S9ODR6 = ('0.39216144400731413927925056', '0.33259913678935943859974864', '-0.70624617255763935980996482',
+                   '0.08221359629355080023149045')
+KAHAN_LI_S15ODR8 = ('0.74167036435061295344822780', '-0.40910082580003159399730010', '0.19075471029623837995387626',
+                    '-0.57386247111608226665638773', '0.29906418130365592384446354', '0.33462491824529818378495798',
+                    '0.31529309239676659663205666')
+KAHAN_LI_S17ODR8 = ('0.13020248308889008087881763', '0.56116298177510838456196441', '-0.38947496264484728640807860',
+                    '0.15884190655515560089621075', '-0.39590389413323757733623154', '0.18453964097831570709183254',
+                    '0.25837438768632204729397911', '0.29501172360931029887096624')
+#  Blanes & Moan SRKN splittings, alternating kick & drift from the outside in (the central pair is computed)
+BLANES_MOAN_SRKN6 = ('0.0829844064174052', '0.245298957184271', '0.396309801498368', '0.604872665711080',
+                     '-0.0390563049223486')
+BLANES_MOAN_SRKN11 = ('0.0414649985182624', '0.123229775946271', '0.198128671918067', '0.290553797799558',
+                      '-0.0400061921041533', '-0.127049212625417', '0.0752539843015807', '-0.246331761062075',
+                      '-0.0115113874206879', '0.357208872795928')
+#  Processed method, kick & drift of a 3 stage kernel with effective order 4, and the weight of its corrector
+PROCESSED_KERNEL = ('-0.2', '0.653878858526576094176692610190530298885583666073405285843959597072833119')
+PROCESSED_CORRECTOR = '0.107706089993736044464581991524118188168193576887731058110207980199158616'
 
 
 class Symplectic(object):
 
     def __init__(self, model, h, order, scheme):
+        D05, D1, D2, D3, D4, D5, D7, D9 = (number(x) for x in ('0.5', 1, 2, 3, 4, 5, 7, 9))  # in the backend type
         self.model = model
         self.h = h
+        self.exact = getattr(model, 'EXACT_FLOWS', ())  # only these updates compose exactly, so can be merged
+        processor = None
         if scheme == 'yoshida':
             print("Yoshida composition", file=stderr)
             self.scheme = self.yoshida
@@ -44,66 +57,94 @@ class Symplectic(object):
             raise Exception('>>> Composition scheme must be yoshida or suzuki, was "{found}" <<<'.format(found=scheme))
         if order == 'b1':
             print("1st order (Euler-Cromer)", file=stderr)
-            self.method = self.euler_cromer
+            build = self.euler_cromer
         elif order == 'b2':
             print("2nd order (Stormer-Verlet))", file=stderr)
-            self.method = self.second_order
+            build = self.second_order
         elif order == 'b4':
             print("4th order (Composed)", file=stderr)
-            self.method = self.fourth_order
+            build = self.fourth_order
         elif order == 'f4':
             print("4th order (Forest-Ruth)", file=stderr)
             self.scheme = self.yoshida
             self.scheme_root = D2
-            self.method = self.fourth_order_forest_ruth
+            build = self.fourth_order_forest_ruth
         elif order == 'b6':
             print("6th order (Composed)", file=stderr)
-            self.method = self.sixth_order
+            build = self.sixth_order
         elif order == 'f6':
             print("6th order (Forest-Ruth) (Composed)", file=stderr)
             self.scheme = self.yoshida
             self.scheme_root = D2
-            self.method = self.sixth_order_forest_ruth
+            build = self.sixth_order_forest_ruth
         elif order == 'b8':
             print("8th order (Composed)", file=stderr)
-            self.method = self.eightth_order
+            build = self.eightth_order
         elif order == 'f8':
             print("8th order (Forest-Ruth) (Composed)", file=stderr)
             self.scheme = self.yoshida
             self.scheme_root = D2
-            self.method = self.eightth_order_forest_ruth
+            build = self.eightth_order_forest_ruth
         elif order == 'b10':
             print("10th order (Composed)", file=stderr)
-            self.method = self.tenth_order
+            build = self.tenth_order
         elif order == 'f10':
             print("10th order (Forest-Ruth) (Composed)", file=stderr)
             self.scheme = self.yoshida
             self.scheme_root = D2
-            self.method = self.tenth_order_forest_ruth
+            build = self.tenth_order_forest_ruth
         elif order == 's4':
             print("4th order (Smith)", file=stderr)
             self.scheme = self.suzuki
             self.scheme_root = D4
-            self.method = self.fourth_order_smith
+            build = self.fourth_order_smith
         elif order == 's6':
             print("6th order (Smith)", file=stderr)
             self.scheme = self.suzuki
             self.scheme_root = D4
-            self.method = self.sixth_order_smith
+            build = self.sixth_order_smith
         elif order == 's8':
             print("8th order (Smith)", file=stderr)
             self.scheme = self.suzuki
             self.scheme_root = D4
-            self.method = self.eightth_order_smith
+            build = self.eightth_order_smith
         elif order == 's10':
             print("10th order (Smith) (Composed)", file=stderr)
             self.scheme = self.suzuki
             self.scheme_root = D4
-            self.method = self.tenth_order_smith
+            build = self.tenth_order_smith
+        elif order == 's5odr4':
+            print("4th order (McLachlan, 5 stages)", file=stderr)
+            self.weights = self.palindrome(MCLACHLAN_S5ODR4)
+            build = self.optimized_composition
+        elif order == 's9odr6':
+            print("6th order (Kahan-Li, 9 stages)", file=stderr)
+            self.weights = self.palindrome(KAHAN_LI_S9ODR6)
+            build = self.optimized_composition
+        elif order == 's15odr8':
+            print("8th order (Kahan-Li, 15 stages)", file=stderr)
+            self.weights = self.palindrome(KAHAN_LI_S15ODR8)
+            build = self.optimized_composition
+        elif order == 's17odr8':
+            print("8th order (Kahan-Li, 17 stages)", file=stderr)
+            self.weights = self.palindrome(KAHAN_LI_S17ODR8)
+            build = self.optimized_composition
+        elif order == 'bm4':
+            print("4th order (Blanes-Moan SRKN, 6 stages)", file=stderr)
+            self.coefficients = self.srkn(BLANES_MOAN_SRKN6, h)
+            build = self.blanes_moan
+        elif order == 'bm6':
+            print("6th order (Blanes-Moan SRKN, 11 stages)", file=stderr)
+            self.coefficients = self.srkn(BLANES_MOAN_SRKN11, h)
+            build = self.blanes_moan
+        elif order == 'p4':
+            print("4th order effective (Processed, 3 stages)", file=stderr)
+            build = self.processed_kernel
+            processor = self.processed_corrector
         else:
             raise Exception(
-                '>>> Integrator must be b1, b2, [bfs]4, [bfs]6, [bfs]8, or [bfs]10, was "{found}" <<<'.format(
-                    found=order))
+                '>>> Integrator must be b1, b2, [bfs]4, [bfs]6, [bfs]8, [bfs]10, s5odr4, s9odr6, s15odr8, s17odr8, bm4, '
+                'bm6 or p4, was "{found}" <<<'.format(found=order))
         self.w1 = D1 / (self.scheme_root - self.scheme_root ** (D1 / D9))
         self.x1 = D1 / (self.scheme_root - self.scheme_root ** (D1 / D7))
         self.y1 = D1 / (self.scheme_root - self.scheme_root ** (D1 / D5))
@@ -187,18 +228,100 @@ class Symplectic(object):
             h * self.z1 * self.y0 * self.x0, h * self.z1 * self.y0 * self.x0, h * self.z1 * self.y0 * self.x0,
             D05 * h * (self.z1 + self.z0) * self.y0 * self.x0, h * self.z0 * self.y0 * self.x0
         ]
+        self.stages = []  # the composition is expanded ONCE here, into a flat list of ('q' or 'p', coefficient)
+        build()
+        self.schedule = self.compile(self.stages)
+        first, last = self.stages[0], self.stages[-1]
+        if len(self.stages) > 1 and first[0] == last[0] and first[0] in self.exact:  # fusion across step boundaries
+            self.opening = self.compile(self.stages[:1])
+            self.fused = self.compile(self.stages[1:-1] + [(last[0], last[1] + first[1])])
+            self.closing = self.compile(self.stages[1:])
+        else:
+            self.opening = []
+            self.fused = self.closing = self.schedule
+        self.method = self.step
+        print("{} stages per step".format(len(self.stages)), file=stderr)
+        self.entry = self.exit = []
+        if processor:  # the kernel runs on processed coordinates from here on, see observe()
+            kernel, self.stages = self.stages, []
+            processor()
+            corrector, self.stages = self.stages, kernel
+            self.entry = self.compile(corrector)
+            self.exit = self.compile([(kind, - coefficient) for kind, coefficient in reversed(corrector)])
+            self.apply(self.entry)
+
+    def q_update(self, c):
+        self.stage('q', c)
+
+    def p_update(self, d):
+        self.stage('p', d)
+
+    def stage(self, kind, coefficient):
+        if self.stages and self.stages[-1][0] == kind and kind in self.exact:  # merge adjacent updates of the same type
+            self.stages[-1] = (kind, self.stages[-1][1] + coefficient)
+        else:
+            self.stages.append((kind, coefficient))
+
+    def compile(self, stages):
+        return [(self.model.q_update if kind == 'q' else self.model.p_update, coefficient) for kind, coefficient in stages]
+
+    @staticmethod
+    def apply(schedule):
+        for update, coefficient in schedule:
+            update(coefficient)
+
+    def step(self):
+        for update, coefficient in self.schedule:
+            update(coefficient)
+
+    def observe(self, plot, *args):
+        """
+        Call plot(*args) with the model in its true coordinates, for processed integrators the corrector is applied
+        just for the plot and then undone, leaving the kernel state as it was (to rounding)
+        :param plot: model output method
+        """
+        self.apply(self.exit)
+        plot(*args)
+        self.apply(self.entry)
+
+    def run(self, n):
+        """
+        Perform n steps, merging the last update of each step into the first update of the next where they match
+        :param n: number of steps, the model is only guaranteed to be at a step boundary on return
+        """
+        for update, coefficient in self.opening:
+            update(coefficient)
+        for i in range(n - 1):
+            for update, coefficient in self.fused:
+                update(coefficient)
+        for update, coefficient in self.closing:
+            update(coefficient)
+
+    @staticmethod
+    def palindrome(half):
+        weights = [number(x) for x in half]
+        centre = 1 - 2 * sum(weights)  # consistent to working precision, whatever the table precision
+        return weights + [centre] + weights[::-1]
+
+    @staticmethod
+    def srkn(outer, h):
+        coefficients = [number(x) * h for x in outer]
+        kicks, drifts = coefficients[0::2], coefficients[1::2]
+        if len(kicks) == len(drifts):  # last kick is half, central drift
+            return coefficients + [0.5 * h - sum(kicks), h - 2 * sum(drifts)]
+        return coefficients + [0.5 * h - sum(drifts), h - 2 * sum(kicks)]  # last drift is half, central kick
 
     def euler_cromer(self):
-        self.model.q_update(self.h)
-        self.model.p_update(self.h)
+        self.q_update(self.h)
+        self.p_update(self.h)
 
     def stormer_verlet(self, s):
-        self.model.q_update(s * self.cd_sv[0])
-        self.model.p_update(s * self.cd_sv[1])
-        self.model.q_update(s * self.cd_sv[0])
+        self.q_update(s * self.cd_sv[0])
+        self.p_update(s * self.cd_sv[1])
+        self.q_update(s * self.cd_sv[0])
 
     def second_order(self):
-        self.stormer_verlet(D1)
+        self.stormer_verlet(1)
 
     @staticmethod
     def yoshida(base_method, s, plus, minus):
@@ -224,66 +347,97 @@ class Symplectic(object):
         self.scheme(self.base6, s, self.x1, self.x0)
 
     def fourth_order(self):
-        self.base4(D1)
+        self.base4(1)
 
     def sixth_order(self):
-        self.base6(D1)
+        self.base6(1)
 
     def eightth_order(self):
-        self.base8(D1)
+        self.base8(1)
 
     def tenth_order(self):
-        self.scheme(self.base8, D1, self.w1, self.w0)
+        self.scheme(self.base8, 1, self.w1, self.w0)
 
     def forest_ruth_4(self, s):
-        self.model.q_update(s * self.cd_f4[0])
-        self.model.p_update(s * self.cd_f4[1])
-        self.model.q_update(s * self.cd_f4[2])
-        self.model.p_update(s * self.cd_f4[3])
-        self.model.q_update(s * self.cd_f4[2])
-        self.model.p_update(s * self.cd_f4[1])
-        self.model.q_update(s * self.cd_f4[0])
+        self.q_update(s * self.cd_f4[0])
+        self.p_update(s * self.cd_f4[1])
+        self.q_update(s * self.cd_f4[2])
+        self.p_update(s * self.cd_f4[3])
+        self.q_update(s * self.cd_f4[2])
+        self.p_update(s * self.cd_f4[1])
+        self.q_update(s * self.cd_f4[0])
 
     def fourth_order_forest_ruth(self):
-        self.forest_ruth_4(D1)
+        self.forest_ruth_4(1)
 
     def base6_forest_ruth(self, s):
         self.scheme(self.forest_ruth_4, s, self.y1, self.y0)
 
     def sixth_order_forest_ruth(self):
-        self.base6_forest_ruth(D1)
+        self.base6_forest_ruth(1)
 
     def base8_forest_ruth(self, s):
         self.scheme(self.base6_forest_ruth, s, self.x1, self.x0)
 
     def eightth_order_forest_ruth(self):
-        self.base8_forest_ruth(D1)
+        self.base8_forest_ruth(1)
 
     def tenth_order_forest_ruth(self):
-        self.scheme(self.base8_forest_ruth, D1, self.w1, self.w0)
+        self.scheme(self.base8_forest_ruth, 1, self.w1, self.w0)
 
     def smith(self, s):
         size = len(self.coefficients)
         for i in range(size):
-            (self.model.q_update if i % 2 == 0 else self.model.p_update)(s * self.coefficients[i])
+            (self.q_update if i % 2 == 0 else self.p_update)(s * self.coefficients[i])
         for i in range(size - 2, -1, -1):
-            (self.model.q_update if i % 2 == 0 else self.model.p_update)(s * self.coefficients[i])
+            (self.q_update if i % 2 == 0 else self.p_update)(s * self.coefficients[i])
 
     def fourth_order_smith(self):
         self.coefficients = self.cd_s4
-        self.smith(D1)
+        self.smith(1)
 
     def sixth_order_smith(self):
         self.coefficients = self.cd_s6
-        self.smith(D1)
+        self.smith(1)
 
     def eightth_order_smith(self):
         self.coefficients = self.cd_s8
-        self.smith(D1)
+        self.smith(1)
 
     def tenth_order_smith(self):
         self.coefficients = self.cd_s8
-        self.scheme(self.smith, D1, self.w1, self.w0)
+        self.scheme(self.smith, 1, self.w1, self.w0)
+
+    def optimized_composition(self):
+        for weight in self.weights:
+            self.stormer_verlet(weight)
+
+    def processed_kernel(self):  # three kicks, the drifts at either end merge between steps
+        kick, drift = (number(x) * self.h for x in PROCESSED_KERNEL)
+        self.q_update(drift)
+        self.p_update(kick)
+        self.q_update(0.5 * self.h - drift)
+        self.p_update(self.h - 2 * kick)
+        self.q_update(0.5 * self.h - drift)
+        self.p_update(kick)
+        self.q_update(drift)
+
+    def processed_corrector(self):  # maps true to kernel coordinates, a product of flows with the exit map its inverse
+        c = number(PROCESSED_CORRECTOR) * self.h
+        self.q_update(c)
+        self.p_update(- c)
+        self.q_update(-2 * c)
+        self.p_update(2 * c)
+        self.q_update(2 * c)
+        self.p_update(- c)
+        self.q_update(- c)
+
+    def blanes_moan(self):  # as smith, but kicks first, for Hamiltonians quadratic in the momenta
+        size = len(self.coefficients)
+        for i in range(size):
+            (self.p_update if i % 2 == 0 else self.q_update)(self.coefficients[i])
+        for i in range(size - 2, -1, -1):
+            (self.p_update if i % 2 == 0 else self.q_update)(self.coefficients[i])
 
 
 print(__name__ + " module loaded", file=stderr)
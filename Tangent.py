@@ -0,0 +1,127 @@
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from sys import stderr
+from Backend import number, sqrt, sin, cos
+
+
+class Tangent(object):
+    """
+    Vector mode dual number: a value and its gradient with respect to every variable, so one evaluation of a
+    Hamiltonian yields all of its partial derivatives.  The interface follows Dual (sqr, sqrt, sin, cos etc.),
+    so the same h() functions accept either type.  Numbers come from the current backend.
+    """
+    __slots__ = ('val', 'grad')
+
+    def __init__(self, val, grad):
+        self.val = val
+        self.grad = grad
+
+    @classmethod
+    def variables(cls, values):
+        """
+        Independent variables, one per value
+        :param values: a sequence of numbers
+        :return: a list of Tangents, the i-th having a unit gradient in direction i
+        """
+        zero, one = number(0), number(1)
+        n = len(values)
+        return [cls(value, tuple(one if i == j else zero for j in range(n))) for i, value in enumerate(values)]
+
+    @classmethod
+    def hessian_variables(cls, values):
+        """
+        Independent variables for exact second derivatives, Tangents whose values & gradients are themselves Tangents
+        :param values: a sequence of numbers
+        :return: a list of nested Tangents, for h() of these h.grad[i].val is the i-th partial & h.grad[i].grad[j] the
+        second partial with respect to i & j
+        """
+        zero, one = number(0), number(1)
+        n = len(values)
+        zeros = tuple(zero for _ in range(n))
+        return [cls(value, tuple(cls(one if i == j else zero, zeros) for j in range(n)))
+                for i, value in enumerate(cls.variables(values))]
+
+    def __pos__(self):
+        return Tangent(self.val, self.grad)
+
+    def __neg__(self):
+        return Tangent(- self.val, tuple(- x for x in self.grad))
+
+    def __add__(self, o):
+        if isinstance(o, Tangent):
+            return Tangent(self.val + o.val, tuple(x + y for x, y in zip(self.grad, o.grad)))
+        return Tangent(self.val + o, self.grad)
+
+    def __radd__(self, o):
+        return Tangent(o + self.val, self.grad)
+
+    def __sub__(self, o):
+        if isinstance(o, Tangent):
+            return Tangent(self.val - o.val, tuple(x - y for x, y in zip(self.grad, o.grad)))
+        return Tangent(self.val - o, self.grad)
+
+    def __rsub__(self, o):
+        return Tangent(o - self.val, tuple(- x for x in self.grad))
+
+    def __mul__(self, o):
+        if isinstance(o, Tangent):
+            return Tangent(self.val * o.val, tuple(x * o.val + self.val * y for x, y in zip(self.grad, o.grad)))
+        return Tangent(self.val * o, tuple(x * o for x in self.grad))
+
+    def __rmul__(self, o):
+        return Tangent(o * self.val, tuple(o * x for x in self.grad))
+
+    def __truediv__(self, o):
+        if isinstance(o, Tangent):
+            val = self.val / o.val
+            return Tangent(val, tuple((x - val * y) / o.val for x, y in zip(self.grad, o.grad)))
+        return Tangent(self.val / o, tuple(x / o for x in self.grad))
+
+    def __rtruediv__(self, o):
+        val = o / self.val
+        return Tangent(val, tuple(- val * x / self.val for x in self.grad))
+
+    def __pow__(self, a):
+        if a == 2:
+            return self.sqr
+        d = a * self.val**(a - 1)
+        return Tangent(self.val**a, tuple(d * x for x in self.grad))
+
+    @property
+    def sqr(self):
+        d = 2 * self.val
+        return Tangent(self.val * self.val, tuple(d * x for x in self.grad))
+
+    @property
+    def sqrt(self):
+        r = self.val.sqrt if isinstance(self.val, Tangent) else sqrt(self.val)
+        d = 2 * r
+        return Tangent(r, tuple(x / d for x in self.grad))
+
+    @property
+    def sin(self):
+        s, c = (self.val.sin, self.val.cos) if isinstance(self.val, Tangent) else (sin(self.val), cos(self.val))
+        return Tangent(s, tuple(c * x for x in self.grad))
+
+    @property
+    def cos(self):
+        s, c = (self.val.sin, self.val.cos) if isinstance(self.val, Tangent) else (sin(self.val), cos(self.val))
+        d = - s
+        return Tangent(c, tuple(d * x for x in self.grad))
+
+
+print(__name__ + " module loaded", file=stderr)
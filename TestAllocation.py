@@ -0,0 +1,66 @@
+from tracemalloc import start, stop, get_traced_memory, reset_peak
+from unittest import TestCase, main
+
+from Backend import number
+from Bh import Kerr
+from Bh3d import BhSymp
+from DoublePendulum import DoublePendulum
+from Newton import Newton
+from Symplectic import Symplectic
+
+
+class AllocationTest(TestCase):
+    """
+    Model state is held in slots & updated in place, so after warming up, a run must not grow the heap,
+    and its peak must not depend on the number of steps
+    """
+    def allocations(self, model, step, slack=1024):
+        start()
+        try:
+            step(100)  # number caches fill up while traced
+            before, _ = get_traced_memory()
+            reset_peak()
+            step(100)
+            _, peak_short = get_traced_memory()
+            reset_peak()
+            step(1000)
+            after, peak_long = get_traced_memory()
+        finally:
+            stop()
+        self.assertFalse(hasattr(model, '__dict__'))
+        self.assertLess(after - before, slack)
+        self.assertLess(peak_long - before, 2 * (peak_short - before) + slack)
+
+    def test_bh3d_analytic(self):
+        model = BhSymp(number('0.8'), number(1), number('0.96'), number(3), number(4), number(12), number(0), True,
+                       'analytic')
+        self.allocations(model, Symplectic(model, number('0.01'), 'b4', 'suzuki').run)
+
+    def test_bh3d_dual(self):
+        model = BhSymp(number('0.8'), number(1), number('0.96'), number(3), number(4), number(12), number(0), True)
+        self.allocations(model, Symplectic(model, number('0.01'), 'b4', 'suzuki').run)
+
+    def test_newton(self):
+        model = Newton(number(1), number(1), number('0.6'), number(12))
+        self.allocations(model, Symplectic(model, number(1), 'b4', 'suzuki').run)
+
+    def test_kerr_extended_phase_space(self):
+        model = Kerr(number(1), number('0.8'), number(0), number(1), number('0.96'), number(3), number(4), number(12),
+                     number(0), number('1e-30'), number(1))
+        self.allocations(model, Symplectic(model, number('0.1'), 'b2', 'yoshida').run)
+
+    def test_double_pendulum_implicit(self):
+        model = DoublePendulum(number(1), number(1), number(1), number(1), number(1), number(1), number(0),
+                               number('0.5'), number(0), number('1e-30'))
+        model.implicit.slow = model.implicit.limit  # one Newton matrix, built while warming up, so every step is alike
+
+        def steps(n):
+            for _ in range(n):
+                model.gauss_legendre(number('0.01'))
+        # numbers left over depend on the last step's iteration count, a leak of one per step would be 56 kB
+        self.allocations(model, steps, 8192)
+        self.assertEqual(1, model.implicit.jacobians)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+from io import BytesIO
+from unittest import TestCase, main
+
+from Archive import Writer, Reader, points, MAGIC
+
+FIELDS = ('tau', 'r', 'ph')
+
+
+class ArchiveTest(TestCase):
+    """
+    A key range read must decompress only the chunks that overlap it, and return exactly the rows within it
+    """
+    @staticmethod
+    def archive(codec, rows=10):
+        f = BytesIO()
+        writer = Writer(f, FIELDS, 'tau', codec, rows)
+        for i in range(95):
+            writer.write([0.5 * i, 10.0 + i, -1.0 * i])
+        writer.close()
+        f.seek(0)
+        return f
+
+    def test_range(self):
+        for codec in ('zlib', 'lzma'):
+            reader = Reader(self.archive(codec))
+            self.assertEqual(10, len(reader.index))
+            self.assertEqual(95, len(reader.read().tau))
+            selection = reader.read(10.0, 15.0, ['r'])
+            self.assertEqual(('r',), selection.dtype.names)
+            self.assertEqual([10.0 + i for i in range(20, 31)], list(selection.r))
+            self.assertEqual(2, len(list(reader.chunks(10.0, 15.0))))
+            self.assertIsNone(reader.read(100.0, 200.0))
+
+    def test_points(self):
+        f = self.archive('zlib')
+        self.assertEqual(MAGIC, f.getvalue()[:len(MAGIC)])
+        self.assertEqual({'tau': 47.0, 'r': 104.0, 'ph': -94.0}, list(points(f))[-1])
+
+    def test_bad_arguments(self):
+        self.assertRaises(Exception, Writer, BytesIO(), FIELDS, 'mino')
+        self.assertRaises(Exception, Writer, BytesIO(), FIELDS, 'tau', 'bz2')
+        self.assertRaises(Exception, lambda: list(Reader(self.archive('zlib')).chunks(fields=['t'])))
+
+
+if __name__ == '__main__':
+    main()
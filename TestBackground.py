@@ -0,0 +1,80 @@
+from threading import Event, Timer
+from unittest import TestCase, main
+
+from gmpy2 import mpfr, get_context
+
+from Background import Background
+
+
+class Sink(object):
+    """
+    Holds the writer thread until released, so the queue fills
+    """
+    fields = ('tau', 'r')
+
+    def __init__(self):
+        self.records = []
+        self.release = Event()
+
+    def batch(self, records):
+        self.release.wait()
+        self.records.extend(records)
+
+    def flush(self):
+        pass
+
+
+class BackgroundTest(TestCase):
+    """
+    A full queue must block, drop the oldest records or spill them to disk, as asked, and the counters must agree
+    """
+    @staticmethod
+    def run_with(policy, n=100):
+        sink = Sink()
+        out = Background(sink, 4, policy, batch=8)
+        Timer(0.2, sink.release.set).start()  # by then the queue has filled
+        for i in range(n):
+            out.write(float(i), 2.0 * i)
+        out.close()
+        return sink.records, out.counters
+
+    def test_block(self):
+        records, counters = self.run_with('block')
+        self.assertEqual([(float(i), 2.0 * i) for i in range(100)], records)
+        self.assertEqual((100, 100, 0, 0), (counters['queued'], counters['written'], counters['dropped'],
+                                            counters['spilled']))
+
+    def test_spill(self):
+        records, counters = self.run_with('spill')
+        self.assertEqual([(float(i), 2.0 * i) for i in range(100)], records)  # in order, none lost
+        self.assertGreater(counters['spilled'], 0)
+        self.assertEqual(100, counters['written'])
+
+    def test_spill_precision(self):
+        precision, get_context().precision = get_context().precision, 236
+        try:
+            third = mpfr(1) / 3
+            sink = Sink()
+            out = Background(sink, 2, 'spill')
+            Timer(0.2, sink.release.set).start()
+            for i in range(20):
+                out.write(third * i, third)
+            out.close()
+            self.assertGreater(out.counters['spilled'], 0)
+            self.assertEqual([(third * i, third) for i in range(20)], sink.records)  # all 236 bits kept
+        finally:
+            get_context().precision = precision
+
+    def test_drop(self):
+        records, counters = self.run_with('drop')
+        self.assertEqual(100, counters['written'] + counters['dropped'])
+        self.assertGreater(counters['dropped'], 0)
+        self.assertEqual((99.0, 198.0), records[-1])
+        self.assertEqual(sorted(records), records)
+
+    def test_bad_policy(self):
+        self.assertRaises(Exception, Background, Sink(), 4, 'ignore')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from json import loads, dumps
+from tempfile import TemporaryDirectory
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from gmpy2 import get_context
+
+import Backend
+from Batch import execute, stream
+from Newton import simulate
+
+
+def document(name, **settings):
+    with open(name) as f:
+        loaded = loads(f.read())
+    loaded['IC'].update(settings)
+    return loaded
+
+
+class BatchTest(TestCase):
+    """
+    Retries with a smaller step, timeouts & the warm process JSONL round trip
+    """
+    def setUp(self):
+        self.backend, self.precision = Backend.current, get_context().precision
+
+    def tearDown(self):
+        Backend.current, get_context().precision = self.backend, self.precision
+
+    def test_retry(self):  # a negative tolerance never converges, so every attempt fails
+        pendulum = document('initial-conditions.double-pendulum.example', tol=-1.0, end=0.1)
+        with TemporaryDirectory() as directory:
+            summary = execute('run-0', 'pendulum', pendulum, directory, 60, 2)
+        self.assertTrue(summary['status'].startswith('failed'), summary['status'])
+        self.assertEqual(3, summary['attempts'])
+        self.assertEqual(0.0025, summary['step'])
+        self.assertEqual(200, pendulum['IC']['plotratio'])
+
+    def test_timeout(self):
+        newton = document('initial-conditions.newton.example', end=1.0e9)
+        with TemporaryDirectory() as directory:
+            summary = execute('run-0', 'newton', newton, directory, 0.5, 2)
+        self.assertEqual('timeout', summary['status'])
+        self.assertEqual(1, summary['attempts'])
+        self.assertLess(summary['seconds'], 30)
+
+    def test_stream(self):
+        newton = document('initial-conditions.newton.example', end=20)
+        named = dict(newton, run='named')
+        lines = [dumps(newton), '', dumps(named), 'not json', dumps(dict(newton, Simulator='Nope')), '[]']
+        out, err = StringIO(), StringIO()
+        with patch('Batch.stdout', out), patch('Batch.stderr', err):
+            stream(lines, 'Bh3d')
+        statuses = [loads(line) for line in err.getvalue().splitlines()]
+        self.assertEqual([1, 'named', 4, 5, 6], [s['run'] for s in statuses])
+        self.assertEqual(['ok', 'ok'], [s['status'] for s in statuses[:2]])
+        self.assertTrue(all(s['status'].startswith('error') for s in statuses[2:]))
+        self.assertEqual('Nope', statuses[3]['simulator'])
+        points = [loads(line) for line in out.getvalue().splitlines()]
+        first = [{k: v for k, v in p.items() if k != 'run'} for p in points if p['run'] == 1]
+        second = [{k: v for k, v in p.items() if k != 'run'} for p in points if p['run'] == 'named']
+        self.assertEqual(len(points), len(first) + len(second))
+        self.assertEqual(first, second)
+        direct = StringIO()
+        with redirect_stdout(direct):
+            simulate(loads(dumps(newton), parse_float=Backend.select(newton['IC'], 113))['IC'])
+        self.assertEqual([loads(line) for line in direct.getvalue().splitlines()], first)
+
+
+if __name__ == '__main__':
+    main()
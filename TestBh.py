@@ -0,0 +1,44 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from json import loads
+from unittest import TestCase, main
+
+from Backend import number
+from Bh import simulate
+
+
+class BhTest(TestCase):
+    """
+    Bh.py initial conditions are checked before any integration
+    """
+    @staticmethod
+    def ic(**settings):
+        ic = {"M": 1.0, "a": 0.8, "q": 0.0, "mu": 1.0, "E": 0.96, "L": 3.0, "Q": 4.0, "r0": 12.0, "th0": 0.0,
+              "tol": 1e-15, "start": 0.0, "end": 1.0, "step": 0.1, "plotratio": 1, "integrator": "b4", "omega": 1.0}
+        ic.update(settings)
+        return {k: number(v) if isinstance(v, float) else v for k, v in ic.items() if v is not None}
+
+    def test_bad_integrator(self):
+        with self.assertRaisesRegex(Exception, 'integrator must be'):
+            simulate(self.ic(integrator='b3'))
+
+    def test_missing_omega(self):
+        with self.assertRaisesRegex(Exception, 'omega'):
+            simulate(self.ic(omega=None))
+
+    def test_bad_omega(self):
+        for ω in (0.0, -1.0):
+            with self.assertRaisesRegex(Exception, 'omega'):
+                simulate(self.ic(omega=ω))
+
+    def test_explicit(self):
+        out = StringIO()
+        with redirect_stdout(out):
+            simulate(self.ic())
+        lines = [loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(11, len(lines))
+        self.assertLess(max(abs(p['v4e']) for p in lines), 1e-9)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+from contextlib import redirect_stdout
+from io import BytesIO, TextIOWrapper
+from json import loads
+from subprocess import run
+from sys import executable
+from unittest import TestCase, main
+
+from Backend import number
+from Binary import read, points, writer
+from Newton import Newton, FIELDS
+from Symplectic import Symplectic
+
+
+class BinaryTest(TestCase):
+    """
+    The binary output must carry the same values as the JSON lines, and both must read back the same way
+    """
+    @staticmethod
+    def output(fmt):
+        out = TextIOWrapper(BytesIO(), write_through=True)
+        with redirect_stdout(out):
+            model = Newton(number(1), number(1), number('0.6'), number(12))
+            model.writer = writer({'output': fmt}, FIELDS)
+            model.solve(Symplectic(model, number(1), 'b4', 'suzuki'), number(1), 0, 100, 1)
+        return out.buffer.getvalue()
+
+    def test_round_trip(self):
+        text, binary = self.output('json'), self.output('binary')
+        self.assertLess(len(binary), len(text))
+        j, b = read(BytesIO(text)), read(BytesIO(binary))
+        self.assertEqual(FIELDS, j.dtype.names)
+        self.assertEqual(FIELDS, b.dtype.names)
+        self.assertEqual(101, len(b))
+        for field in FIELDS:
+            for x, y in zip(j[field], b[field]):
+                self.assertAlmostEqual(x, y, delta=1e-9 * (1 + abs(y)))  # JSON has ten significant figures
+        self.assertEqual(list(points(BytesIO(binary))), [dict(zip(FIELDS, row)) for row in b.tolist()])
+        self.assertEqual(list(j.r), [p['r'] for p in points(BytesIO(text))])
+
+    def test_finterp(self):  # JSON lines pass through untouched, binary records are reformatted
+        text, binary = self.output('json'), self.output('binary')
+        command = [executable, 'finterp.py', 't', '10.0']
+        from_text = run(command, input=text, capture_output=True, check=True).stdout
+        from_binary = run(command, input=binary, capture_output=True, check=True).stdout
+        self.assertEqual(10, len(from_text.splitlines()))
+        self.assertTrue(set(from_text.splitlines(True)) <= set(text.splitlines(True)))
+        self.assertEqual([loads(line)['t'] for line in from_text.splitlines()],
+                         [loads(line)['t'] for line in from_binary.splitlines()])
+
+    def test_bad_format(self):
+        self.assertRaises(Exception, writer, {'output': 'xml'}, FIELDS)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+from asyncio import run
+from json import loads, dumps
+from os import environ
+from os.path import exists, join
+from socket import create_connection
+from subprocess import Popen, DEVNULL
+from sys import executable
+from tempfile import TemporaryDirectory
+from threading import Thread, Event
+from unittest import TestCase, main
+
+from Distributed import Coordinator
+
+
+class DistributedTest(TestCase):
+    """
+    A coordinator in a (daemon) thread, two local worker processes, and two workers that fail: one disconnects holding
+    a job, the other holds a job but sends no heartbeats
+    """
+    @staticmethod
+    def coordinate(coordinator):
+        listening, results = Event(), []
+        thread = Thread(target=lambda: results.append(run(coordinator.serve('127.0.0.1', 0, listening.set))),
+                        daemon=True)
+        thread.start()
+        assert listening.wait(30)
+        return thread, results
+
+    def take(self, port):
+        connection = create_connection(('127.0.0.1', port))
+        connection.sendall((dumps({'type': 'ready'}) + '\n').encode())
+        self.assertEqual('job', loads(connection.makefile().readline())['type'])
+        return connection
+
+    def test_sweep(self):
+        with TemporaryDirectory() as directory:
+            coordinator = Coordinator({'base': 'initial-conditions.newton.example',
+                                       'grid': {'Lfac': [0.5, 0.6, 0.7, 0.6]}, 'set': {'end': 50.0},
+                                       'output': directory, 'heartbeat': 0.5})
+            self.assertEqual(3, len(coordinator.jobs))
+            self.assertEqual(1, coordinator.duplicates)
+            thread, results = self.coordinate(coordinator)
+            port = coordinator.port
+            self.take(port).close()
+            silent = self.take(port)
+            workers = [Popen([executable, 'Distributed.py', 'worker', '127.0.0.1', str(port)], env=environ,
+                             stderr=DEVNULL) for _ in range(2)]
+            thread.join(120)
+            self.assertFalse(thread.is_alive())
+            silent.close()
+            for worker in workers:
+                self.assertEqual(0, worker.wait(30))
+            summaries = results[0]
+            self.assertEqual(3, len(summaries))
+            self.assertEqual(['ok'] * 3, [summary['status'] for summary in summaries])
+            self.assertEqual(51, summaries[0]['lines'])
+            self.assertEqual(5, sum(summary['dispatches'] for summary in summaries))  # both failed jobs requeued
+            self.assertIn('Lfac=0.6 + Lfac=0.6', [summary['source'] for summary in summaries])
+            for summary in summaries:
+                self.assertTrue(exists(join(directory, summary['run'] + '.out')))
+                self.assertEqual(51, sum(1 for _ in open(join(directory, summary['run'] + '.out'))))
+            self.assertTrue(exists(join(directory, 'summary.json')))
+
+    def test_dispatches(self):  # a job that keeps losing its worker is eventually marked failed
+        with TemporaryDirectory() as directory:
+            coordinator = Coordinator({'ics': ['initial-conditions.newton.example'], 'output': directory,
+                                       'heartbeat': 0.5, 'dispatches': 2})
+            thread, results = self.coordinate(coordinator)
+            self.take(coordinator.port).close()
+            silent = self.take(coordinator.port)
+            thread.join(60)
+            self.assertFalse(thread.is_alive())
+            silent.close()
+            summary, = results[0]
+            self.assertEqual(2, summary['dispatches'])
+            self.assertTrue(summary['status'].startswith('failed: no heartbeat'), summary['status'])
+            self.assertEqual(0, summary['lines'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+from fractions import Fraction
+from random import Random
+from unittest import TestCase, main
+
+import gmpy2
+from gmpy2 import mpfr, get_context
+
+import DoubleDouble
+from DoubleDouble import DoubleDouble as DD
+
+BOUNDS = {  # largest relative error against 300 bit mpfr, over the arguments in cases()
+    'sin': 1e-31, 'cos': 1e-31, 'acos': 2e-31, 'sqrt': 1e-31, 'exp': 1e-31, 'log': 5e-30,  # log loses some close to 1
+}
+
+
+class DoubleDoubleTest(TestCase):
+    """
+    The double-double functions must be accurate to their documented bounds, including near the zeros of sin & cos
+    and the end points of acos, where the error relative to the result is hardest to keep down
+    """
+    def setUp(self):
+        self.precision, get_context().precision = get_context().precision, 300
+
+    def tearDown(self):
+        get_context().precision = self.precision
+
+    @staticmethod
+    def cases(random):
+        near_zeros = [k * 3.141592653589793 / 2 + random.uniform(-1e-6, 1e-6) for k in range(-12, 13) if k]
+        return {
+            'sin': [random.uniform(-20, 20) for _ in range(500)] + near_zeros,
+            'cos': [random.uniform(-20, 20) for _ in range(500)] + near_zeros,
+            'acos': [random.uniform(-1, 1) for _ in range(500)]
+                    + [s * (1 - 10**random.uniform(-15, -1)) for s in (-1, 1) for _ in range(100)],
+            'sqrt': [random.uniform(0, 100) for _ in range(500)],
+            'exp': [random.uniform(-10, 10) for _ in range(500)],
+            'log': [random.uniform(0.01, 100) for _ in range(500)],
+        }
+
+    def test_accuracy(self):
+        random = Random(1)
+        for name, arguments in self.cases(random).items():
+            ours, reference = getattr(DoubleDouble, name), getattr(gmpy2, name)
+            for x in arguments:
+                x = DD.get(Fraction(x) * (1 + Fraction(random.uniform(-1, 1)) / 2**60))  # a low part too
+                exact = reference(mpfr(x.hi) + mpfr(x.lo))
+                y = ours(x)
+                self.assertLessEqual(abs(mpfr(y.hi) + mpfr(y.lo) - exact), BOUNDS[name] * abs(exact),
+                                     msg='{}({!r})'.format(name, x))
+
+    def test_end_points(self):
+        self.assertEqual(DoubleDouble.PI, DoubleDouble.acos(DD(-1.0)))
+        self.assertEqual(DD(0.0), DoubleDouble.acos(DD(1.0)))
+
+    def test_format(self):
+        for x in (0.0, -0.0, 1.5, -2.0e-300, 6.02e23):
+            self.assertEqual(format(x, '.9e'), format(DD(x), '.9e'))
+        self.assertEqual('0.000000000e+00', format(DD(1.0) - DD(1.0), '.9e'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from json import loads
+from math import sin, cos, pi, sqrt
+from unittest import TestCase, main
+
+from Backend import number
+from Events import Events, events
+from Newton import Newton, FIELDS, EVENTS
+from Symplectic import Symplectic
+
+
+class EventsTest(TestCase):
+    """
+    Events must be located between steps far more precisely than the step size, and be the only output if asked
+    """
+    def test_interpolant(self):
+        out = StringIO()
+        with redirect_stdout(out):
+            detector = Events(('x', 'y'), (('rising', 'falling'),))
+            for i in range(8):
+                x = 0.5 * i
+                detector.update((x, sin(x)), (1, cos(x)), (sin(x),), (cos(x),))
+        records = [loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(['falling'], [r['event'] for r in records])
+        self.assertEqual(-1, records[0]['direction'])
+        self.assertAlmostEqual(pi, records[0]['x'], delta=1e-3)  # cubic Hermite over steps of 0.5
+        self.assertAlmostEqual(0.0, records[0]['y'], delta=1e-3)
+
+    @staticmethod
+    def kepler(step):
+        out = StringIO()
+        with redirect_stdout(out):
+            model = Newton(number(1), number(1), number('0.6'), number(12))
+            model.events = events({'events': True, 'trajectory': False}, FIELDS, EVENTS)
+            model.trajectory = False
+            model.solve(Symplectic(model, number(step), 'b4', 'suzuki'), number(step), 0, 400, 1)
+        return [loads(line) for line in out.getvalue().splitlines()]
+
+    def test_kepler(self):
+        l2 = (0.6 * sqrt(12))**2
+        e = l2 / (2 * 144) - 1 / 12  # energy, then the turning points are roots of e r^2 + r - l^2 / 2
+        r_p, r_a = (-1 + sqrt(1 + 2 * e * l2)) / (2 * e), (-1 - sqrt(1 + 2 * e * l2)) / (2 * e)
+        period = 2 * pi * (0.5 * (r_p + r_a))**1.5
+        records = self.kepler(0.1)
+        self.assertEqual(['periapsis', 'apoapsis'] * 3, [r['event'] for r in records])
+        for record in records:
+            self.assertAlmostEqual(r_p if record['event'] == 'periapsis' else r_a, record['r'], delta=1e-5 * r_a)
+        self.assertAlmostEqual(period, records[2]['t'] - records[0]['t'], delta=1e-4 * period)
+        coarse = self.kepler(1.0)
+        self.assertEqual(len(records), len(coarse))
+        for fine, rough in zip(records, coarse):
+            self.assertAlmostEqual(fine['t'], rough['t'], delta=1e-3)  # a step of 1 still finds them to a small fraction
+
+    def test_binary_trajectory(self):
+        self.assertRaises(Exception, events, {'events': True, 'output': 'binary'}, FIELDS, EVENTS)
+        self.assertIsNone(events({}, FIELDS, EVENTS))
+
+
+if __name__ == '__main__':
+    main()
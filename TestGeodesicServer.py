@@ -0,0 +1,55 @@
+from asyncio import StreamReader, create_task, run, sleep
+from json import dumps, loads
+from multiprocessing import active_children
+from os import getpid
+from time import perf_counter, sleep as pause
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from GeodesicServer import GeodesicServer
+
+NAP = 1.0
+
+
+def nap():  # a slow warm-up, in a pool process
+    pause(NAP)
+    return getpid()
+
+
+class GeodesicServerTest(TestCase):
+    """
+    Every pool process is started before the first client, and requests may split characters across reads
+    """
+    def test_prepare(self):
+        server = GeodesicServer(3, 'Bh3d')
+        try:
+            before = len(active_children())  # the Manager process
+            with patch('GeodesicServer.warm', nap):
+                start = perf_counter()
+                pids = run(server.prepare())
+                elapsed = perf_counter() - start
+            self.assertEqual(3, len(set(pids)))  # concurrent, so each in its own process
+            self.assertLess(elapsed, 2 * NAP)
+            self.assertEqual(before + 3, len(active_children()))
+        finally:
+            server.pool.shutdown()
+            server.readers.shutdown()
+            server.manager.shutdown()
+
+    def test_split_character(self):
+        document = dumps({'Simulator': 'Newton', 'IC': {'note': 'périapside'}}, ensure_ascii=False).encode()
+        split = document.index('é'.encode()) + 1  # between the two bytes of é
+
+        async def request():
+            reader = StreamReader()
+            reader.feed_data(document[:split])
+            task = create_task(GeodesicServer.request(reader))
+            await sleep(0.01)
+            reader.feed_data(document[split:])
+            reader.feed_eof()
+            return await task
+        self.assertEqual('périapside', loads(run(request()))['IC']['note'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+from os import environ
+from unittest import TestCase, main
+
+from gmpy2 import get_context
+
+import Backend
+from Golden import cases, load, bh3d, ensemble, newton, double_pendulum
+
+FULL = environ.get('GOLDEN') == 'full'  # otherwise just the fast subset: a few cases, the first few samples
+MODE = 'full' if FULL else 'fast'
+FAST = ('Light1', 'ParticleNoCapture', 'initial-conditions.newton.example',
+        'initial-conditions.double-pendulum.example')
+FAST_SAMPLES = 5
+SETTINGS = {  # integrator, scheme & steps per golden sample interval, far cheaper than the reference
+    'bh3d': ('b4', 'suzuki', 25),
+    'newton': ('b4', 'suzuki', 20),
+    'doublependulum': ('gl4', '-', 10),
+}
+TOLERANCES = {  # |x - golden| <= tolerance * (1 + |golden|), ~100x the deviations measured with SETTINGS, except for
+    'fast': {  # t & φ, which are first order quadratures in these models
+        'bh3d': {'t': 2e-3, 'r': 4e-11, 'th': 3e-12, 'ph': 2e-10},
+        'newton': {'r': 3e-7, 'pr': 2e-7, 'ph': 1e-2},
+        'doublependulum': {'th1': 1e-9, 'pth1': 1e-9, 'th2': 1e-9, 'pth2': 1e-9},
+    },
+    'full': {  # deviations grow over the full length, & Light2, 3 & 5 pass close to the poles
+        'bh3d': {'t': 2e-3, 'r': 2e-10, 'th': 1e-7, 'ph': 1e-2},
+        'newton': {'r': 1e-4, 'pr': 1e-4, 'ph': 3e-2},
+        'doublependulum': {'th1': 5e-9, 'pth1': 5e-9, 'th2': 5e-9, 'pth2': 5e-9},
+    },
+}
+FLOAT = {  # rounding dominates in double precision, Light1 & Light4 are unstable spherical photon orbits
+    'fast': {'bh3d': {'r': 1e-7, 'ph': 5e-8}},
+    'full': {'bh3d': {'r': 1e-5}},
+}
+PRECISE = {  # high order & small steps, a few samples, against the golden "digits" well beyond double precision
+    'bh3d': ('s17odr8', 'suzuki', 50, 2, {'mpfr': {'r': 1e-25, 'th': 3e-18}, 'dd': {'r': 2e-23, 'th': 1e-15}}),
+    'newton': ('s17odr8', 'suzuki', 50, 5, {'mpfr': {'r': 3e-18, 'pr': 1e-18}}),
+    'doublependulum': ('gl6', '-', 40, 2, {'mpfr': {'th1': 3e-17, 'pth1': 3e-17, 'th2': 3e-17, 'pth2': 3e-17}}),
+}
+
+
+class GoldenTest(TestCase):
+    """
+    Every backend must reproduce the high precision reference trajectories in golden/ (see Golden.py),
+    set GOLDEN=full for all the shipped cases over their full length
+    """
+    def setUp(self):
+        self.backend, self.precision = Backend.current, get_context().precision
+
+    def tearDown(self):
+        Backend.current, get_context().precision = self.backend, self.precision
+
+    @staticmethod
+    def records(model):
+        return [load(m, c) for m, c, _ in cases() if m == model and (FULL or c in FAST)]
+
+    @staticmethod
+    def count(record):
+        return record['count'] if FULL else FAST_SAMPLES
+
+    @staticmethod
+    def tolerances(model, backend):
+        found = dict(TOLERANCES[MODE][model])
+        if backend == 'float':
+            found.update(FLOAT[MODE].get(model, {}))
+        return found
+
+    def compare(self, record, samples, tolerances, exact=False):
+        for i, (golden, sample) in enumerate(zip(record['digits' if exact else 'samples'], samples)):
+            for quantity, tolerance in tolerances.items():
+                g = Backend.number(golden[quantity]) if exact else golden[quantity]
+                x = sample[quantity] if exact else float(sample[quantity])
+                self.assertLessEqual(abs(x - g), tolerance * (1 + abs(g)),
+                                     msg='{} sample {} {}'.format(record['case'], i, quantity))
+
+    def scalar(self, model, run, backend, precision, *args):
+        Backend.select({'backend': backend}, precision)
+        integrator, scheme, steps = SETTINGS[model]
+        tolerances = self.tolerances(model, backend)
+        for record in self.records(model):
+            self.compare(record, run(record['ic'], integrator, scheme, steps, record['interval'], self.count(record),
+                                     *args), tolerances)
+
+    def precise(self, model, run, backend, precision, *args):
+        Backend.select({'backend': backend}, precision)
+        integrator, scheme, steps, count, tolerances = PRECISE[model]
+        for record in self.records(model):
+            self.compare(record, run(record['ic'], integrator, scheme, steps, record['interval'], count, *args),
+                         tolerances[backend], True)
+
+    def vectorized(self, backend):
+        Backend.select({'backend': backend}, 53)
+        integrator, scheme, steps = SETTINGS['bh3d']
+        groups = {}
+        for record in self.records('bh3d'):
+            groups.setdefault((record['ic']['a'], record['ic']['mu'], record['interval']), []).append(record)
+        for records in groups.values():
+            trajectories = ensemble([record['ic'] for record in records], integrator, scheme, steps,
+                                    records[0]['interval'], self.count(records[0]))
+            for record, samples in zip(records, trajectories):
+                self.compare(record, samples, self.tolerances('bh3d', backend))
+
+    def test_bh3d_mpfr_dual(self):
+        self.scalar('bh3d', bh3d, 'mpfr', 113, 'dual')
+
+    def test_bh3d_mpfr_analytic(self):
+        self.scalar('bh3d', bh3d, 'mpfr', 113, 'analytic')
+
+    def test_bh3d_float(self):
+        self.scalar('bh3d', bh3d, 'float', 53, 'analytic')
+
+    def test_bh3d_dd(self):
+        self.scalar('bh3d', bh3d, 'dd', 106, 'analytic')
+
+    def test_bh3d_mpfr_precise(self):
+        self.precise('bh3d', bh3d, 'mpfr', 113, 'analytic')
+
+    def test_bh3d_dd_precise(self):
+        self.precise('bh3d', bh3d, 'dd', 106, 'analytic')
+
+    def test_ensemble_float(self):
+        self.vectorized('float')
+
+    def test_ensemble_dd(self):
+        self.vectorized('dd')
+
+    def test_newton_mpfr(self):
+        self.scalar('newton', newton, 'mpfr', 113)
+
+    def test_newton_float(self):
+        self.scalar('newton', newton, 'float', 53)
+
+    def test_newton_mpfr_precise(self):
+        self.precise('newton', newton, 'mpfr', 113)
+
+    def test_double_pendulum_mpfr(self):
+        self.scalar('doublependulum', double_pendulum, 'mpfr', 236)
+
+    def test_double_pendulum_mpfr_precise(self):
+        self.precise('doublependulum', double_pendulum, 'mpfr', 236)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from json import loads
+from unittest import TestCase, main
+from unittest.mock import patch
+
+from Bh3d import BhSymp
+from Instrument import Instrument
+from Symplectic import Symplectic
+
+
+MODEL = (0.8, 1.0, 0.94550509567490792, 1.4343745095317371, 7.9787599589278697, 7.5, 0.0, True)
+
+
+class InstrumentTest(TestCase):
+    """
+    Wrapped methods are counted exactly, and the results are unchanged
+    """
+    @staticmethod
+    def run_with(ic):
+        monitor = Instrument(ic)
+        model = monitor.attach(BhSymp(*MODEL))
+        integrator = monitor.attach(Symplectic(model, 0.01, 'b4', 'suzuki'), ('step', 'observe'))
+        output, report = StringIO(), StringIO()
+        with redirect_stdout(output), patch('Instrument.stderr', report):
+            model.solve(integrator, 0.01, 0.0, 10.0, 5)
+            monitor.report()
+        return monitor, integrator, output.getvalue(), report.getvalue()
+
+    def test_disabled(self):
+        monitor, integrator, _, report = self.run_with({})
+        self.assertIs(Symplectic, integrator.__class__)
+        self.assertEqual({}, monitor.calls)
+        self.assertEqual('', report)
+
+    def test_counts(self):
+        _, _, plain, _ = self.run_with({})
+        monitor, integrator, output, report = self.run_with({'instrument': True})
+        self.assertEqual(plain, output)
+        points = output.splitlines()
+        steps = round(loads(points[-1])['mino'] / 0.01)
+        drifts = sum(1 for kind, _ in integrator.stages if kind == 'q')
+        kicks = len(integrator.stages) - drifts
+        self.assertEqual(steps, monitor.steps)
+        self.assertEqual(steps, monitor.calls['Symplectic.step'])
+        self.assertEqual(len(points), monitor.calls['Symplectic.observe'])
+        self.assertEqual(steps * drifts, monitor.calls['BhSymp.q_update'])
+        self.assertEqual(steps * drifts, monitor.calls['BhSymp.refresh_dual'])  # bound in a slot, rebound by attach
+        self.assertEqual(steps * kicks, monitor.calls['BhSymp.p_update'])
+        summary = loads(report)
+        self.assertEqual(steps, summary['steps'])
+        self.assertEqual(monitor.calls['BhSymp.p_update'], summary['calls']['BhSymp.p_update'])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,72 @@
-from decimal import Decimal
+from contextlib import redirect_stdout
+from io import StringIO
+from json import loads
 from unittest import TestCase, main
 
 from Bh3d import BhSymp
 from Symplectic import Symplectic
 
 
-class KdSTest(TestCase):
-    def test_debug_output_order_2(self):
-        Symplectic(None, 1.0, 'b2', stages = 5, debug=True).method()
-
-    def test_debug_output_order_4(self):
-        Symplectic(None, 1.0, 'b4', stages = 5, debug=True).method()
+MODEL = (0.8, 1.0, 0.94550509567490792, 1.4343745095317371, 7.9787599589278697, 7.5, 0.0, True)
+STAGES = {  # integrator: stages per step for the suzuki & yoshida compositions, only kicks merge in this model
+    'b1': (2, 2), 'b2': (3, 3), 'b4': (15, 9), 'b6': (75, 27), 'b8': (375, 81), 'b10': (1875, 243),
+    'f4': (7, 7), 's4': (11, 11), 's5odr4': (15, 15), 's9odr6': (27, 27), 'bm4': (13, 13), 'p4': (7, 7),
+}
 
-    def test_debug_output_order_6(self):
-        Symplectic(None, 1.0, 'b6', stages = 5, debug=True).method()
 
-    def test_debug_output_order_8(self):
-        Symplectic(None, 1.0, 'b8', stages = 5, debug=True).method()
+class KdSTest(TestCase):
+    @staticmethod
+    def solve(model, integrator, step, start, end, interval):
+        """
+        :return: steps taken, points plotted before the final one & the largest 4-velocity norm error
+        """
+        output = StringIO()
+        with redirect_stdout(output):
+            model.solve(integrator, step, start, end, interval)
+        points = [loads(line) for line in output.getvalue().splitlines()]
+        return round(points[-1]['mino'] / step), len(points) - 1, max(abs(point['v4e']) for point in points)
+
+    def test_stage_counts(self):
+        model = BhSymp(*MODEL)
+        for integrator, counts in STAGES.items():
+            for scheme, count in zip(('suzuki', 'yoshida'), counts):
+                self.assertEqual(count, len(Symplectic(model, 1.0, integrator, scheme).stages), (integrator, scheme))
+
+    def test_consistency(self):
+        model = BhSymp(*MODEL)
+        for integrator in STAGES:
+            stages = Symplectic(model, 1.0, integrator, 'suzuki').stages
+            self.assertAlmostEqual(1.0, sum(c for kind, c in stages if kind == 'q'), places=15, msg=integrator)
+            self.assertAlmostEqual(1.0, sum(c for kind, c in stages if kind == 'p'), places=15, msg=integrator)
+
+    def test_analytic_matches_dual(self):  # the closed forms give every printed digit of the Dual derivatives
+        output = {}
+        for gradient in ('dual', 'analytic'):
+            model = BhSymp(*MODEL, gradient)
+            output[gradient] = StringIO()
+            with redirect_stdout(output[gradient]):
+                model.solve(Symplectic(model, 0.01, 'b4', 'suzuki'), 0.01, 0.0, 100.0, 1)
+        self.assertGreater(len(output['dual'].getvalue().splitlines()), 400)
+        self.assertEqual(output['dual'].getvalue(), output['analytic'].getvalue())
 
     def test_good_integrator_types(self):
-        self.assertIsInstance(Symplectic(None, 1.0, 'b1', stages=5), Symplectic)
-        self.assertIsInstance(Symplectic(None, 1.0, 'b2', stages=5), Symplectic)
-        self.assertIsInstance(Symplectic(None, 1.0, 'b4', stages=5), Symplectic)
+        model = BhSymp(*MODEL)
+        self.assertIsInstance(Symplectic(model, 1.0, 'b1', 'suzuki'), Symplectic)
+        self.assertIsInstance(Symplectic(model, 1.0, 'b2', 'suzuki'), Symplectic)
+        self.assertIsInstance(Symplectic(model, 1.0, 'b4', 'yoshida'), Symplectic)
 
     def test_bad_integrator_types(self):
-        self.assertRaises(Exception, Symplectic, 1.0, 'xxx')
+        self.assertRaises(Exception, Symplectic, BhSymp(*MODEL), 1.0, 'xxx', 'suzuki')
+
+    def test_bad_scheme(self):
+        self.assertRaises(Exception, Symplectic, BhSymp(*MODEL), 1.0, 'b4', 'xxx')
 
     def test_solve_symp_polar_sb2(self):
         start = 0.0
         end = 10.0
         step = 0.0001
         interval = 1
-        model = BhSymp(0.0,
-                        1.0,
+        model = BhSymp(1.0,
                         1.0,
                         0.96210432940242041,
                         5.6843449527674236e-13,
@@ -40,17 +74,17 @@ class KdSTest(TestCase):
                         12.0,
                         0.0,
                         True)
-        counts = model.solve(Symplectic(model, step, 'b2', stages=5).method, step, start, end, interval)
+        counts = self.solve(model, Symplectic(model, step, 'b2', 'suzuki'), step, start, end, interval)
         self.assertEqual(695, counts[0])
         self.assertEqual(695, counts[1])
+        self.assertLess(counts[2], 1e-10)
 
     def test_solve_symp_light_sb1(self):
         start = 0.0
         end = 10.0
         step = 0.001
         interval = 1
-        model = BhSymp(0.0,
-                        1.0,
+        model = BhSymp(1.0,
                         0.0,
                         1.0,
                         -2.0,
@@ -58,17 +92,17 @@ class KdSTest(TestCase):
                         3.0,
                         0.0,
                         True)
-        counts = model.solve(Symplectic(model, step, 'b1', stages=5).method, step, start, end, interval)
+        counts = self.solve(model, Symplectic(model, step, 'b1', 'suzuki'), step, start, end, interval)
         self.assertEqual(1058, counts[0])
         self.assertEqual(1058, counts[1])
+        self.assertLess(counts[2], 0.1)
 
     def test_solve_symp_0_sb2(self):
         start = 0.0
         end = 10.0
         step = 0.001
         interval = 1
-        model = BhSymp(0.0,
-                        0.8,
+        model = BhSymp(0.8,
                         1.0,
                         0.94550509567490792,
                         1.4343745095317371,
@@ -76,17 +110,17 @@ class KdSTest(TestCase):
                         7.5,
                         0.0,
                         True)
-        counts = model.solve(Symplectic(model, step, 'b2', stages=5).method, step, start, end, interval)
+        counts = self.solve(model, Symplectic(model, step, 'b2', 'suzuki'), step, start, end, interval)
         self.assertEqual(220, counts[0])
         self.assertEqual(220, counts[1])
+        self.assertLess(counts[2], 1e-6)
 
     def test_solve_symp_non_0_sb1(self):
         start = 5.0
         end = 10.0
         step = 0.001
         interval = 1
-        model = BhSymp(0.0,
-                        0.8,
+        model = BhSymp(0.8,
                         1.0,
                         0.94550509567490792,
                         1.4343745095317371,
@@ -94,17 +128,17 @@ class KdSTest(TestCase):
                         7.5,
                         0.0,
                         True)
-        counts = model.solve(Symplectic(model, step, 'b1', stages=5).method, step, start, end, interval)
+        counts = self.solve(model, Symplectic(model, step, 'b1', 'suzuki'), step, start, end, interval)
         self.assertEqual(220, counts[0])
         self.assertEqual(121, counts[1])
+        self.assertLess(counts[2], 1e-3)
 
     def test_solve_symp_non_0_sb2(self):
         start = 5.0
         end = 10.0
         step = 0.001
         interval = 1
-        model = BhSymp(0.0,
-                        0.8,
+        model = BhSymp(0.8,
                         1.0,
                         0.94550509567490792,
                         1.4343745095317371,
@@ -112,17 +146,17 @@ class KdSTest(TestCase):
                         7.5,
                         0.0,
                         True)
-        counts = model.solve(Symplectic(model, step, 'b2', stages=5).method, step, start, end, interval)
+        counts = self.solve(model, Symplectic(model, step, 'b2', 'suzuki'), step, start, end, interval)
         self.assertEqual(220, counts[0])
         self.assertEqual(121, counts[1])
+        self.assertLess(counts[2], 1e-6)
 
     def test_solve_symp_non_0_sb4(self):
         start = 5.0
         end = 10.0
         step = 0.001
         interval = 1
-        model = BhSymp(0.0,
-                        0.8,
+        model = BhSymp(0.8,
                         1.0,
                         0.94550509567490792,
                         1.4343745095317371,
@@ -130,9 +164,10 @@ class KdSTest(TestCase):
                         7.5,
                         0.0,
                         True)
-        counts = model.solve(Symplectic(model, step, 'b4', stages=5).method, step, start, end, interval)
+        counts = self.solve(model, Symplectic(model, step, 'b4', 'suzuki'), step, start, end, interval)
         self.assertEqual(220, counts[0])
         self.assertEqual(121, counts[1])
+        self.assertLess(counts[2], 1e-13)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,58 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from json import loads
+from math import sqrt
+from unittest import TestCase, main
+
+from Backend import number
+from Newton import Newton, FIELDS, REDUCE
+from Reducers import Reducers, reducers
+from Symplectic import Symplectic
+
+
+class ReducersTest(TestCase):
+    """
+    Streaming statistics over every step must agree with the same statistics over a full trajectory dump
+    """
+    @staticmethod
+    def run_with(reduce, trajectory, tr):
+        out = StringIO()
+        with redirect_stdout(out):
+            model = Newton(number(1), number(1), number('0.6'), number(12))
+            model.reducer = reducers({'reduce': reduce}, FIELDS, REDUCE)
+            model.trajectory = trajectory
+            model.solve(Symplectic(model, number(1), 'b4', 'suzuki'), number(1), 0, 100, tr)
+        return model.reducer, [loads(line) for line in out.getvalue().splitlines()]
+
+    def test_every_step(self):
+        _, dump = self.run_with(False, True, 1)
+        reducer, lines = self.run_with(True, False, 10)
+        self.assertEqual([], lines)  # summary only, no trajectory
+        summary = reducer.summary()
+        self.assertEqual(len(dump), summary['points'])
+        errors = [abs(p['v4e']) for p in dump]
+        self.assertAlmostEqual(max(errors), summary['v4e']['peak'], delta=1e-9 * max(errors))
+        self.assertAlmostEqual(sum(errors) / len(errors), summary['v4e']['mean'], delta=1e-9 * max(errors))
+        self.assertAlmostEqual(sqrt(sum(e * e for e in errors) / len(errors)), summary['v4e']['rms'],
+                               delta=1e-9 * max(errors))
+        self.assertAlmostEqual(min(p['r'] for p in dump), summary['r']['min'], delta=1e-8)
+        self.assertAlmostEqual(max(p['r'] for p in dump), summary['r']['max'], delta=1e-8)
+
+    def test_trajectory_unchanged(self):
+        self.assertEqual(self.run_with(False, True, 10)[1], self.run_with({'r': 'drift'}, True, 10)[1])
+
+    def test_drift(self):
+        reducer = Reducers(['E'], {'E': 'drift'})
+        for value in (1.0, 1.5, 0.25):
+            reducer.update((value,))
+        self.assertEqual({'points': 3, 'E': {'initial': 1.0, 'final': 0.25, 'drift': -0.75, 'peak': 0.75}},
+                         reducer.summary())
+
+    def test_bad_spec(self):
+        self.assertRaises(Exception, Reducers, FIELDS, {'E': 'drift'})
+        self.assertRaises(Exception, Reducers, FIELDS, {'r': 'median'})
+        self.assertIsNone(reducers({}, FIELDS, REDUCE))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from glob import glob
+from json import loads
+from os.path import basename, dirname, join
+from sys import stdin, stderr, argv
+from time import time
+from gmpy2 import get_context
+get_context().precision = 113  # Set this BEFORE importing any Taylor Series stuff! (default, see Backend.select)
+from Backend import select, number
+from Bh import Kerr, TAO_INTEGRATORS, FIELDS as KERR_FIELDS
+from Bh3d import BhSymp, FIELDS as BH3D_FIELDS
+from DoublePendulum import DoublePendulum
+from Efficiency import sweep
+from Newton import Newton, FIELDS as NEWTON_FIELDS
+
+HERE = dirname(__file__) or '.'
+SYMPLECTIC = ['b1', 'b2', 'b4', 'b6', 'b8', 'b10', 'f4', 'f6', 'f8', 'f10', 's4', 's6', 's8', 's10',
+              's5odr4', 's9odr6', 's15odr8', 's17odr8', 'bm4', 'bm6', 'p4']
+COMPOSED = ('b4', 'b6', 'b8', 'b10')  # the only ones affected by the composition scheme
+CAPTURES = ('LightCapture', 'ParticleCapture')
+IMPLICIT = ['gl2', 'gl4', 'gl6', 'rk4']  # Gauss-Legendre by order, RK4 for reference
+FIELDS = ['model', 'case', 'integrator', 'scheme', 'step', 'steps', 'evaluations', 'seconds', 'peak', 'mean']
+
+
+def kerr_cases():  # the shipped geodesics, captures excluded as the error is meaningless past the horizon
+    names = [name for name in sorted(glob(join(HERE, 'ic', '*'))) if basename(name) not in CAPTURES]
+    return [(basename(name), loads(open(name).read(), parse_float=number)) for name in names
+            if '"Q"' in open(name).read()]
+
+
+def example(name):
+    return [(name, loads(open(join(HERE, name)).read(), parse_float=number)['IC'])]
+
+
+def bh3d(ic, integrator, scheme, step, duration, tr, config):
+    bh = BhSymp(ic['a'], ic['mu'], ic['E'], ic['L'], ic['Q'], ic['r0'], ic['th0'], True,
+                config.get('gradient', 'analytic'))
+    return sweep(bh, BH3D_FIELDS, integrator, scheme, step, duration, tr, lambda q, p: q)  # R & Θ refreshes dominate
+
+
+def newton(ic, integrator, scheme, step, duration, tr, config):
+    bh = Newton(ic['g'], ic['m'], ic['Lfac'], ic['r0'])
+    return sweep(bh, NEWTON_FIELDS, integrator, scheme, step, duration, tr, lambda q, p: q + p)  # one gradient each
+
+
+def kerr(ic, integrator, scheme, step, duration, tr, config):
+    bh = Kerr(ic['M'], ic['a'], ic.get('q', 0), ic['mu'], ic['E'], ic['L'], ic['Q'], ic['r0'], ic['th0'],
+              number(config.get('tol', '1e-30')), number(config.get('omega', 1)))
+    return sweep(bh, KERR_FIELDS, integrator, scheme, step, duration, tr, lambda q, p: q + 2 * p,  # see Kerr.p_update
+                 method=True)
+
+
+def double_pendulum(ic, integrator, scheme, step, duration, tr, config):
+    dp = DoublePendulum(ic['g'], ic['l1'], ic['m1'], ic['l2'], ic['m2'], ic['th1'], ic['pth1'], ic['th2'],
+                        ic['pth2'], ic['tol'], 1 if integrator == 'rk4' else int(integrator[2:]) // 2)
+    method = dp.rk4 if integrator == 'rk4' else dp.gauss_legendre
+    steps = int(duration / step)
+    errors = [0.0]
+    start = time()
+    for i in range(steps):  # as DoublePendulum.solve, which has no writer to intercept
+        method(step)
+        if (i + 1) % tr == 0:
+            errors.append(abs(dp.h(dp.th1, dp.pth1, dp.th2, dp.pth2).val - dp.h0))
+    seconds = time() - start
+    return {'steps': steps, 'evaluations': 4 * steps if integrator == 'rk4' else dp.implicit.evaluations,
+            'seconds': seconds, 'errors': errors}
+
+
+MODELS = {  # cases, runner & integrators; each case's own "step" is the largest in the sweep
+    'bh3d': (kerr_cases, bh3d, SYMPLECTIC),
+    'newton': (lambda: example('initial-conditions.newton.example'), newton, SYMPLECTIC),
+    'kerr': (kerr_cases, kerr, list(TAO_INTEGRATORS)),
+    'doublependulum': (lambda: example('initial-conditions.double-pendulum.example'), double_pendulum, IMPLICIT),
+}
+
+
+def cheapest(records, target):
+    """
+    The fastest run of each model & case with a peak error within target
+    :param records: benchmark results
+    :param target: largest acceptable peak error
+    :return: records, one per model & case that has any run meeting the target
+    """
+    best = {}
+    for record in records:
+        key = record['model'], record['case']
+        if record['peak'] <= target and (key not in best or record['seconds'] < best[key]['seconds']):
+            best[key] = record
+    return list(best.values())
+
+
+def line(record, csv):
+    if csv:
+        return ','.join(f'{record[k]:.9e}' if isinstance(record[k], float) else str(record[k]) for k in FIELDS)
+    return (f'{{"model":"{record["model"]}","case":"{record["case"]}","integrator":"{record["integrator"]}",'
+            f'"scheme":"{record["scheme"]}","step":{record["step"]:.9e},"steps":{record["steps"]:d},'
+            f'"evaluations":{record["evaluations"]:d},"seconds":{record["seconds"]:.3f},'
+            f'"peak":{record["peak"]:.9e},"mean":{record["mean"]:.9e}}}')
+
+
+def main(config):
+    csv = config.get('format', 'json') == 'csv'
+    if csv:
+        print(','.join(FIELDS))
+    records = []
+    for name in config.get('models', list(MODELS)):
+        cases, runner, integrators = MODELS[name]
+        for case, ic in cases():
+            step = float(config.get('step', {}).get(name, ic['step']))
+            duration = ic['end'] * config.get('fraction', 0.1)  # of the case's own run, in its own time
+            for integrator in config.get('integrators', {}).get(name, integrators):
+                schemes = config.get('schemes', ['yoshida'])
+                for scheme in schemes if integrator in COMPOSED else schemes[:1] if name != 'doublependulum' else ['-']:
+                    for k in range(config.get('divisions', 3)):
+                        h = number(step / 2**k)
+                        tr = 2**k  # same sampling times at every step size
+                        run = runner(ic, integrator, scheme, h, duration, tr, config)
+                        errors = run['errors']
+                        record = {'model': name, 'case': case, 'integrator': integrator, 'scheme': scheme,
+                                  'step': float(h), 'steps': run['steps'], 'evaluations': run['evaluations'],
+                                  'seconds': run['seconds'], 'peak': float(max(errors)),
+                                  'mean': float(sum(errors) / len(errors))}
+                        records.append(record)
+                        print(line(record, csv), flush=True)
+    target = float(config.get('target', 1.0e-9))
+    for record in cheapest(records, target):
+        print(f'Cheapest for peak error <= {target:.1e}: {record["model"]} {record["case"]} {record["integrator"]} '
+              f'({record["scheme"]}) step {record["step"]:.3e}, {record["seconds"]:.3f}s', file=stderr)
+
+
+if __name__ == "__main__":
+    #  Example: ./WorkPrecision.py >/tmp/wp.json; ./plotWorkPrecision.py seconds </tmp/wp.json
+    #  Example: echo '{"models": ["newton"], "format": "csv"}' | ./WorkPrecision.py - >/tmp/wp.csv
+    #  Optional config (file or - for stdin): "models", "integrators" & "step" per model,
+    #  "fraction" (of each case's "end", default 0.1),
+    #  "schemes", "divisions" (halvings), "target" (peak error), "format" (json or csv),
+    #  "precision", "gradient" (bh3d) & "omega" (kerr)
+    print("Simulator: {}".format(argv[0]), file=stderr)
+    settings = loads((stdin.read() if argv[1] == '-' else open(argv[1]).read()) if len(argv) == 2 else '{}')
+    select(settings, 113)
+    main(settings)
+else:
+    print(__name__ + " module loaded", file=stderr)
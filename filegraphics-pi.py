@@ -18,6 +18,7 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 from json import loads
 from numpy import sqrt, sin, cos, radians, array
 from sys import argv, stdin, stderr
+from Archive import points
 
 from pi3d import Sphere, Display, Camera, Shader, Keyboard, screenshot, Lines
 
@@ -94,9 +95,9 @@ def main():
     # Display scene
     counter = 1
     cumulative_error = 0.0
-    line = stdin.readline()
+    records = points(stdin.buffer)  # JSON lines, binary records or an archive
+    data = next(records)
     while display.loop_running():
-        data = loads(line)
         # monitor errors
         current_error = data['v4e']
         cumulative_error += current_error if current_error >= 0.0 else -current_error
@@ -142,9 +143,9 @@ def main():
                 display.destroy()
                 break
         # prepare for next iteration
-        line = stdin.readline()
+        data = next(records, None)
         counter += 1
-        if not line:
+        if data is None:
             display.stop()
 
 if __name__ == "__main__":
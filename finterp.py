@@ -1,4 +1,4 @@
-#!/usr/bin/env pypy
+#!/usr/bin/env python3
 """
 Copyright (c) 2014, 2015, 2016, 2017, Ian Smith (m4r35n357)
 All rights reserved.
@@ -13,37 +13,34 @@ Redistribution and use in source and binary forms, with or without modification,
 
 THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
-from sys import argv, stdin, stderr
+from sys import argv, stdin, stdout, stderr
 from math import fabs
-from json import loads
+from Archive import records, line
 
 def main():
-    print >> stderr, "Interpolator: {}".format(argv[0])
+    #  Example: ./finterp.py tau 1.0 </tmp/data  # JSON lines (passed through as is), binary records or an archive in
+    print("Interpolator: {}".format(argv[0]), file=stderr)
     if len(argv) != 3:
         raise Exception('>>> Please supply a time variable name (string) and a precision (float) <<<')
     timeVariable = argv[1]
     precision = float(argv[2])
     counter = 0
-    previous = stdin.readline()
-    previousJson = loads(previous)
-    previousTime = float(previousJson[timeVariable])
-    latest = stdin.readline()
-    while latest:
-        latestJson = loads(latest)
-        latestTime = float(latestJson[timeVariable])
+    source = records(stdin.buffer)
+    previous, previousText = next(source)
+    previousTime = float(previous[timeVariable])
+    for latest, latestText in source:
+        latestTime = float(latest[timeVariable])
         target = counter * precision
         if (latestTime - target) > 0.0:
             counter += 1
             if fabs(latestTime - target) <= fabs(previousTime - target):
-                print latest,  # trailing comma suppresses newline
+                stdout.write(latestText.decode() if latestText else line(latest) + '\n')
             else:
-                print previous,
-        previous = latest
+                stdout.write(previousText.decode() if previousText else line(previous) + '\n')
+        previous, previousText = latest, latestText
         previousTime = latestTime
-        latest = stdin.readline()
 
 if __name__ == "__main__":
     main()
 else:
-    print >> stderr, __name__ + " module loaded"
-
+    print(__name__ + " module loaded", file=stderr)
@@ -20,6 +20,7 @@ from math import log10
 from matplotlib import pyplot
 from matplotlib.ticker import MultipleLocator
 from sys import argv, stdin, stderr
+from Archive import points
 
 import os
 
@@ -74,9 +75,7 @@ def main():
     pyplot.axhspan(-300.0, -180.0, facecolor='blue', alpha=0.3)
     count = 0
     e_cum = e_pk = 0.0
-    line = stdin.readline()
-    while line:  # build raw data arrays
-        p = loads(line)
+    for p in points(stdin.buffer):  # JSON lines, binary records or an archive
         e = p['v4e']
         e = e if e >= 0.0 else -e
         count += 1
@@ -89,7 +88,6 @@ def main():
             left.plot(time_value, log_error(e_cum / count), color='black', linestyle='-', marker='.', markersize=1,
                       zorder=10)
             left.plot(time_value, log_error(e), color='#000f00', linestyle='-', marker='.', markersize=2)
-        line = stdin.readline()
         e_cum += e
         e_pk = e_pk if e_pk > e else e
     left.annotate("{} - {} ({}),  ts = {}".format(executable, integrator_type, composition_scheme, time_step),
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2014-2018, Ian Smith (m4r35n357)
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+
+from json import loads
+from math import log10
+from sys import argv, stdin, stderr
+from matplotlib import pyplot
+
+
+def main():
+    """
+    Work-precision curves from ./WorkPrecision.py JSON output: log10 peak error against log10 cost,
+    one line per model, case, integrator & scheme
+    """
+    print("Work-Precision Plotter: {}".format(argv))
+    cost = argv[1] if len(argv) > 1 else 'seconds'  # or evaluations
+    if cost not in ('seconds', 'evaluations'):
+        raise Exception('>>> Cost must be seconds or evaluations, was "{}" <<<'.format(cost))
+    curves = {}
+    for line in stdin:
+        p = loads(line)
+        if p['peak'] > 0.0 and p[cost] > 0:
+            key = "{} {} {} ({})".format(p['model'], p['case'], p['integrator'], p['scheme'])
+            curves.setdefault(key, []).append((log10(p[cost]), log10(p['peak'])))
+    ax = pyplot.figure().add_subplot(111)
+    for key, points in curves.items():
+        points.sort()
+        ax.plot([x for x, y in points], [y for x, y in points], linestyle='-', marker='.', label=key)
+    ax.set_xlabel('log10 ' + cost, color='0.20')
+    ax.set_ylabel('log10 peak error', color='0.20')
+    pyplot.grid(color='0.25', linestyle=':')
+    ax.legend(fontsize='x-small')
+    pyplot.show()
+
+
+if __name__ == "__main__":
+    main()
+else:
+    print(__name__ + " module loaded", file=stderr)
@@ -17,7 +17,7 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 
 from sys import argv, stdin, stderr
 from matplotlib import pyplot
-from json import loads
+from Archive import points
 
 def main():
     print("X-Y Plotter: {}".format(argv))
@@ -26,7 +26,6 @@ def main():
     interval = int(argv[1])
     coordinate1 = argv[2]
     coordinate2 = argv[3]
-    line = stdin.readline()
     ax1 = pyplot.figure().add_subplot(111)
     pyplot.grid(b=True, color='0.25', linestyle='-')
     ax1.set_xlabel(coordinate1, color='b')
@@ -36,12 +35,10 @@ def main():
     n = 0
     x = []
     y = []
-    while line:
-        p = loads(line)
+    for p in points(stdin.buffer):  # JSON lines, binary records or an archive
         if n % interval == 0:
             x.append(p[coordinate1])
             y.append(p[coordinate2])
-        line = stdin.readline()
         n += 1
     ax1.plot(x, y, 'bo:', markersize=3)
     pyplot.show()
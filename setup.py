@@ -8,5 +8,5 @@ setup(name='symplectic',
       version='1.0',
       url='https://github.com/m4r35n357/BlackHole4dVala',
       requires=['gmpy2', 'dual'],
-      py_modules=['Symplectic'],
+      py_modules=['Symplectic', 'Backend', 'DoubleDouble', 'Implicit', 'Tangent', 'Instrument', 'Binary', 'Archive', 'Background', 'Reducers', 'Events'],
       )